@@ -26,7 +26,6 @@ import os
 import re
 import sys
 import functools
-import inspect
 
 # Ignore emacs backups when listing modules
 ignore_modules = [r'^\.#', '~$']
@@ -119,26 +118,20 @@ def caller_locals():
        scope.  Yes, this is some black magic, and yes it's useful
        for implementing things like depends_on and provides.
     """
-    stack = inspect.stack()
-    try:
-        return stack[2][0].f_locals
-    finally:
-        del stack
+    # sys._getframe is much faster than inspect.stack(), which reads
+    # the source for every frame on the stack.
+    return sys._getframe(2).f_locals
 
 
 def get_calling_package_name():
     """Make sure that the caller is a class definition, and return the
        module's name.
     """
-    stack = inspect.stack()
-    try:
-        # get calling function name (the relation)
-        relation = stack[1][3]
+    # get calling function name (the relation)
+    relation = sys._getframe(1).f_code.co_name
 
-        # Make sure locals contain __module__
-        caller_locals = stack[2][0].f_locals
-    finally:
-        del stack
+    # Make sure locals contain __module__
+    caller_locals = sys._getframe(2).f_locals
 
     if not '__module__' in caller_locals:
         raise ScopeError(relation)
@@ -164,7 +157,7 @@ def attr_setdefault(obj, name, value):
 
 
 def has_method(cls, name):
-    for base in inspect.getmro(cls):
+    for base in cls.__mro__:
         if base is object:
             continue
         if name in base.__dict__:
@@ -212,11 +205,14 @@ def key_ordering(cls):
        will compare objects using this key, and the __hash__ function will
        return the hash of this key.
 
-       If a class already has __eq__, __ne__, __lt__, __le__, __gt__, or __ge__
-       defined, this decorator will overwrite them.  If the class does not
+       If a class defines __eq__, __ne__, __lt__, __le__, __gt__, __ge__ or
+       __hash__ itself, its own method is kept, e.g. so that it can take
+       a shortcut.  Inherited ones are overwritten.  If the class does not
        have a _cmp_key method, then this will raise a TypeError.
     """
     def setter(name, value):
+        if name in cls.__dict__:
+            return
         value.__name__ = name
         setattr(cls, name, value)
 
@@ -256,17 +252,118 @@ class HashableMap(dict):
         return clone
 
 
+class Singleton(object):
+    """Wrapper for an object that is expensive to create.  The object
+       is only created, by calling factory(), when it is first used.
+       Attribute access, indexing, iteration and calls are forwarded to
+       it; use the instance property to get the object itself."""
+    def __init__(self, factory):
+        self.factory = factory
+        self._instance = None
+
+
+    @property
+    def instance(self):
+        if self._instance is None:
+            self._instance = self.factory()
+        return self._instance
+
+
+    def __getattr__(self, name):
+        # Only called for attributes Singleton itself lacks.  Don't
+        # forward our own, in case they are looked up before __init__.
+        if name in ('factory', '_instance'):
+            raise AttributeError(name)
+        return getattr(self.instance, name)
+
+
+    def __getitem__(self, key):
+        return self.instance[key]
+
+
+    def __contains__(self, element):
+        return element in self.instance
+
+
+    def __iter__(self):
+        return iter(self.instance)
+
+
+    def __call__(self, *args, **kwargs):
+        return self.instance(*args, **kwargs)
+
+
+    def __str__(self):
+        return str(self.instance)
+
+
+    def __repr__(self):
+        return repr(self.instance)
+
+
+class LRUCache(object):
+    """A dict-like cache that holds at most max_size items.  When it
+       is full, the least recently used items are discarded."""
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = {}
+        self._used = {}     # key -> time it was last used
+        self._clock = 0
+
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._clock += 1
+        self._used[key] = self._clock
+        return self._data[key]
+
+
+    def __getitem__(self, key):
+        if key not in self._data:
+            raise KeyError(key)
+        return self.get(key)
+
+
+    def __setitem__(self, key, value):
+        if key not in self._data and len(self._data) >= self.max_size:
+            self._evict()
+        self._clock += 1
+        self._data[key] = value
+        self._used[key] = self._clock
+
+
+    def _evict(self):
+        """Discard the least recently used quarter of the cache.  Doing
+           this in batches keeps insertion cheap on average."""
+        by_age = sorted(self._used, key=self._used.get)
+        for key in by_age[:max(1, len(by_age) // 4)]:
+            del self._data[key]
+            del self._used[key]
+
+
+    def clear(self):
+        self._data.clear()
+        self._used.clear()
+
+
 def in_function(function_name):
     """True if the caller was called from some function with
        the supplied Name, False otherwise."""
-    stack = inspect.stack()
-    try:
-        for elt in stack[2:]:
-            if elt[3] == function_name:
-                return True
-        return False
-    finally:
-        del stack
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == function_name:
+            return True
+        frame = frame.f_back
+    return False
 
 
 def check_kwargs(kwargs, fun):
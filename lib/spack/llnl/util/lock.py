@@ -0,0 +1,163 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+File-based locks for coordinating several processes, possibly on
+different nodes, that share a directory.
+
+Locks use POSIX record locks (fcntl.lockf) rather than flock(),
+because record locks also work on NFS.  A lock can be held shared
+(for reading) or exclusive (for writing), and acquiring one polls
+until it succeeds or a timeout expires, so a process on a node with
+a flaky NFS lock daemon gets an error instead of hanging forever.
+
+POSIX locks belong to a process, and closing *any* descriptor for a
+file releases all of the process's locks on it.  So use exactly one
+Lock object per lock file in a process.  Locks are not inherited by
+forked children.
+"""
+import os
+import errno
+import fcntl
+import time
+from contextlib import contextmanager
+
+# Time to sleep between attempts to take a lock.
+_sleep_time = 1e-3
+
+# Longest time to sleep between attempts.
+_max_sleep_time = 0.5
+
+
+class Lock(object):
+    """A shared/exclusive lock on a file.  Both kinds of lock are
+       reentrant: nested acquires are counted, and the file is only
+       unlocked when the last one is released.  Taking a write lock
+       while holding a read lock upgrades it.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._reads = 0
+        self._writes = 0
+
+
+    def _lock(self, op, timeout):
+        """Take the fcntl lock op on the file, polling until timeout
+           seconds have passed.  A timeout of None waits forever."""
+        if self._fd is None:
+            parent = os.path.dirname(self.path)
+            if parent and not os.path.isdir(parent):
+                try:
+                    os.makedirs(parent)
+                except OSError, e:
+                    if e.errno != errno.EEXIST:
+                        raise
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+
+        start_time = time.time()
+        sleep_time = _sleep_time
+        while True:
+            try:
+                fcntl.lockf(self._fd, op | fcntl.LOCK_NB)
+                return
+            except IOError, e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+
+            if timeout is not None and time.time() - start_time >= timeout:
+                raise LockError(
+                    "Timed out after %gs waiting for lock on %s"
+                    % (timeout, self.path))
+
+            time.sleep(sleep_time)
+            sleep_time = min(sleep_time * 2, _max_sleep_time)
+
+
+    def _unlock(self):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+    def acquire_read(self, timeout=None):
+        """Take a shared lock, waiting up to timeout seconds."""
+        if self._reads == 0 and self._writes == 0:
+            self._lock(fcntl.LOCK_SH, timeout)
+        self._reads += 1
+
+
+    def acquire_write(self, timeout=None):
+        """Take an exclusive lock, waiting up to timeout seconds."""
+        if self._writes == 0:
+            self._lock(fcntl.LOCK_EX, timeout)
+        self._writes += 1
+
+
+    def release_read(self):
+        assert(self._reads > 0)
+        self._reads -= 1
+        if self._reads == 0 and self._writes == 0:
+            self._unlock()
+
+
+    def release_write(self):
+        assert(self._writes > 0)
+        self._writes -= 1
+        if self._writes == 0:
+            if self._reads > 0:
+                # Go back to the shared lock we had before upgrading.
+                self._lock(fcntl.LOCK_SH, None)
+            else:
+                self._unlock()
+
+
+    @property
+    def locked(self):
+        return self._reads > 0 or self._writes > 0
+
+
+    @contextmanager
+    def read_locked(self, timeout=None):
+        """Context manager that holds a shared lock."""
+        self.acquire_read(timeout)
+        try:
+            yield
+        finally:
+            self.release_read()
+
+
+    @contextmanager
+    def write_locked(self, timeout=None):
+        """Context manager that holds an exclusive lock."""
+        self.acquire_write(timeout)
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class LockError(Exception):
+    """Raised when a lock cannot be acquired in time."""
+    pass
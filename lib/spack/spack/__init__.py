@@ -25,6 +25,7 @@
 import os
 import tempfile
 from llnl.util.filesystem import *
+from llnl.util.lang import Singleton
 
 # This lives in $prefix/lib/spack/spack/__file__
 prefix = ancestor(__file__, 4)
@@ -42,15 +43,27 @@ test_path      = join_path(module_path, "test")
 hooks_path     = join_path(module_path, "hooks")
 var_path       = join_path(prefix, "var", "spack")
 stage_path     = join_path(var_path, "stage")
+install_log_path = join_path(var_path, "install-logs")
+build_cache_path = join_path(var_path, "build-cache")
+cache_path     = join_path(var_path, "cache")
 install_path   = join_path(prefix, "opt")
 share_path     = join_path(prefix, "share", "spack")
 
+#
+# The global objects below are Singletons, which are only created
+# (and whose modules are only imported) when they are first used.
+# This keeps startup fast for commands that don't need them.
+#
+
 #
 # Set up the packages database.
 #
-from spack.packages import PackageDB
 packages_path = join_path(var_path, "packages")
-db = PackageDB(packages_path)
+
+def _db():
+    from spack.packages import PackageDB
+    return PackageDB(packages_path)
+db = Singleton(_db)
 
 #
 # Paths to mock files for testing.
@@ -65,16 +78,57 @@ mock_user_config = join_path(mock_config_path, "user_spackconfig")
 # This controls how spack lays out install prefixes and
 # stage directories.
 #
-from spack.directory_layout import SpecHashDirectoryLayout
-install_layout = SpecHashDirectoryLayout(install_path)
+def _install_layout():
+    from spack.directory_layout import SpecHashDirectoryLayout
+    return SpecHashDirectoryLayout(install_path)
+install_layout = Singleton(_install_layout)
 
 #
 # This controls how things are concretized in spack.
 # Replace it with a subclass if you want different
 # policies.
 #
-from spack.concretize import DefaultConcretizer
-concretizer = DefaultConcretizer()
+def _concretizer():
+    from spack.concretize import DefaultConcretizer
+    return DefaultConcretizer()
+concretizer = Singleton(_concretizer)
+
+#
+# Concretized specs are cached here.  Set this to None to always
+# concretize from scratch.
+#
+def _concretization_cache():
+    from spack.concretize import ConcretizationCache
+    return ConcretizationCache(join_path(cache_path, "concretized"))
+concretization_cache = Singleton(_concretization_cache)
+
+#
+# Source archives that pass their checksums are kept here, so they
+# don't have to be downloaded again.  Least recently used archives are
+# removed once there are more than fetch_cache_size bytes of them.
+# Set fetch_cache to None to always download.
+#
+fetch_cache_path = join_path(cache_path, "downloads")
+fetch_cache_size = 10 * 2**30
+
+def _fetch_cache():
+    from spack.fetch_cache import FetchCache
+    return FetchCache(fetch_cache_path, fetch_cache_size)
+fetch_cache = Singleton(_fetch_cache)
+
+#
+# Web pages scraped for package versions are kept here.  Pages are
+# used as they are for page_cache_ttl seconds, and after that they are
+# only downloaded again if the server says they changed.  Set
+# page_cache to None to always download them.
+#
+page_cache_path = join_path(cache_path, "pages")
+page_cache_ttl = 60 * 60
+
+def _page_cache():
+    from spack.util.web import PageCache
+    return PageCache(page_cache_path, page_cache_ttl)
+page_cache = Singleton(_page_cache)
 
 # Version information
 from spack.version import Version
@@ -89,7 +143,7 @@ from spack.util.executable import Executable, which
 editor = Executable(os.environ.get("EDITOR", "vi"))
 
 # Curl tool for fetching files.
-curl = which("curl", required=True)
+curl = Singleton(lambda: which("curl", required=True))
 
 # Whether to build in tmp space or directly in the stage_path.
 # If this is true, then spack will make stage directories in
@@ -106,6 +160,11 @@ if _default_tmp != os.getcwd():
     tmp_dirs.append(os.path.join(_default_tmp, 'spack-stage'))
 tmp_dirs.append('/nfs/tmp2/%u/spack-stage')
 
+# Number of jobs to use for parallel make.  If this is None, Spack
+# uses the number of CPUs on the machine.  Parallel installs lower
+# this so that concurrent builds share the machine.
+build_jobs = None
+
 # Whether spack should allow installation of unsafe versions of
 # software.  "Unsafe" versions are ones it doesn't have a checksum
 # for.
@@ -137,19 +196,34 @@ sys_type = None
 # TODO: it's not clear where all the stuff that needs to be included in packages
 #       should live.  This file is overloaded for spack core vs. for packages.
 #
-__all__ = ['Package', 'Version', 'when', 'ver']
-from spack.package import Package, ExtensionConflictError
-from spack.version import Version, ver
-from spack.multimethod import when
-
-import llnl.util.filesystem
-from llnl.util.filesystem import *
-__all__ += llnl.util.filesystem.__all__
-
-import spack.relations
-from spack.relations import *
-__all__ += spack.relations.__all__
-
-import spack.util.executable
-from spack.util.executable import *
-__all__ += spack.util.executable.__all__
+# Importing all of this means importing most of Spack, which is slow,
+# so it only happens when import_package_api() is called.  PackageDB
+# calls it before loading any package file.
+#
+__all__ = []
+
+def import_package_api():
+    """Add the names packages get from 'from spack import *' to this
+       module, and to its __all__."""
+    if __all__:
+        return
+
+    from spack.package import Package, ExtensionConflictError
+    from spack.version import ver
+    from spack.multimethod import when
+    import llnl.util.filesystem
+    import spack.relations
+    import spack.util.executable
+
+    api = { 'Package'                : Package,
+            'ExtensionConflictError' : ExtensionConflictError,
+            'Version'                : Version,
+            'when'                   : when,
+            'ver'                    : ver }
+    names = ['Package', 'Version', 'when', 'ver']
+    for module in (llnl.util.filesystem, spack.relations, spack.util.executable):
+        api.update((name, getattr(module, name)) for name in module.__all__)
+        names += module.__all__
+
+    globals().update(api)
+    __all__.extend(names)
@@ -0,0 +1,328 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Benchmarks for Spack's hot paths: version and spec parsing, spec
+comparison and manipulation, normalization and concretization.
+
+Benchmarks run against either the mock package repository used by the
+tests (the default, since it doesn't change between Spack revisions)
+or the real one.  Results are plain dicts so they can be written out
+as JSON and compared across revisions; see ``spack benchmark``.
+
+To add a benchmark, decorate a setup function with @benchmark.  The
+setup function does any untimed preparation and returns a function
+with no arguments, which is what gets timed.
+"""
+import gc
+import sys
+import time
+import fnmatch
+import platform
+from contextlib import contextmanager
+
+import llnl.util.tty as tty
+
+import spack
+import spack.spec
+import spack.config
+from spack.spec import Spec
+from spack.version import Version, VersionList
+from spack.packages import PackageDB
+
+"""Registered benchmarks, in the order they were defined."""
+_benchmarks = []
+
+"""Repositories benchmarks can run against."""
+repos = ('mock', 'real')
+
+# Specs used by the spec benchmarks, for each repository.
+_mock_specs = ['mpileaks', 'mpileaks ^mpich', 'mpileaks ^mpich2@1.1',
+               'mpileaks ^zmpi', 'callpath ^mpich', 'dyninst',
+               'libelf@0.8.13', 'indirect_mpich', 'direct_mpich']
+
+# Strings used by the parsing benchmarks.
+_spec_strings = [
+    'mpileaks',
+    'mpileaks@1.2:1.4%gcc@4.7.3+debug~qt',
+    'mpileaks ^mpich@3.0.4 ^callpath@1.0:1.2 ^dyninst%intel@12.1',
+    'mvapich_foo^_openmpi@1.2:1.4,1.6%intel@12.1:12.6+debug~qt_4^stackwalker@8.1_1e']
+
+_version_strings = [
+    '1.0', '1.2.3', '2.0b1', '3.4.5-rc2', '1.2a', '10.11.12', '0.8.13',
+    '4.7.3', '1.6_1', '2014.08.12']
+
+_version_lists = ['1.0:2.0', '1.2.3,1.4:1.6', ':3.0', '2.0:', '0.8.10,0.8.13']
+
+
+def benchmark(name):
+    """Decorator that registers a benchmark's setup function."""
+    def register(setup):
+        _benchmarks.append((name, setup))
+        return setup
+    return register
+
+
+def list_benchmarks():
+    """Names of all available benchmarks."""
+    return [name for name, setup in _benchmarks]
+
+
+def _repo_specs():
+    """Abstract specs for the spec benchmarks.  For the real repository
+       this is every package."""
+    if spack.db.root == spack.mock_packages_path:
+        return [Spec(s) for s in _mock_specs]
+    return [Spec(name) for name in spack.db.all_package_names()]
+
+
+def _normalized_specs():
+    specs = []
+    for spec in _repo_specs():
+        try:
+            spec.normalize()
+            specs.append(spec)
+        except spack.error.SpackError:
+            continue
+    return specs
+
+
+def _concrete_specs():
+    specs = []
+    for spec in _repo_specs():
+        try:
+            spec.concretize()
+            specs.append(spec)
+        except spack.error.SpackError:
+            continue
+    return specs
+
+
+@benchmark('version.parse')
+def version_parse():
+    return lambda: [Version(v) for v in _version_strings]
+
+
+@benchmark('version.compare')
+def version_compare():
+    versions = [Version(v) for v in _version_strings]
+    return lambda: sorted(versions)
+
+
+@benchmark('version.satisfies')
+def version_satisfies():
+    lists = [VersionList(v) for v in _version_lists]
+    return lambda: [a.satisfies(b) for a in lists for b in lists]
+
+
+@benchmark('version.intersect')
+def version_intersect():
+    lists = [VersionList(v) for v in _version_lists]
+    def intersect():
+        for a in lists:
+            for b in lists:
+                a.copy().intersect(b)
+    return intersect
+
+
+@benchmark('spec.parse')
+def spec_parse():
+    def parse():
+        spack.spec._parse_cache.clear()
+        return [spack.spec.parse(s) for s in _spec_strings]
+    return parse
+
+
+@benchmark('spec.parse_cached')
+def spec_parse_cached():
+    return lambda: [spack.spec.parse(s) for s in _spec_strings]
+
+
+@benchmark('spec.normalize')
+def spec_normalize():
+    specs = _repo_specs()
+    def normalize():
+        for spec in specs:
+            try:
+                spec.copy().normalize()
+            except spack.error.SpackError:
+                continue
+    return normalize
+
+
+@benchmark('spec.concretize')
+def spec_concretize():
+    specs = _repo_specs()
+    def concretize():
+        for spec in specs:
+            try:
+                spec.concretized()
+            except spack.error.SpackError:
+                continue
+    return concretize
+
+
+@benchmark('spec.satisfies')
+def spec_satisfies():
+    specs = _concrete_specs()
+    constraints = _repo_specs()
+    return lambda: [s.satisfies(c) for s in specs for c in constraints]
+
+
+@benchmark('spec.constrain')
+def spec_constrain():
+    specs = _normalized_specs()
+    def constrain():
+        for a in specs:
+            for b in specs:
+                if a.name == b.name:
+                    try:
+                        a.copy().constrain(b)
+                    except spack.spec.UnsatisfiableSpecError:
+                        continue
+    return constrain
+
+
+@benchmark('spec.copy')
+def spec_copy():
+    specs = _concrete_specs()
+    return lambda: [s.copy() for s in specs]
+
+
+@benchmark('spec.dep_hash')
+def spec_dep_hash():
+    specs = _concrete_specs()
+    return lambda: [s.dep_hash() for s in specs]
+
+
+@contextmanager
+def _use_repo(repo):
+    """Run benchmarks against a particular package repository, with
+       the concretization cache turned off."""
+    saved = (spack.db, spack.config._scopes, spack.concretization_cache)
+    try:
+        if repo == 'mock':
+            spack.db = PackageDB(spack.mock_packages_path)
+            spack.config._scopes = {
+                'site' : spack.mock_site_config,
+                'user' : spack.mock_user_config }
+            spack.config.get_config(refresh=True)
+        spack.concretization_cache = None
+        yield
+
+    finally:
+        spack.db, spack.config._scopes, spack.concretization_cache = saved
+        spack.config.get_config(refresh=True)
+
+
+def _time(function, number):
+    """Time number calls to function, with the garbage collector off
+       as timeit does.  Returns the time per call in seconds."""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.time()
+        for i in xrange(number):
+            function()
+        return (time.time() - start) / number
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _count_objects(function):
+    """Number of objects the garbage collector tracks that are still
+       alive after one call to function.  Python 2 has no allocation
+       tracer, so this measures objects retained (e.g. by caches) rather
+       than every allocation."""
+    gc.collect()
+    before = len(gc.get_objects())
+    function()
+    gc.collect()
+    return len(gc.get_objects()) - before
+
+
+def run_benchmark(name, setup, repeat=5, min_time=0.1):
+    """Run one benchmark and return a dict describing the results.
+
+       The benchmark is called enough times per repeat to take about
+       min_time seconds.  Timings are seconds per call.
+    """
+    function = setup()
+
+    # Warm up, and estimate how many calls to make per repeat.
+    number = 1
+    while _time(function, number) * number < min_time:
+        number *= 2
+        if number > 1 << 20:
+            break
+
+    times = sorted(_time(function, number) for i in range(repeat))
+    return { 'name'    : name,
+             'number'  : number,
+             'repeat'  : repeat,
+             'min'     : times[0],
+             'median'  : times[len(times) // 2],
+             'mean'    : sum(times) / len(times),
+             'max'     : times[-1],
+             'objects' : _count_objects(function) }
+
+
+def run(patterns=None, **kwargs):
+    """Run all benchmarks whose names match one of the supplied glob
+       patterns (or all benchmarks if there are none).
+
+       Keyword args:
+         repo      'mock' (default) or 'real' package repository.
+         repeat    Number of times to time each benchmark.
+         min_time  Minimum time in seconds for each repeat.
+         label     A string to identify this run, e.g. a git revision.
+
+       Returns a dict with information about the run and a list of
+       results, one per benchmark, in a 'benchmarks' entry.
+    """
+    repo     = kwargs.get('repo', 'mock')
+    repeat   = kwargs.get('repeat', 5)
+    min_time = kwargs.get('min_time', 0.1)
+
+    if repo not in repos:
+        raise ValueError("Unknown package repository: %s" % repo)
+
+    selected = [(name, setup) for name, setup in _benchmarks
+                if not patterns or
+                any(fnmatch.fnmatchcase(name, p) for p in patterns)]
+
+    results = []
+    with _use_repo(repo):
+        for name, setup in selected:
+            tty.debug("Running benchmark %s" % name)
+            results.append(run_benchmark(name, setup, repeat, min_time))
+
+    return { 'label'         : kwargs.get('label'),
+             'spack_version' : str(spack.spack_version),
+             'python'        : platform.python_version(),
+             'platform'      : platform.platform(),
+             'repo'          : repo,
+             'time'          : time.strftime('%Y-%m-%dT%H:%M:%S'),
+             'benchmarks'    : results }
@@ -0,0 +1,276 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+This module creates and installs binary packages: tarballs of install
+prefixes that can be installed on another machine without building.
+
+A build cache is a directory laid out like an install tree::
+
+    <cache>/<architecture>/<compiler>/<name>@<version><variants>-<hash>.tar.gz
+    <cache>/<architecture>/<compiler>/<name>@<version><variants>-<hash>.spec
+
+The .spec file is the package's concrete spec, and the tarball holds
+the contents of its prefix along with a buildinfo.json file recording
+the install root it was built in.  When a tarball is installed under a
+different install root, paths under the old root are rewritten in
+text files, symlinks, and binaries.  RPATHs are rewritten with
+patchelf when the new root is longer than the old one; otherwise
+paths in binaries are rewritten in place and padded with extra
+slashes.
+"""
+import os
+import json
+import shutil
+import tarfile
+import tempfile
+from contextlib import closing
+
+import llnl.util.tty as tty
+from llnl.util.filesystem import join_path, mkdirp
+
+import spack
+import spack.error
+import spack.hooks
+from spack.util.executable import which
+from spack.util.compression import unsafe_member
+
+# Names of things in build cache tarballs.
+_buildinfo_name = 'buildinfo.json'
+_prefix_dir = 'prefix'
+
+
+def _base_name(spec):
+    return spec.format('$_$@$+$#')
+
+
+def tarball_path(spec, cache_dir):
+    """Path to the tarball for a spec in a build cache."""
+    return join_path(cache_dir, spec.architecture, str(spec.compiler),
+                     _base_name(spec) + '.tar.gz')
+
+
+def spec_file_path(spec, cache_dir):
+    """Path to the spec file for a spec in a build cache."""
+    return join_path(cache_dir, spec.architecture, str(spec.compiler),
+                     _base_name(spec) + '.spec')
+
+
+def cached_specs(cache_dir):
+    """Get the specs of all the packages in a build cache."""
+    specs = []
+    for dirpath, dirnames, filenames in os.walk(cache_dir):
+        for name in sorted(filenames):
+            if name.endswith('.spec'):
+                path = join_path(dirpath, name)
+                specs.append(spack.install_layout.read_spec(path))
+    return specs
+
+
+def build_tarball(spec, cache_dir, **kwargs):
+    """Put an installed spec's prefix in a build cache.
+
+       Returns the path to the tarball.  Raises BuildCacheError if the
+       spec isn't installed, or if it's already in the cache and force
+       is not True.
+    """
+    force = kwargs.get('force', False)
+
+    prefix = spack.install_layout.path_for_spec(spec)
+    if not os.path.isdir(prefix):
+        raise BuildCacheError("%s is not installed." % spec.short_spec)
+
+    tarball = tarball_path(spec, cache_dir)
+    if os.path.exists(tarball) and not force:
+        raise BuildCacheError(
+            "%s is already in the build cache." % spec.short_spec,
+            "Use --force to replace it: %s" % tarball)
+
+    buildinfo = { 'install_root' : spack.install_layout.root,
+                  'prefix'       : prefix }
+
+    tarball_dir = os.path.dirname(tarball)
+    mkdirp(tarball_dir)
+    tmpdir = tempfile.mkdtemp(dir=tarball_dir, prefix='.tmp-')
+    try:
+        buildinfo_file = join_path(tmpdir, _buildinfo_name)
+        with closing(open(buildinfo_file, 'w')) as f:
+            json.dump(buildinfo, f, sort_keys=True, indent=2)
+
+        tmp_tarball = join_path(tmpdir, os.path.basename(tarball))
+        with closing(tarfile.open(tmp_tarball, 'w:gz')) as tar:
+            tar.add(buildinfo_file, arcname=_buildinfo_name)
+
+            # Install layout state (spec, extensions) is rewritten on
+            # install, so don't ship it.
+            hidden = spack.install_layout.hidden_file_paths
+            for name in sorted(os.listdir(prefix)):
+                if name not in hidden:
+                    tar.add(join_path(prefix, name),
+                            arcname=join_path(_prefix_dir, name))
+
+        # Tarball goes in first, so the spec file means it's complete.
+        os.rename(tmp_tarball, tarball)
+        tmp_spec = join_path(tmpdir, 'spec')
+        spack.install_layout.write_spec(spec, tmp_spec)
+        os.rename(tmp_spec, spec_file_path(spec, cache_dir))
+
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return tarball
+
+
+def install_tarball(spec, cache_dir):
+    """Install a spec from a build cache, relocating it to the current
+       install root.  Dependencies must already be installed.  Does
+       nothing if the spec is already installed."""
+    layout = spack.install_layout
+    prefix = layout.path_for_spec(spec)
+    if layout.installed(spec):
+        tty.msg("%s is already installed in %s." % (spec.name, prefix))
+        return
+
+    tarball = tarball_path(spec, cache_dir)
+    if not os.path.isfile(tarball):
+        raise BuildCacheError(
+            "%s is not in the build cache." % spec.short_spec, cache_dir)
+
+    with layout.prefix_locked(spec, write=True):
+        if os.path.isdir(prefix):
+            return
+
+        layout.make_path_for_spec(spec)
+        tmpdir = tempfile.mkdtemp(dir=os.path.dirname(prefix), prefix='.tmp-')
+        try:
+            with closing(tarfile.open(tarball)) as tar:
+                _check_members(tar, tarball)
+                tar.extractall(tmpdir)
+
+            with closing(open(join_path(tmpdir, _buildinfo_name))) as f:
+                buildinfo = json.load(f)
+
+            extracted = join_path(tmpdir, _prefix_dir)
+            if os.path.isdir(extracted):
+                for name in os.listdir(extracted):
+                    os.rename(join_path(extracted, name), join_path(prefix, name))
+
+            old_root = buildinfo['install_root']
+            if old_root != layout.root:
+                relocate(prefix, old_root, layout.root)
+
+        except:
+            layout.remove_path_for_spec(spec)
+            raise
+
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    spack.hooks.post_install(spec.package)
+    tty.msg("Installed %s from the build cache." % spec.short_spec)
+
+
+def _check_members(tar, tarball):
+    """Make sure a tarball only writes inside the directory it's
+       extracted into, including through links."""
+    links = set()
+    for member in tar.getmembers():
+        reason = unsafe_member(member, links)
+        if reason:
+            raise BuildCacheError(
+                "Refusing to extract %s from %s: %s." % (
+                    member.name, tarball, reason))
+
+
+def relocate(prefix, old_root, new_root):
+    """Rewrite paths under old_root to be under new_root, in every file
+       and symlink in prefix."""
+    for dirpath, dirnames, filenames in os.walk(prefix):
+        for name in dirnames + filenames:
+            path = join_path(dirpath, name)
+            if os.path.islink(path):
+                target = os.readlink(path)
+                if target.startswith(old_root):
+                    os.unlink(path)
+                    os.symlink(new_root + target[len(old_root):], path)
+            elif os.path.isfile(path):
+                _relocate_file(path, old_root, new_root)
+
+
+def _relocate_file(path, old_root, new_root):
+    with closing(open(path, 'rb')) as f:
+        data = f.read()
+    if old_root not in data:
+        return
+
+    # Installed files are often read-only.
+    mode = os.stat(path).st_mode
+    os.chmod(path, mode | 0200)
+    try:
+        if '\0' not in data[:8192]:
+            # Text files (scripts, pkg-config files, etc.) can change size.
+            data = data.replace(old_root, new_root)
+
+        elif len(new_root) <= len(old_root):
+            # Paths in binaries have to stay the same length.
+            padded = new_root + os.sep * (len(old_root) - len(new_root))
+            data = data.replace(old_root, padded)
+
+        elif data.startswith('\x7fELF'):
+            _relocate_rpath(path, old_root, new_root)
+            with closing(open(path, 'rb')) as f:
+                if old_root in f.read():
+                    tty.warn("Could not relocate all paths in %s." % path,
+                             "Only its RPATH refers to the new install root.")
+            return
+
+        else:
+            raise BuildCacheError(
+                "Cannot relocate %s to a longer install root." % path,
+                "It was built in %s." % old_root)
+
+        with closing(open(path, 'wb')) as f:
+            f.write(data)
+
+    finally:
+        os.chmod(path, mode)
+
+
+def _relocate_rpath(path, old_root, new_root):
+    """Rewrite an ELF file's RPATH with patchelf."""
+    patchelf = which('patchelf')
+    if not patchelf:
+        raise BuildCacheError(
+            "patchelf is needed to relocate %s to a longer install root." % path)
+
+    rpath = patchelf('--print-rpath', path, return_output=True).strip()
+    if old_root in rpath:
+        patchelf('--set-rpath', rpath.replace(old_root, new_root), path)
+
+
+class BuildCacheError(spack.error.SpackError):
+    """Raised when something goes wrong creating or installing a
+       binary package."""
+    def __init__(self, message, long_msg=None):
+        super(BuildCacheError, self).__init__(message, long_msg)
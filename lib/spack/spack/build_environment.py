@@ -37,6 +37,7 @@ from llnl.util.filesystem import *
 import spack
 import spack.compilers as compilers
 from spack.util.executable import Executable, which
+from spack.timer import TimedExecutable, make_phase
 from spack.util.environment import *
 
 #
@@ -76,12 +77,17 @@ class MakeExecutable(Executable):
         disable_parallel = env_flag(SPACK_NO_PARALLEL_MAKE)
 
         if parallel and not disable_parallel:
-            jobs = "-j%d" % multiprocessing.cpu_count()
+            jobs = "-j%d" % build_jobs()
             args = (jobs,) + args
 
         super(MakeExecutable, self).__call__(*args, **kwargs)
 
 
+def build_jobs():
+    """Number of jobs to use for parallel builds."""
+    return spack.build_jobs or multiprocessing.cpu_count()
+
+
 def set_compiler_environment_variables(pkg):
     assert(pkg.spec.concrete)
     compiler = pkg.compiler
@@ -166,7 +172,7 @@ def set_module_variables_for_package(pkg):
     m.env = os.environ
 
     # number of jobs spack prefers to build with.
-    m.make_jobs = multiprocessing.cpu_count()
+    m.make_jobs = build_jobs()
 
     # Find the configure script in the archive path
     # Don't use which for this; we want to find it in the current dir.
@@ -178,6 +184,13 @@ def set_module_variables_for_package(pkg):
     # TODO: this shouldn't be.
     m.cmake = which("cmake")
 
+    # Time the configure, build, and install steps of install().
+    m.make      = TimedExecutable(m.make, pkg.timer, make_phase)
+    m.gmake     = TimedExecutable(m.gmake, pkg.timer, make_phase)
+    m.configure = TimedExecutable(m.configure, pkg.timer, 'configure')
+    if m.cmake:
+        m.cmake = TimedExecutable(m.cmake, pkg.timer, 'configure')
+
     # standard CMake arguments
     m.std_cmake_args = ['-DCMAKE_INSTALL_PREFIX=%s' % pkg.prefix,
                         '-DCMAKE_BUILD_TYPE=RelWithDebInfo']
@@ -211,10 +224,9 @@ def set_module_variables_for_package(pkg):
 def get_rpaths(pkg):
     """Get a list of all the rpaths for a package."""
     rpaths = [pkg.prefix.lib, pkg.prefix.lib64]
-    rpaths.extend(d.prefix.lib for d in pkg.spec.traverse(root=False)
-                  if os.path.isdir(d.prefix.lib))
-    rpaths.extend(d.prefix.lib64 for d in pkg.spec.traverse(root=False)
-                  if os.path.isdir(d.prefix.lib64))
+    deps = list(pkg.spec.traverse(root=False))
+    rpaths.extend(d.prefix.lib for d in deps if os.path.isdir(d.prefix.lib))
+    rpaths.extend(d.prefix.lib64 for d in deps if os.path.isdir(d.prefix.lib64))
     return rpaths
 
 
@@ -28,9 +28,10 @@ import sys
 
 import llnl.util.tty as tty
 from llnl.util.lang import attr_setdefault
+from llnl.util.filesystem import join_path
 
 import spack
-import spack.spec
+from spack.util.cache_file import read_json, write_json
 
 # cmd has a submodule called "list" so preserve the python list module
 python_list = list
@@ -50,6 +51,16 @@ for file in os.listdir(command_path):
         commands.append(cmd)
 commands.sort()
 
+# Index of command descriptions, so that building the top-level
+# parser doesn't need to import every command module.
+description_index = join_path(spack.cache_path, "commands.json")
+_description_index_format = 1
+
+# Subparsers for each command, added by bin/spack.  They are only set
+# up with the command's arguments (by setup_parser) when needed.
+subparsers = {}
+_set_up = set()
+
 
 def get_cmd_function_name(name):
     return name.replace("-", "_")
@@ -73,6 +84,40 @@ def get_module(name):
     return module
 
 
+def descriptions():
+    """Get a dict mapping command names to their descriptions.
+
+       Descriptions come from an index in spack.cache_path.  Commands
+       whose files have changed since the index was written are
+       imported to get their descriptions, and the index is updated.
+    """
+    data = read_json(description_index, _description_index_format)
+    index = data['commands'] if data else {}
+
+    changed = False
+    result = {}
+    for cmd in commands:
+        mtime = os.stat(join_path(command_path, cmd + '.py')).st_mtime
+        entry = index.get(cmd)
+        if not entry or entry[0] != mtime:
+            entry = index[cmd] = [mtime, get_module(cmd).description]
+            changed = True
+        result[cmd] = str(entry[1])
+
+    if changed or len(index) != len(commands):
+        index = dict((cmd, index[cmd]) for cmd in commands)
+        write_json(description_index, { 'commands' : index },
+                   _description_index_format)
+    return result
+
+
+def setup_parser(name):
+    """Import a command and add its arguments to its subparser."""
+    if name not in _set_up:
+        get_module(name).setup_parser(subparsers[name])
+        _set_up.add(name)
+
+
 def get_command(name):
     """Imports the command's function from a module and returns it."""
     return getattr(get_module(name), get_cmd_function_name(name))
@@ -82,6 +127,11 @@ def parse_specs(args, **kwargs):
     """Convenience function for parsing arguments from specs.  Handles common
        exceptions and dies if there are errors.
     """
+    # Imported here so that bin/spack doesn't need spack.spec just to
+    # list the commands.
+    import spack.spec
+    import spack.parse
+
     concretize = kwargs.get('concretize', False)
     normalize = kwargs.get('normalize', False)
 
@@ -0,0 +1,90 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import sys
+import json
+from contextlib import closing
+
+import llnl.util.tty as tty
+from llnl.util.tty.colify import colify
+
+import spack
+import spack.benchmark
+
+description = "Run benchmarks of Spack's spec and version code"
+
+def setup_parser(subparser):
+    subparser.add_argument(
+        'names', nargs='*',
+        help="Names (or glob patterns) of benchmarks to run.")
+    subparser.add_argument(
+        '-l', '--list', action='store_true', dest='list',
+        help="Show available benchmarks.")
+    subparser.add_argument(
+        '-r', '--repo', choices=spack.benchmark.repos, default='mock',
+        help="Package repository to benchmark against (default: mock).")
+    subparser.add_argument(
+        '-n', '--repeat', type=int, default=5,
+        help="Number of times to time each benchmark.")
+    subparser.add_argument(
+        '--label', help="Label for this run, e.g. a git revision.")
+    subparser.add_argument(
+        '-o', '--output', metavar='FILE',
+        help="Write results to FILE as JSON.")
+    subparser.add_argument(
+        '--json', action='store_true', dest='json',
+        help="Print results as JSON instead of a table.")
+
+
+def print_table(results):
+    print "%-22s %10s %12s %12s %10s" % (
+        'benchmark', 'calls', 'min (ms)', 'median (ms)', 'objects')
+    for r in results['benchmarks']:
+        print "%-22s %10d %12.4f %12.4f %10d" % (
+            r['name'], r['number'] * r['repeat'],
+            r['min'] * 1000, r['median'] * 1000, r['objects'])
+
+
+def benchmark(parser, args):
+    if args.list:
+        colify(spack.benchmark.list_benchmarks(), indent=2)
+        return
+
+    if args.repeat < 1:
+        tty.die("Repeat count must be at least 1.")
+
+    results = spack.benchmark.run(
+        args.names, repo=args.repo, repeat=args.repeat, label=args.label)
+    if not results['benchmarks']:
+        tty.die("No benchmarks match: %s" % " ".join(args.names))
+
+    if args.output:
+        with closing(open(args.output, 'w')) as f:
+            json.dump(results, f, sort_keys=True, indent=2)
+
+    if args.json:
+        json.dump(results, sys.stdout, sort_keys=True, indent=2)
+        print
+    else:
+        print_table(results)
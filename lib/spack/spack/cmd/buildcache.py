@@ -0,0 +1,127 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+from external import argparse
+
+import llnl.util.tty as tty
+from llnl.util.tty.colify import colify
+
+import spack
+import spack.cmd
+import spack.binary_distribution as bindist
+
+description = "Create and install binary packages from a build cache."
+
+def setup_parser(subparser):
+    subparser.add_argument(
+        '-d', '--directory', default=spack.build_cache_path,
+        help="Build cache directory (default: var/spack/build-cache).")
+
+    sp = subparser.add_subparsers(
+        metavar='SUBCOMMAND', dest='buildcache_command')
+
+    create_parser = sp.add_parser('create', help=buildcache_create.__doc__)
+    create_parser.add_argument(
+        '-f', '--force', action='store_true', dest='force',
+        help="Replace packages that are already in the build cache.")
+    create_parser.add_argument(
+        '-i', '--ignore-dependencies', action='store_true', dest='ignore_deps',
+        help="Don't add the packages' dependencies to the build cache.")
+    create_parser.add_argument(
+        'packages', nargs=argparse.REMAINDER,
+        help="Specs of installed packages to add to the build cache.")
+
+    install_parser = sp.add_parser('install', help=buildcache_install.__doc__)
+    install_parser.add_argument(
+        'packages', nargs=argparse.REMAINDER,
+        help="Specs of packages to install from the build cache.")
+
+    list_parser = sp.add_parser('list', help=buildcache_list.__doc__)
+
+
+def _match_one(spec, candidates, where):
+    """Find the one spec in candidates that satisfies spec, or die."""
+    matches = [c for c in candidates if c.satisfies(spec)]
+    if not matches:
+        tty.die("%s does not match any %s." % (spec, where))
+    if len(matches) > 1:
+        tty.die("%s matches multiple %s:" % (spec, where),
+                *["  " + str(m) for m in matches])
+    return matches[0]
+
+
+def buildcache_create(args):
+    """Add installed packages to the build cache."""
+    if not args.packages:
+        tty.die("buildcache create requires at least one package argument.")
+
+    installed = spack.db.installed_package_specs()
+    specs = []
+    for spec in spack.cmd.parse_specs(args.packages):
+        spec = _match_one(spec, installed, "installed packages")
+        if args.ignore_deps:
+            specs.append(spec)
+        else:
+            specs.extend(spec.traverse(order='post'))
+
+    done = set()
+    for spec in specs:
+        if spec.short_spec in done:
+            continue
+        done.add(spec.short_spec)
+
+        try:
+            tarball = bindist.build_tarball(
+                spec, args.directory, force=args.force)
+            tty.msg("Added %s" % spec.short_spec, tarball)
+        except bindist.BuildCacheError, e:
+            tty.warn(e.message, e.long_message)
+
+
+def buildcache_install(args):
+    """Install packages and their dependencies from the build cache."""
+    if not args.packages:
+        tty.die("buildcache install requires at least one package argument.")
+
+    cached = bindist.cached_specs(args.directory)
+    for spec in spack.cmd.parse_specs(args.packages):
+        spec = _match_one(spec, cached, "packages in %s" % args.directory)
+        for node in spec.traverse(order='post'):
+            bindist.install_tarball(node, args.directory)
+
+
+def buildcache_list(args):
+    """List the packages in the build cache."""
+    specs = bindist.cached_specs(args.directory)
+    if not specs:
+        tty.msg("No packages in %s" % args.directory)
+        return
+    colify(sorted(s.format('$_$@$%@$+$=$#') for s in specs), indent=2)
+
+
+def buildcache(parser, args):
+    action = { 'create'  : buildcache_create,
+               'install' : buildcache_install,
+               'list'    : buildcache_list }
+    action[args.buildcache_command](args)
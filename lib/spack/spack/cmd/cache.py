@@ -0,0 +1,104 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import os
+import re
+
+import llnl.util.tty as tty
+
+import spack
+
+description = "Manage the caches of downloaded archives and concretized specs."
+
+_size_units = { '' : 1, 'k' : 2**10, 'm' : 2**20, 'g' : 2**30, 't' : 2**40 }
+
+def _parse_size(string):
+    """Parse a size like 500M or 2G into bytes."""
+    match = re.match(r'^(\d+(?:\.\d+)?)\s*([kmgt]?)b?$', string.strip().lower())
+    if not match:
+        tty.die("Invalid size: %s.  Use e.g. 500M or 2G." % string)
+    return int(float(match.group(1)) * _size_units[match.group(2)])
+
+
+def _format_size(size):
+    for unit in ('T', 'G', 'M', 'K'):
+        if size >= _size_units[unit.lower()]:
+            return "%.1f%s" % (float(size) / _size_units[unit.lower()], unit)
+    return "%dB" % size
+
+
+def setup_parser(subparser):
+    sp = subparser.add_subparsers(
+        metavar='SUBCOMMAND', dest='cache_command')
+
+    list_parser = sp.add_parser('list', help=cache_list.__doc__)
+
+    clean_parser = sp.add_parser('clean', help=cache_clean.__doc__)
+    clean_parser.add_argument(
+        '-s', '--size', default=None,
+        help="Only remove least recently used archives until the cache "
+        "is no bigger than this, e.g. 500M or 2G.")
+    clean_parser.add_argument(
+        '-c', '--concretized', action='store_true',
+        help="Remove cached concretized specs instead of archives.")
+
+
+def cache_list(args):
+    """List archives in the download cache, least recently used first."""
+    cache = spack.fetch_cache
+    if cache is None:
+        tty.die("The download cache is disabled.")
+    entries = cache.entries()
+    for path, size, mtime in entries:
+        print "%8s  %s" % (_format_size(size), os.path.relpath(path, cache.root))
+    tty.msg("%d archives, %s in %s" % (
+        len(entries), _format_size(sum(e[1] for e in entries)), cache.root))
+
+
+def cache_clean(args):
+    """Remove archives from the download cache."""
+    if args.concretized:
+        cache = spack.concretization_cache
+        if cache is None:
+            tty.die("The concretization cache is disabled.")
+        removed = cache.trim(0)
+        tty.msg("Removed %d concretized specs from %s" % (
+            len(removed), cache.root))
+        return
+
+    cache = spack.fetch_cache
+    if cache is None:
+        tty.die("The download cache is disabled.")
+    if args.size is None:
+        cache.clean()
+        tty.msg("Removed all archives from %s" % cache.root)
+    else:
+        removed = cache.trim(_parse_size(args.size))
+        tty.msg("Removed %d archives from %s" % (len(removed), cache.root))
+
+
+def cache(parser, args):
+    action = { 'list'  : cache_list,
+               'clean' : cache_clean }
+    action[args.cache_command](args)
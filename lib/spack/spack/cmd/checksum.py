@@ -24,6 +24,8 @@
 ##############################################################################
 import os
 import re
+import threading
+from Queue import Queue
 from external import argparse
 import hashlib
 from pprint import pprint
@@ -40,42 +42,113 @@ from spack.version import *
 
 description ="Checksum available versions of a package."
 
-def setup_parser(subparser):
+# Most archives downloaded at once.
+DOWNLOAD_JOBS = 4
+
+# Hash used for checksums unless another one is asked for.
+DEFAULT_HASH = 'md5'
+
+
+def add_checksum_arguments(subparser):
+    """Arguments shared by the commands that use get_checksums()."""
     subparser.add_argument(
-        'package', metavar='PACKAGE', help='Package to list versions for')
+        '-a', '--algorithm', dest='algorithm', default=DEFAULT_HASH,
+        choices=spack.util.crypto.hash_names,
+        help="Hash algorithm for checksums (default %s)." % DEFAULT_HASH)
+    subparser.add_argument(
+        '-j', '--jobs', action='store', type=int, dest='jobs',
+        default=DOWNLOAD_JOBS,
+        help="Most archives to download at once (default %d)." % DOWNLOAD_JOBS)
     subparser.add_argument(
         '--keep-stage', action='store_true', dest='keep_stage',
         help="Don't clean up staging area when command completes.")
+
+
+def setup_parser(subparser):
+    subparser.add_argument(
+        'package', metavar='PACKAGE', help='Package to list versions for')
+    add_checksum_arguments(subparser)
     subparser.add_argument(
         'versions', nargs=argparse.REMAINDER, help='Versions to generate checksums for')
 
 
+def _checksum_stage(stage, algorithm):
+    """Fetch a stage's archive and return its hex digest.  The digest
+       is computed as the archive downloads, if it is downloaded."""
+    fetcher = stage.fetcher
+    fetcher.hash_algorithm = algorithm
+    stage.fetch()
+    if fetcher.archive_digest:
+        return fetcher.archive_digest
+    return spack.util.crypto.checksum(algorithm, stage.archive_file)
+
+
 def get_checksums(versions, urls, **kwargs):
+    """Download the archive at each URL and checksum it.  Returns a
+       list of (version, hex digest) tuples, in the order of versions,
+       for the archives that could be downloaded.
+
+       Keyword args:
+         first_stage_function  Called with the stage of the first
+                               archive, once it's downloaded.
+         keep_stage            Don't destroy the stages afterwards.
+         algorithm             Name of the hash to use (default md5).
+         jobs                  Most archives to download at once.
+    """
     # Allow commands like create() to do some analysis on the first
     # archive after it is downloaded.
     first_stage_function = kwargs.get('first_stage_function', None)
     keep_stage = kwargs.get('keep_stage', False)
+    algorithm = spack.util.crypto.hash_fun_for_name(
+        kwargs.get('algorithm', DEFAULT_HASH))
+    jobs = max(1, kwargs.get('jobs', DOWNLOAD_JOBS))
+
+    stages = [Stage(url) for url in urls]
+    hashes = [None] * len(stages)
+    if jobs > 1:
+        # Progress bars from several downloads would overwrite each other.
+        for stage in stages:
+            stage.fetcher.progress_bar = False
+
+    queue = Queue()
+    def work():
+        while True:
+            i = queue.get()
+            if i is None:
+                return
+            try:
+                hashes[i] = _checksum_stage(stages[i], algorithm)
+                tty.msg("Checksummed %s" % versions[i])
+            except FailedDownloadError, e:
+                tty.msg("Failed to fetch %s" % urls[i])
+            except Exception, e:
+                tty.msg("Failed to checksum %s" % urls[i], str(e))
 
     tty.msg("Downloading...")
-    hashes = []
-    for i, (url, version) in enumerate(zip(urls, versions)):
-        stage = Stage(url)
-        try:
-            stage.fetch()
-            if i == 0 and first_stage_function:
-                first_stage_function(stage)
-
-            hashes.append(
-                spack.util.crypto.checksum(hashlib.md5, stage.archive_file))
-        except FailedDownloadError, e:
-            tty.msg("Failed to fetch %s" % url)
-            continue
-
-        finally:
-            if not keep_stage:
+    for i in range(len(stages)):
+        queue.put(i)
+    threads = [threading.Thread(target=work)
+               for i in range(min(jobs, len(stages)))]
+    for t in threads:
+        t.daemon = True
+        queue.put(None)
+        t.start()
+
+    try:
+        # join() can't be interrupted, so poll instead.
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(0.1)
+
+        if first_stage_function and hashes and hashes[0]:
+            first_stage_function(stages[0])
+
+    finally:
+        if not keep_stage:
+            for stage in stages:
                 stage.destroy()
 
-    return zip(versions, hashes)
+    return [(v, h) for v, h in zip(versions, hashes) if h]
 
 
 
@@ -113,7 +186,7 @@ def checksum(parser, args):
     version_hashes = get_checksums(
         sorted_versions[:archives_to_fetch],
         [versions[v] for v in sorted_versions[:archives_to_fetch]],
-        keep_stage=args.keep_stage)
+        keep_stage=args.keep_stage, algorithm=args.algorithm, jobs=args.jobs)
 
     if not version_hashes:
         tty.die("Could not fetch any versions for %s." % pkg.name)
@@ -88,9 +88,7 @@ ${versions}
 
 def setup_parser(subparser):
     subparser.add_argument('url', nargs='?', help="url of package archive")
-    subparser.add_argument(
-        '--keep-stage', action='store_true', dest='keep_stage',
-        help="Don't clean up staging area when command completes.")
+    spack.cmd.checksum.add_checksum_arguments(subparser)
     subparser.add_argument(
         '-n', '--name', dest='alternate_name', default=None,
         help="Override the autodetected name for the created package.")
@@ -186,7 +184,7 @@ def create(parser, args):
         versions.keys()[:archives_to_fetch],
         [versions[v] for v in versions.keys()[:archives_to_fetch]],
         first_stage_function=guesser,
-        keep_stage=args.keep_stage)
+        keep_stage=args.keep_stage, algorithm=args.algorithm, jobs=args.jobs)
 
     if not ver_hash_tuples:
         tty.die("Could not fetch any tarballs for %s." % name)
@@ -24,8 +24,11 @@
 ##############################################################################
 from external import argparse
 
+import llnl.util.tty as tty
+
 import spack
 import spack.cmd
+import spack.installer
 
 description = "Fetch archives for packages"
 
@@ -33,6 +36,12 @@ def setup_parser(subparser):
     subparser.add_argument(
         '-n', '--no-checksum', action='store_true', dest='no_checksum',
         help="Do not check packages against checksum")
+    subparser.add_argument(
+        '-d', '--dependencies', action='store_true', dest='dependencies',
+        help="Also fetch the sources for all dependencies")
+    subparser.add_argument(
+        '-j', '--jobs', action='store', type=int, dest='jobs', default=4,
+        help="Number of sources to download at once with -d (default 4)")
     subparser.add_argument(
         'packages', nargs=argparse.REMAINDER, help="specs of packages to fetch")
 
@@ -45,6 +54,17 @@ def fetch(parser, args):
         spack.do_checksum = False
 
     specs = spack.cmd.parse_specs(args.packages, concretize=True)
+    if args.dependencies:
+        spack.installer.fetch(specs, args.jobs)
+
+    # This fetches anything the parallel fetch skipped, e.g. versions
+    # with no checksum, which may need to ask the user about them.
     for spec in specs:
-        package = spack.db.get(spec)
-        package.do_fetch()
+        if args.dependencies:
+            to_fetch = [s for s in spec.traverse() if not s.package.installed]
+        else:
+            to_fetch = [spec]
+
+        for s in to_fetch:
+            package = spack.db.get(s)
+            package.do_fetch()
@@ -24,6 +24,8 @@
 ##############################################################################
 import sys
 
+import spack.cmd
+
 description = "Get help on spack and its commands"
 
 def setup_parser(subparser):
@@ -32,6 +34,8 @@ def setup_parser(subparser):
 
 def help(parser, args):
     if args.help_command:
+        if args.help_command in spack.cmd.subparsers:
+            spack.cmd.setup_parser(args.help_command)
         parser.parse_args([args.help_command, '-h'])
     else:
         parser.print_help()
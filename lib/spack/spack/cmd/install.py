@@ -23,10 +23,14 @@
 # Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 import sys
+import time
 from external import argparse
 
+import llnl.util.tty as tty
+
 import spack
 import spack.cmd
+import spack.installer
 
 description = "Build and install packages"
 
@@ -40,6 +44,13 @@ def setup_parser(subparser):
     subparser.add_argument(
         '--keep-stage', action='store_true', dest='keep_stage',
         help="Don't remove the build stage if installation succeeds.")
+    subparser.add_argument(
+        '-j', '--jobs-packages', action='store', type=int, dest='jobs_packages',
+        help="Install up to this many packages at once.  Build logs go in "
+        "var/spack/install-logs.")
+    subparser.add_argument(
+        '--fetch-jobs', action='store', type=int, dest='fetch_jobs', default=4,
+        help="Number of sources to download at once before building (default 4).")
     subparser.add_argument(
         '-n', '--no-checksum', action='store_true', dest='no_checksum',
         help="Do not check packages against checksum")
@@ -57,7 +68,25 @@ def install(parser, args):
     if args.no_checksum:
         spack.do_checksum = False
 
-    specs = spack.cmd.parse_specs(args.packages, concretize=True)
+    specs = spack.cmd.parse_specs(args.packages)
+    for spec in specs:
+        start_time = time.time()
+        spec.concretize()
+        spack.db.get(spec).timer.add('concretize', time.time() - start_time)
+
+    # Download everything up front so that builds don't wait on fetches.
+    if not args.fake:
+        spack.installer.fetch(specs, args.fetch_jobs,
+                              ignore_deps=args.ignore_deps)
+
+    if args.jobs_packages:
+        spack.installer.install(specs, args.jobs_packages,
+                                keep_prefix=args.keep_prefix,
+                                keep_stage=args.keep_stage,
+                                ignore_deps=args.ignore_deps,
+                                fake=args.fake)
+        return
+
     for spec in specs:
         package = spack.db.get(spec)
         package.do_install(keep_prefix=args.keep_prefix,
@@ -57,6 +57,11 @@ def setup_parser(subparser):
     create_parser.add_argument(
         '-o', '--one-version-per-spec', action='store_const', const=1, default=0,
         help="Only fetch one 'preferred' version per spec, not all known versions.")
+    create_parser.add_argument(
+        '-j', '--jobs', action='store', type=int, dest='jobs',
+        default=spack.mirror.FETCH_JOBS,
+        help="Max number of archives to fetch at once (default %d)."
+        % spack.mirror.FETCH_JOBS)
 
     add_parser = sp.add_parser('add', help=mirror_add.__doc__)
     add_parser.add_argument('name', help="Mnemonic name for mirror.")
@@ -152,7 +157,7 @@ def mirror_create(args):
 
     # Actually do the work to create the mirror
     present, mirrored, error = spack.mirror.create(
-        directory, specs, num_versions=args.one_version_per_spec)
+        directory, specs, num_versions=args.one_version_per_spec, jobs=args.jobs)
     p, m, e = len(present), len(mirrored), len(error)
 
     verb = "updated" if existed else "created"
@@ -0,0 +1,109 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import sys
+import json
+from external import argparse
+
+import llnl.util.tty as tty
+
+import spack
+import spack.cmd
+import spack.timer
+
+description = "Show how long installs of packages took, phase by phase"
+
+def setup_parser(subparser):
+    subparser.add_argument(
+        '-n', '--top', type=int, default=0,
+        help="Only show the N slowest installs.")
+    subparser.add_argument(
+        '--json', action='store_true', dest='json',
+        help="Print timings as JSON instead of tables.")
+    subparser.add_argument(
+        'query_specs', nargs=argparse.REMAINDER,
+        help="Optional specs to filter results.")
+
+
+def _seconds(seconds):
+    return "%.2fs" % seconds
+
+
+def print_tables(timings, phases, total, count):
+    tty.msg("Slowest installs")
+    print "%10s %10s %10s  %s" % ('total', 'fetch', 'install', 'package')
+    for t in timings:
+        timer = t['timer']
+        print "%10s %10s %10s  %s" % (
+            _seconds(t['total']), _seconds(timer.get('fetch')),
+            _seconds(timer.get('install')), t['spec'])
+
+    print
+    tty.msg("Time by phase")
+    print "%10s %6s %6s  %s" % ('total', '%', 'count', 'phase')
+    for name, seconds, count in phases:
+        percent = 100 * seconds / total if total else 0
+        print "%10s %6.1f %6d  %s" % (_seconds(seconds), percent, count, name)
+    print "%10s %6s %6d  %s" % (_seconds(total), '', count, 'all')
+
+
+def timings(parser, args):
+    query_specs = spack.cmd.parse_specs(args.query_specs)
+    if not query_specs:
+        specs = spack.db.installed_package_specs()
+    else:
+        specs = set()
+        for qs in query_specs:
+            specs.update(spack.db.get_installed(qs))
+
+    timings = []
+    for spec in specs:
+        path = spack.install_layout.timing_file_path(spec)
+        t = spack.timer.read_timing_file(path)
+        if t:
+            t['prefix'] = spack.install_layout.path_for_spec(spec)
+            timings.append(t)
+
+    if not timings:
+        tty.die("No timings recorded for installed packages.")
+
+    timings.sort(key=lambda t: t['total'], reverse=True)
+    phases = spack.timer.aggregate(timings)
+    total = sum(t['total'] for t in timings)
+    count = len(timings)
+    if args.top > 0:
+        timings = timings[:args.top]
+
+    if args.json:
+        for t in timings:
+            t['phases'] = t.pop('timer').phases
+        json.dump({ 'installs' : timings,
+                    'phases'   : [{ 'name'    : name,
+                                    'seconds' : seconds,
+                                    'count'   : count }
+                                  for name, seconds, count in phases] },
+                  sys.stdout, sort_keys=True, indent=2)
+        print
+    else:
+        print_tables(timings, phases, total, count)
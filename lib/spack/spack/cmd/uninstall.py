@@ -29,6 +29,7 @@ import llnl.util.tty as tty
 import spack
 import spack.cmd
 import spack.packages
+import spack.package
 
 description="Remove an installed package"
 
@@ -76,7 +77,7 @@ def uninstall(parser, args):
 
             except spack.packages.UnknownPackageError, e:
                 # The package.py file has gone away -- but still want to uninstall.
-                spack.Package(s).do_uninstall(force=True)
+                spack.package.Package(s).do_uninstall(force=True)
 
     # Sort packages to be uninstalled by the number of installed dependents
     # This ensures we do things in the right order
@@ -26,14 +26,32 @@ import os
 from llnl.util.tty.colify import colify
 import llnl.util.tty as tty
 import spack
+import spack.url
+import spack.package
+from spack.util.web import Spider, CONCURRENCY
 
 description ="List available versions of a package"
 
 def setup_parser(subparser):
-    subparser.add_argument('package', metavar='PACKAGE', help='Package to list versions for')
+    subparser.add_argument(
+        '-a', '--all', action='store_true', dest='all',
+        help="Check every package for new remote versions.")
+    subparser.add_argument(
+        '-j', '--jobs', action='store', type=int, dest='jobs', default=None,
+        help="Most web pages to fetch at once.")
+    subparser.add_argument(
+        'package', nargs='?', metavar='PACKAGE', help='Package to list versions for')
 
 
 def versions(parser, args):
+    if args.all:
+        if args.package:
+            tty.die("Can't give a package with --all.")
+        all_versions(args)
+        return
+
+    if not args.package:
+        tty.die("versions requires a package argument.")
     pkg = spack.db.get(args.package)
 
     safe_versions = pkg.versions
@@ -53,3 +71,50 @@ def versions(parser, args):
             print "  Found no unckecksummed versions for %s" % pkg.name
     else:
         colify(sorted(remote_versions, reverse=True), indent=2)
+
+
+def all_versions(args):
+    """Refresh remote versions of every package at once, and print the
+       ones that have versions newer than their newest safe version.
+       All the list pages are crawled by one spider, so requests run
+       concurrently but each server only sees a few at a time."""
+    packages = []
+    spider = Spider(concurrency=args.jobs or CONCURRENCY,
+                    cache=spack.page_cache, revalidate=True)
+    for name in spack.db.all_package_names():
+        pkg = spack.db.get(name)
+        if not pkg.all_urls:
+            continue
+        roots = spack.package.find_list_urls(*pkg.all_urls, list_url=pkg.list_url)
+        for root in roots:
+            spider.add_root(root, pkg.list_depth)
+        packages.append((pkg, roots))
+
+    tty.msg("Checking %d packages for new versions." % len(packages))
+    pages = spider.run()
+
+    updated = []
+    for pkg, roots in packages:
+        page_map = dict((u, p) for u, p in pages.iteritems()
+                        if spider.page_roots.get(u, set()) & roots)
+        try:
+            remote = spack.package.versions_from_pages(pkg.all_urls, page_map)
+        except spack.url.UrlParseError, e:
+            tty.debug("Can't find versions of %s: %s" % (pkg.name, e))
+            continue
+
+        newest = max(pkg.versions) if pkg.versions else None
+        new_versions = sorted((v for v in remote if newest is None or v > newest),
+                              reverse=True)
+        if new_versions:
+            updated.append((pkg.name, newest, new_versions))
+
+    if not updated:
+        tty.msg("All packages are up to date.")
+        return
+
+    tty.msg("%d packages have new versions:" % len(updated))
+    width = max(len(name) for name, newest, new_versions in updated)
+    for name, newest, new_versions in updated:
+        print "  %-*s  %-10s -> %s" % (
+            width, name, '-' if newest is None else newest, ", ".join(str(v) for v in new_versions))
@@ -37,7 +37,7 @@ import spack.spec
 import spack.config
 
 from spack.util.multiproc import parmap
-from spack.compiler import Compiler
+import spack.compiler
 from spack.util.executable import which
 from spack.util.naming import mod_to_class
 from spack.util.environment import get_path
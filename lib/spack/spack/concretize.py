@@ -32,13 +32,31 @@ or user preferences.
 
 TODO: make this customizable and allow users to configure
       concretization  policies.
+
+Concretized specs are also cached on disk by ConcretizationCache, so
+that concretizing the same abstract spec again is nearly free as long
+as the packages, configuration and architecture have not changed.
 """
+import os
+import shutil
+import hashlib
+import tempfile
+from contextlib import closing
+
+import llnl.util.tty as tty
+from llnl.util.filesystem import join_path, mkdirp
+
+import spack
 import spack.spec
+import spack.config
 import spack.compilers
 import spack.architecture
 import spack.error
 from spack.version import *
 
+# Bump this when changes to Spack change concretization results.
+_cache_format = 1
+
 
 
 class DefaultConcretizer(object):
@@ -121,8 +139,9 @@ class DefaultConcretizer(object):
             return
 
         try:
-            nearest = next(p for p in spec.traverse(direction='parents')
-                           if p.compiler is not None).compiler
+            parent = next(p for p in spec.traverse(direction='parents')
+                          if p.compiler is not None)
+            nearest = parent.compiler
 
             if not nearest in all_compilers:
                 # Take the newest compiler that saisfies the spec
@@ -130,8 +149,10 @@ class DefaultConcretizer(object):
                 if not matches:
                     raise UnavailableCompilerVersionError(nearest)
 
-                # copy concrete version into nearest spec
-                nearest.versions = matches[-1].versions.copy()
+                # copy concrete version into nearest spec.  Replace its
+                # compiler rather than changing it, since copies of the
+                # spec may share it.
+                nearest = parent.compiler = matches[-1].copy()
                 assert(nearest.concrete)
 
             spec.compiler = nearest.copy()
@@ -154,6 +175,172 @@ class DefaultConcretizer(object):
         return latest_version
 
 
+class ConcretizationCache(object):
+    """On-disk cache of concretized specs.
+
+       Each entry is a concrete spec DAG stored as JSON.  It is keyed by
+       a hash of everything that goes into concretization:
+
+         - the abstract spec,
+         - the contents of all package files (PackageDB.content_hash()),
+         - the contents of the configuration files, which hold the
+           compiler settings,
+         - the architecture, and
+         - the concretizer class.
+
+       Since a change to any of these changes the key, stale entries are
+       never returned, they just stop being used.  So that they don't
+       pile up, only the max_entries most recently used entries are kept.
+
+       Entries are checked before they're used, and ones that don't
+       match the spec they were looked up for are thrown away.
+    """
+    def __init__(self, root, max_entries=1000):
+        self.root = root
+        self.max_entries = max_entries
+
+
+    def key(self, spec):
+        """Get the cache key for an abstract spec."""
+        # spack.concretizer is normally a Singleton wrapping the real one.
+        concretizer = type(getattr(spack.concretizer, 'instance',
+                                   spack.concretizer))
+        sha = hashlib.sha1()
+        for part in (str(_cache_format),
+                     str(spec),
+                     spack.db.content_hash(),
+                     _config_hash(),
+                     spack.architecture.sys_type(),
+                     concretizer.__module__ + '.' + concretizer.__name__):
+            sha.update(part)
+            sha.update('\0')
+        return sha.hexdigest()
+
+
+    def path_for_key(self, key):
+        return join_path(self.root, key + '.json')
+
+
+    def get(self, key, spec=None):
+        """Return the concrete spec stored under key, or None if there
+           is no (valid) entry for it.
+
+           If spec is supplied, the entry must be a concretization of it.
+           Entries that aren't are removed.
+        """
+        path = self.path_for_key(key)
+        try:
+            with closing(open(path)) as f:
+                cached = spack.spec.Spec.from_json(f)
+        except (IOError, spack.spec.SpecError):
+            return None
+
+        for s in cached.traverse():
+            s._normal = True
+
+        if not cached.concrete or (spec is not None and not (
+                cached.name == spec.name and cached.satisfies(spec))):
+            tty.debug("Discarding invalid cached spec %s" % path)
+            self._remove(path)
+            return None
+
+        # Mark the entry as recently used.
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return cached
+
+
+    def store(self, key, spec):
+        """Store a concrete spec under key.  The cache is only an
+           optimization, so failure to write it is not an error."""
+        assert(spec.concrete)
+        try:
+            mkdirp(self.root)
+            fd, tmp = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+            with closing(os.fdopen(fd, 'w')) as f:
+                spec.to_json(f)
+            os.rename(tmp, self.path_for_key(key))
+            self.trim(self.max_entries)
+
+        except (IOError, OSError), e:
+            tty.debug("Could not cache concretized spec %s: %s" % (spec, e))
+
+
+    def entries(self):
+        """List (path, mtime) for every entry, least recently used first."""
+        if not os.path.isdir(self.root):
+            return []
+
+        entries = []
+        for name in os.listdir(self.root):
+            if name.startswith('.tmp-') or not name.endswith('.json'):
+                continue
+            path = join_path(self.root, name)
+            try:
+                entries.append((path, os.stat(path).st_mtime))
+            except OSError:
+                continue
+        entries.sort(key=lambda e: e[1])
+        return entries
+
+
+    def trim(self, max_entries):
+        """Remove least recently used entries until there are at most
+           max_entries.  Returns the removed paths."""
+        entries = self.entries()
+        removed = [path for path, mtime in entries[:-max_entries or None]]
+        for path in removed:
+            self._remove(path)
+        return removed
+
+
+    def clean(self):
+        """Remove everything from the cache."""
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# (scope, path, mtime, size) of each config file -> hash of their contents
+_config_hashes = {}
+
+def _config_stat():
+    """Identify the current versions of the configuration files without
+       reading them."""
+    stats = []
+    for scope, path in sorted(spack.config._scopes.items()):
+        try:
+            st = os.stat(path)
+            stats.append((scope, path, st.st_mtime, st.st_size))
+        except OSError:
+            stats.append((scope, path, None, None))
+    return tuple(stats)
+
+
+def _config_hash():
+    """SHA-1 hash of the contents of all configuration files.  The files
+       are only read again when they have changed."""
+    stat = _config_stat()
+    if stat not in _config_hashes:
+        sha = hashlib.sha1()
+        for scope, path, mtime, size in stat:
+            sha.update(scope)
+            if os.path.isfile(path):
+                with closing(open(path)) as f:
+                    sha.update(f.read())
+        _config_hashes.clear()
+        _config_hashes[stat] = sha.hexdigest()
+    return _config_hashes[stat]
+
+
 class UnavailableCompilerVersionError(spack.error.SpackError):
     """Raised when there is no available compiler that satisfies a
        compiler spec."""
@@ -26,18 +26,26 @@ import re
 import os
 import exceptions
 import hashlib
+import json
 import shutil
 import tempfile
-from contextlib import closing
+from contextlib import closing, contextmanager
 
 import llnl.util.tty as tty
-from llnl.util.lang import memoized
 from llnl.util.filesystem import join_path, mkdirp
+from llnl.util.lock import Lock, LockError
 
 import spack
 from spack.spec import Spec
 from spack.error import SpackError
 
+# Seconds to wait for a lock on installed spec metadata before giving up.
+_metadata_lock_timeout = 120
+
+# Seconds to wait for a lock on an install prefix.  Another process may
+# hold it for a whole build, so this is much longer.
+prefix_lock_timeout = 4 * 3600
+
 
 def _check_concrete(spec):
     """If the spec is not concrete, raise a ValueError"""
@@ -54,6 +62,10 @@ class DirectoryLayout(object):
     def __init__(self, root):
         self.root = root
 
+        # Locks on install prefixes, keyed by lock file path.  There
+        # must be only one Lock per file in a process.
+        self._locks = {}
+
 
     @property
     def hidden_file_paths(self):
@@ -117,11 +129,79 @@ class DirectoryLayout(object):
         raise NotImplementedError()
 
 
+    def timing_file_path(self, spec):
+        """Path to the file in a spec's prefix where the times taken by
+           each phase of its install are recorded."""
+        raise NotImplementedError()
+
+
     def remove_extension(self, spec, ext_spec):
         """Remove from the list of currently installed extensions."""
         raise NotImplementedError()
 
 
+    def prefix_lock(self, spec):
+        """Get the Lock for a spec's install prefix.  Hold it for
+           writing while creating, building in, or removing the prefix.
+
+           Lock files are kept in <root>/.locks rather than in the
+           prefix, so that they can outlive it.
+        """
+        name = self.relative_path_for_spec(spec).replace(os.sep, '-')
+        path = join_path(self.root, '.locks', name + '.lock')
+        if path not in self._locks:
+            self._locks[path] = Lock(path)
+        return self._locks[path]
+
+
+    @contextmanager
+    def prefix_locked(self, spec, write=False, timeout=None):
+        """Hold a spec's prefix lock, shared or exclusive, waiting up to
+           timeout seconds (default prefix_lock_timeout) for it.  Raises
+           PrefixLockError if it can't be had in time."""
+        if timeout is None:
+            timeout = prefix_lock_timeout
+
+        lock = self.prefix_lock(spec)
+        try:
+            if write:
+                lock.acquire_write(timeout)
+            else:
+                lock.acquire_read(timeout)
+        except LockError, e:
+            raise PrefixLockError(spec, self.path_for_spec(spec), e)
+
+        try:
+            yield
+        finally:
+            if write:
+                lock.release_write()
+            else:
+                lock.release_read()
+
+
+    def installed(self, spec, wait=True):
+        """Whether spec is completely installed.
+
+           A prefix exists while its package is still being built, so
+           this takes the prefix lock to wait for any process that is
+           building in or removing it.  If wait is False, a prefix that
+           is locked by another process counts as not installed.
+        """
+        path = self.path_for_spec(spec)
+        try:
+            with self.prefix_locked(spec, timeout=None if wait else 0):
+                return os.path.isdir(path)
+        except PrefixLockError:
+            if wait:
+                raise
+            return False
+        except (IOError, OSError):
+            # Can't lock in a read-only install tree, but then nothing
+            # can be building in it either.
+            return os.path.isdir(path)
+
+
     def path_for_spec(self, spec):
         """Return an absolute path from the root to a directory for the spec."""
         _check_concrete(spec)
@@ -138,11 +218,12 @@ class DirectoryLayout(object):
         path = self.path_for_spec(spec)
         assert(path.startswith(self.root))
 
-        if os.path.exists(path):
-            try:
-                shutil.rmtree(path)
-            except exceptions.OSError, e:
-                raise RemoveFailedError(spec, path, e)
+        with self.prefix_locked(spec, write=True):
+            if os.path.exists(path):
+                try:
+                    shutil.rmtree(path)
+                except exceptions.OSError, e:
+                    raise RemoveFailedError(spec, path, e)
 
         path = os.path.dirname(path)
         while path != self.root:
@@ -185,6 +266,12 @@ class SpecHashDirectoryLayout(DirectoryLayout):
        install directory to a new hash size pretty easily.
 
        TODO: make a tool to migrate install directories to different hash sizes.
+
+       The contents of every spec file are also kept in a single index
+       file at the root of the layout, so that listing installed specs
+       only requires one file read.  The index is updated whenever a
+       prefix is created or removed, and it is rebuilt from the spec
+       files on disk if it is missing or unreadable.
     """
     def __init__(self, root, **kwargs):
         """Prefix size is number of characters in the SHA-1 prefix to use
@@ -192,16 +279,26 @@ class SpecHashDirectoryLayout(DirectoryLayout):
         """
         spec_file_name = kwargs.get('spec_file_name', '.spec')
         extension_file_name = kwargs.get('extension_file_name', '.extensions')
+        index_file_name = kwargs.get('index_file_name', '.spec-index')
+        timing_file_name = kwargs.get('timing_file_name', '.timings')
         super(SpecHashDirectoryLayout, self).__init__(root)
         self.spec_file_name = spec_file_name
         self.extension_file_name = extension_file_name
+        self.index_file_name = index_file_name
+        self.timing_file_name = timing_file_name
 
         # Cache of already written/read extension maps.
         self._extension_maps = {}
 
+        # Index of installed specs: relative prefix path -> spec file text.
+        self._index = None
+
+        # Cache of specs already read from the index, keyed by prefix path.
+        self._specs = {}
+
     @property
     def hidden_file_paths(self):
-        return ('.spec', '.extensions')
+        return ('.spec', '.extensions', '.timings')
 
 
     def relative_path_for_spec(self, spec):
@@ -213,20 +310,34 @@ class SpecHashDirectoryLayout(DirectoryLayout):
     def write_spec(self, spec, path):
         """Write a spec out to a file."""
         with closing(open(path, 'w')) as spec_file:
-            spec_file.write(spec.tree(ids=False, cover='nodes'))
+            spec.to_json(spec_file)
 
 
     def read_spec(self, path):
         """Read the contents of a file and parse them as a spec"""
         with closing(open(path)) as spec_file:
-            # Specs from files are assumed normal and concrete
-            spec = Spec(spec_file.read().replace('\n', ''))
+            return self._spec_from_string(spec_file.read())
+
+
+    def _spec_from_string(self, string):
+        """Parse the contents of a spec file into a concrete spec."""
+        # Spec files store the full DAG, so there is no need to
+        # normalize or to look at package files.
+        if string.lstrip().startswith('{'):
+            spec = Spec.from_json(string)
+            spec._normal = True
+            spec._concrete = True
+            return spec
+
+        # Older spec files contain a flattened spec tree.
+        # Specs from files are assumed normal and concrete
+        spec = Spec(string.replace('\n', ''))
 
         if all(spack.db.exists(s.name) for s in spec.traverse()):
             copy = spec.copy()
 
-            # TODO: It takes a lot of time to normalize every spec on read.
-            # TODO: Storing graph info with spec files would fix this.
+            # Legacy spec files have no graph info, so normalize to
+            # reconstruct the DAG from the package files.
             copy.normalize()
             if copy.concrete:
                 return copy   # These are specs spack still understands.
@@ -238,9 +349,6 @@ class SpecHashDirectoryLayout(DirectoryLayout):
         # for commands like uninstall and find.  Currently Spack
         # doesn't do anything that needs the graph info after install.
 
-        # TODO: store specs with full connectivity information, so
-        # that we don't have to normalize or reconstruct based on
-        # changing dependencies in the Spack tree.
         spec._normal = True
         spec._concrete = True
         return spec
@@ -254,7 +362,11 @@ class SpecHashDirectoryLayout(DirectoryLayout):
 
     def make_path_for_spec(self, spec):
         _check_concrete(spec)
+        with self.prefix_locked(spec, write=True):
+            self._make_path_for_spec(spec)
+
 
+    def _make_path_for_spec(self, spec):
         path = self.path_for_spec(spec)
         spec_file_path = self.spec_file_path(spec)
 
@@ -279,21 +391,146 @@ class SpecHashDirectoryLayout(DirectoryLayout):
         mkdirp(path)
         self.write_spec(spec, spec_file_path)
 
+        with closing(open(spec_file_path)) as spec_file:
+            spec_text = spec_file.read()
 
-    @memoized
-    def all_specs(self):
+        # Re-read the index before updating it, in case another process
+        # has changed it since we last looked.
+        with self._index_lock(write=True):
+            self._index = None
+            index = self._read_index()
+            index[self.relative_path_for_spec(spec)] = spec_text
+            self._write_index(index)
+
+
+    def remove_path_for_spec(self, spec):
+        super(SpecHashDirectoryLayout, self).remove_path_for_spec(spec)
+
+        rel_path = self.relative_path_for_spec(spec)
+        with self._index_lock(write=True):
+            self._index = None
+            index = self._read_index()
+            if rel_path in index:
+                del index[rel_path]
+                self._write_index(index)
+        self._specs.pop(rel_path, None)
+
+
+    def index_file_path(self):
+        """Gets full path to the installed spec index."""
+        return join_path(self.root, self.index_file_name)
+
+
+    @contextmanager
+    def _index_lock(self, write=False):
+        """Hold a shared lock on the index while it is read, or an
+           exclusive one while it is updated, so that concurrent
+           installs do not see partial updates or lose each other's."""
+        path = self.index_file_path() + '.lock'
+        if path not in self._locks:
+            self._locks[path] = Lock(path)
+        lock = self._locks[path]
+
+        try:
+            if write:
+                lock.acquire_write(_metadata_lock_timeout)
+            else:
+                lock.acquire_read(_metadata_lock_timeout)
+        except LockError, e:
+            raise DirectoryLayoutError(str(e))
+
+        try:
+            yield
+        finally:
+            if write:
+                lock.release_write()
+            else:
+                lock.release_read()
+
+
+    def _read_index(self):
+        """Get the dict of installed spec file contents, keyed by
+           relative prefix path.  Reads the index file if it has not
+           been read yet, and rebuilds it from disk if it is missing or
+           corrupt.
+        """
+        if self._index is None:
+            path = self.index_file_path()
+            if os.path.isfile(path):
+                try:
+                    with self._index_lock():
+                        with closing(open(path)) as index_file:
+                            self._index = dict(
+                                (str(p), str(s))
+                                for p, s in json.load(index_file).items())
+                except (IOError, ValueError, AttributeError), e:
+                    tty.warn("Could not read installed spec index %s." % path,
+                             str(e), "Rebuilding it from install directories.")
+
+            if not isinstance(self._index, dict):
+                self.reindex()
+
+        return self._index
+
+
+    def _write_index(self, index):
+        """Atomically replace the index file with the supplied index."""
+        self._index = index
         if not os.path.isdir(self.root):
-            return []
+            return
 
-        specs = []
-        for path in traverse_dirs_at_depth(self.root, 3):
-            arch, compiler, last_dir = path
-            spec_file_path = join_path(
-                self.root, arch, compiler, last_dir, self.spec_file_name)
-            if os.path.exists(spec_file_path):
-                spec = self.read_spec(spec_file_path)
-                specs.append(spec)
-        return specs
+        path = self.index_file_path()
+        dirname, basename = os.path.split(path)
+        tmp = tempfile.NamedTemporaryFile(
+            prefix=basename, dir=dirname, delete=False)
+
+        with closing(tmp):
+            json.dump(index, tmp, sort_keys=True, indent=0)
+
+        # Atomic update by moving tmpfile on top of old one.
+        os.rename(tmp.name, path)
+
+
+    def reindex(self):
+        """Rebuild the installed spec index by reading every spec file
+           in the install tree.
+        """
+        if not os.path.isdir(self.root):
+            self._specs.clear()
+            self._index = {}
+            return
+
+        with self._index_lock(write=True):
+            index = {}
+            for path in traverse_dirs_at_depth(self.root, 3):
+                rel_path = join_path(*path)
+                spec_file_path = join_path(
+                    self.root, rel_path, self.spec_file_name)
+                if os.path.exists(spec_file_path):
+                    with closing(open(spec_file_path)) as spec_file:
+                        index[rel_path] = spec_file.read()
+
+            self._specs.clear()
+            self._write_index(index)
+
+
+    def all_specs(self):
+        index = self._read_index()
+
+        # Only parse specs that we haven't already read.
+        for rel_path in set(self._specs).difference(index):
+            del self._specs[rel_path]
+        for rel_path, spec_text in index.items():
+            if rel_path not in self._specs:
+                self._specs[rel_path] = self._spec_from_string(spec_text)
+
+        return [self._specs[p] for p in sorted(self._specs)]
+
+
+    def timing_file_path(self, spec):
+        """Gets full path to an installed package's timing file"""
+        _check_concrete(spec)
+        return join_path(self.path_for_spec(spec), self.timing_file_name)
 
 
     def extension_file_path(self, spec):
@@ -406,6 +643,16 @@ class SpecHashCollisionError(DirectoryLayoutError):
             % installed_spec, new_spec)
 
 
+class PrefixLockError(DirectoryLayoutError):
+    """Raised when the lock on an install prefix can't be taken in time."""
+    def __init__(self, spec, prefix, error):
+        super(PrefixLockError, self).__init__(
+            "Could not lock prefix %s for %s: %s.  Another Spack process "
+            "may be installing or removing it.  If none is, remove the "
+            "lock file." % (prefix, spec.short_spec, error))
+        self.cause = error
+
+
 class RemoveFailedError(DirectoryLayoutError):
     """Raised when a DirectoryLayout cannot remove an install prefix."""
     def __init__(self, installed_spec, prefix, error):
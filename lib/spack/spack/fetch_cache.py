@@ -0,0 +1,198 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+This module keeps a local cache of downloaded source archives.
+
+Stage.destroy() removes a package's archive along with the rest of its
+stage, so without a cache, rebuilding a package with another compiler
+or variant would download it again.  Instead, archives that pass their
+checksum are copied into the cache, and later stages look there before
+going to the network.
+
+Archives are stored by checksum, under the same names they have in a
+mirror::
+
+    <root>/<package>/<digest>/<package>-<version>.<ext>
+
+so an archive is only ever used for a fetch that expects exactly its
+contents, and is checked again before it is used.  When the cache
+grows past its maximum size, the least recently used archives are
+removed.
+"""
+import os
+import shutil
+import tempfile
+
+import llnl.util.tty as tty
+from llnl.util.filesystem import join_path, mkdirp
+
+from spack.util.crypto import Checker
+
+
+class FetchCache(object):
+    """A size-bounded cache of source archives, keyed by checksum."""
+    def __init__(self, root, max_size=None):
+        """max_size is the size of the cache in bytes past which archives
+           are evicted.  If it is None, the cache can grow without bound."""
+        self.root = root
+        self.max_size = max_size
+
+
+    def path_for(self, digest, mirror_path):
+        """Path where an archive with the given digest and mirror path
+           (see spack.mirror.mirror_archive_path) is cached."""
+        return join_path(self.root, os.path.dirname(mirror_path), digest,
+                         os.path.basename(mirror_path))
+
+
+    def fetch(self, digest, mirror_path, dest_dir):
+        """Copy a cached archive into dest_dir, if there is one and it
+           still matches its digest.  Returns the path of the copy, or
+           None if the archive isn't cached."""
+        path = self.path_for(digest, mirror_path)
+        if not os.path.isfile(path):
+            return None
+
+        if not Checker(digest).check(path):
+            tty.warn("Removing corrupt archive from the download cache: %s" % path)
+            self._remove(path)
+            return None
+
+        dest = join_path(dest_dir, os.path.basename(mirror_path))
+        try:
+            _link_or_copy(path, dest)
+            # Cache entries are evicted by modification time.
+            os.utime(path, None)
+        except (IOError, OSError), e:
+            tty.debug("Could not use cached archive %s: %s" % (path, e))
+            return None
+        return dest
+
+
+    def store(self, digest, mirror_path, archive_file):
+        """Add an archive that has already been checked against digest
+           to the cache, then evict old archives if the cache is full."""
+        if os.path.isfile(self.path_for(digest, mirror_path)):
+            return
+
+        try:
+            tmp = self.temp_path(digest, mirror_path)
+            _link_or_copy(archive_file, tmp)
+        except (IOError, OSError), e:
+            tty.debug("Could not cache archive %s: %s" % (archive_file, e))
+            return
+        self.commit(tmp, digest, mirror_path)
+
+
+    def temp_path(self, digest, mirror_path):
+        """Make a temporary file that an archive can be written to while
+           it is downloaded, and then added to the cache with commit()."""
+        entry_dir = os.path.dirname(self.path_for(digest, mirror_path))
+        mkdirp(entry_dir)
+        fd, tmp = tempfile.mkstemp(dir=entry_dir, prefix='.tmp-')
+        os.close(fd)
+        return tmp
+
+
+    def commit(self, tmp, digest, mirror_path):
+        """Add an archive written to a temp_path() to the cache.  It
+           must already have been checked against digest."""
+        try:
+            os.rename(tmp, self.path_for(digest, mirror_path))
+        except OSError, e:
+            tty.debug("Could not cache archive %s: %s" % (tmp, e))
+            self._remove(tmp)
+            return
+
+        if self.max_size is not None:
+            self.trim(self.max_size)
+
+
+    def entries(self):
+        """List (path, size, mtime) for every cached archive, least
+           recently used first."""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.startswith('.tmp-'):
+                    continue
+                path = join_path(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, st.st_size, st.st_mtime))
+        entries.sort(key=lambda e: e[2])
+        return entries
+
+
+    def size(self):
+        """Total size of the cached archives in bytes."""
+        return sum(size for path, size, mtime in self.entries())
+
+
+    def trim(self, max_size):
+        """Remove least recently used archives until the cache is no
+           larger than max_size bytes.  Returns the removed paths."""
+        entries = self.entries()
+        total = sum(size for path, size, mtime in entries)
+
+        removed = []
+        for path, size, mtime in entries:
+            if total <= max_size:
+                break
+            self._remove(path)
+            total -= size
+            removed.append(path)
+        return removed
+
+
+    def clean(self):
+        """Remove everything from the cache."""
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+    def _remove(self, path):
+        """Remove a cached archive and any directories it leaves empty."""
+        try:
+            os.remove(path)
+            path = os.path.dirname(path)
+            while path != self.root and not os.listdir(path):
+                os.rmdir(path)
+                path = os.path.dirname(path)
+        except OSError:
+            pass
+
+
+def _link_or_copy(src, dest):
+    """Hard link src to dest if they're on the same filesystem, and copy
+       it otherwise."""
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
@@ -43,17 +43,25 @@ in order to build it.  They need to define the following methods:
 import os
 import sys
 import re
+import time
 import shutil
+import subprocess
 from functools import wraps
+from contextlib import closing
 import llnl.util.tty as tty
 from llnl.util.filesystem import *
 import spack
 import spack.error
 import spack.util.crypto as crypto
+from spack.util.cache_file import read_json, write_json
 from spack.util.executable import *
 from spack.util.string import *
 from spack.version import Version, ver
-from spack.util.compression import decompressor_for, extension
+import spack.util.compression as compression
+from spack.util.compression import extension
+
+"""Size of the blocks URLFetchStrategy reads downloads in."""
+_block_size = 2**20
 
 """List of all fetch strategies, created by FetchStrategy metaclass."""
 all_strategies = []
@@ -111,6 +119,19 @@ class FetchStrategy(object):
         return any(k in args for k in cls.required_attributes)
 
 
+def _file_id(path):
+    """Identifies a file's contents well enough to tell if it has been
+       replaced."""
+    st = os.stat(path)
+    return [os.path.realpath(path), st.st_ino, st.st_size, st.st_mtime]
+
+
+# Name of the file in a stage that records which archive was verified,
+# and version of its format.
+_verified_file_name = '.spack-verified'
+_verified_format = 1
+
+
 class URLFetchStrategy(FetchStrategy):
     """FetchStrategy that pulls source code from a URL for an archive,
        checks the archive against a checksum,and decompresses the archive.
@@ -132,8 +153,31 @@ class URLFetchStrategy(FetchStrategy):
         if not self.url:
             raise ValueError("URLFetchStrategy requires a url for fetching.")
 
+        # If set, fetch() also writes the archive here.
+        self.copy_path = None
+
+        # If set to a hashlib algorithm, fetch() also computes the
+        # archive's digest with it, and stores it in archive_digest.
+        self.hash_algorithm = None
+        self.archive_digest = None
+
+        # Whether curl shows a progress bar when output is a terminal.
+        # Turn this off when several fetches run at once.
+        self.progress_bar = True
+
+        # Identifies an archive that's known to match the digest.
+        self._verified = None
+
     @_needs_stage
     def fetch(self):
+        """Download the archive with curl.
+
+           The archive is read from curl as it arrives, so its checksum
+           is computed in the same pass as it is written to disk, and
+           so is the optional copy at self.copy_path.  If the checksum
+           doesn't match and spack.do_checksum is set, the archive is
+           removed and ChecksumError is raised.
+        """
         self.stage.chdir()
 
         if self.archive_file:
@@ -142,31 +186,80 @@ class URLFetchStrategy(FetchStrategy):
 
         tty.msg("Trying to fetch from %s" % self.url)
 
-        curl_args = ['-O',        # save file to disk
-                     '-f',        # fail on >400 errors
-                     '-D', '-',   # print out HTML headers
+        save_file = os.path.join(self.stage.path, os.path.basename(self.url))
+        partial_file = save_file + '.part'
+        headers_file = os.path.join(self.stage.path, '.curl-headers')
+
+        curl_args = ['-f',        # fail on >400 errors
+                     '-D', headers_file,   # save HTML headers
                      '-L', self.url,]
 
-        if sys.stdout.isatty():
+        if sys.stdout.isatty() and self.progress_bar:
             curl_args.append('-#')  # status bar when using a tty
         else:
             curl_args.append('-sS') # just errors when not.
 
-        # Run curl but grab the mime type from the http headers
-        headers = spack.curl(
-            *curl_args, return_output=True, fail_on_error=False)
-
-        if spack.curl.returncode != 0:
+        # Digests Spack can't check are left for check() to complain
+        # about, so they don't get in the way of fetching without a check.
+        checker = None
+        if self.digest:
+            try:
+                checker = crypto.Checker(self.digest)
+            except ValueError:
+                pass
+
+        hashers = []
+        if checker:
+            hashers.append(checker.hash_fun())
+        if self.hash_algorithm:
+            hashers.append(self.hash_algorithm())
+
+        outputs = [partial_file]
+        if self.copy_path:
+            outputs.append(self.copy_path)
+
+        try:
+            files = [open(path, 'wb') for path in outputs]
+            try:
+                curl = subprocess.Popen(spack.curl.exe + curl_args,
+                                        stdout=subprocess.PIPE)
+                while True:
+                    data = curl.stdout.read(_block_size)
+                    if not data:
+                        break
+                    for hasher in hashers:
+                        hasher.update(data)
+                    for f in files:
+                        f.write(data)
+                returncode = curl.wait()
+            finally:
+                for f in files:
+                    f.close()
+
+            with closing(open(headers_file)) as f:
+                headers = f.read()
+
+        except (IOError, OSError), e:
+            returncode = None
+            headers = ''
+            tty.debug(e)
+
+        finally:
+            if os.path.exists(headers_file):
+                os.remove(headers_file)
+
+        if returncode != 0:
             # clean up archive on failure.
-            if self.archive_file:
-                os.remove(self.archive_file)
+            for path in outputs:
+                if os.path.exists(path):
+                    os.remove(path)
 
-            if spack.curl.returncode == 22:
+            if returncode == 22:
                 # This is a 404.  Curl will print the error.
                 raise FailedDownloadError(
                     self.url, "URL %s was not found!" % self.url)
 
-            elif spack.curl.returncode == 60:
+            elif returncode == 60:
                 # This is a certificate error.  Suggest spack -k
                 raise FailedDownloadError(
                     self.url,
@@ -176,12 +269,17 @@ class URLFetchStrategy(FetchStrategy):
                     "can try running spack -k, which will not check SSL certificates."
                     "Use this at your own risk.")
 
+            elif returncode is None:
+                raise FailedDownloadError(
+                    self.url, "Could not save download from %s" % self.url)
+
             else:
                 # This is some other curl error.  Curl will print the
                 # error, but print a spack message too
                 raise FailedDownloadError(
-                    self.url, "Curl failed with error %d" % spack.curl.returncode)
+                    self.url, "Curl failed with error %d" % returncode)
 
+        os.rename(partial_file, save_file)
 
         # Check if we somehow got an HTML file rather than the archive we
         # asked for.  We only look at the last content type, to handle
@@ -196,12 +294,57 @@ class URLFetchStrategy(FetchStrategy):
         if not self.archive_file:
             raise FailedDownloadError(self.url)
 
+        if self.hash_algorithm:
+            self.archive_digest = hashers[-1].hexdigest()
+
+        if checker:
+            checker.sum = hashers[0].hexdigest()
+            if checker.sum == self.digest:
+                self.mark_verified(save_file)
+            elif spack.do_checksum:
+                os.remove(save_file)
+                if self.copy_path:
+                    os.remove(self.copy_path)
+                raise ChecksumError(
+                    "%s checksum failed for %s." % (checker.hash_name, save_file),
+                    "Expected %s but got %s." % (self.digest, checker.sum))
+
 
     @property
     def archive_file(self):
         """Path to the source archive within this stage directory."""
         return self.stage.archive_file
 
+
+    @property
+    def _verified_file(self):
+        return os.path.join(self.stage.path, _verified_file_name)
+
+
+    def mark_verified(self, path):
+        """Record that the archive at path matches this fetcher's digest,
+           so that check() doesn't need to read it again.  This is also
+           written to the stage, so that other processes fetching from
+           it, e.g. after a prefetch, know too."""
+        self._verified = _file_id(path)
+        write_json(self._verified_file, { 'digest' : self.digest,
+                                          'file'   : self._verified },
+                   _verified_format)
+
+
+    def verified(self):
+        """True if the archive is known to match the digest already."""
+        archive_file = self.archive_file
+        if not archive_file:
+            return False
+
+        if self._verified is None:
+            data = read_json(self._verified_file, _verified_format)
+            if data and data.get('digest') == self.digest:
+                self._verified = data.get('file')
+
+        return bool(self._verified and _file_id(archive_file) == self._verified)
+
     @_needs_stage
     def expand(self):
         tty.msg("Staging archive: %s" % self.archive_file)
@@ -211,14 +354,14 @@ class URLFetchStrategy(FetchStrategy):
             raise NoArchiveFileError("URLFetchStrategy couldn't find archive file",
                                       "Failed on expand() for URL %s" % self.url)
 
-        decompress = decompressor_for(self.archive_file)
-
         # Expand all tarballs in their own directory to contain
         # exploding tarballs.
         tarball_container = os.path.join(self.stage.path, "spack-expanded-archive")
-        mkdirp(tarball_container)
-        os.chdir(tarball_container)
-        decompress(self.archive_file)
+        start_time = time.time()
+        nbytes = compression.expand(self.archive_file, tarball_container)
+        elapsed = time.time() - start_time
+        tty.msg("Expanded %.1f MB in %.2fs (%.1f MB/s)." % (
+            nbytes / 1e6, elapsed, nbytes / 1e6 / max(elapsed, 1e-3)))
 
         # If the tarball *didn't* explode, move
         # the expanded directory up & remove the protector directory.
@@ -251,6 +394,11 @@ class URLFetchStrategy(FetchStrategy):
         if not self.digest:
             raise NoDigestError("Attempt to check URLFetchStrategy with no digest.")
 
+        # Archives checked while they were downloaded don't need
+        # to be read again.
+        if self.verified():
+            return
+
         checker = crypto.Checker(self.digest)
         if not checker.check(self.archive_file):
             raise ChecksumError(
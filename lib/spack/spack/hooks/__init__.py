@@ -39,6 +39,9 @@
    This can be used to implement support for things like module
    systems (e.g. modules, dotkit, etc.) or to add other custom
    features.
+
+   If the package has a timer, the time taken by each hook module is
+   recorded as a phase, e.g. post_install/tclmodule.
 """
 import imp
 from llnl.util.lang import memoized, list_modules
@@ -62,11 +65,24 @@ class HookRunner(object):
         self.hook_name = hook_name
 
     def __call__(self, pkg):
+        timer = getattr(pkg, 'timer', None)
+        if timer is None:
+            self._run(pkg)
+        else:
+            with timer.phase(self.hook_name):
+                self._run(pkg, timer)
+
+
+    def _run(self, pkg, timer=None):
         for module in all_hook_modules():
             if hasattr(module, self.hook_name):
                 hook = getattr(module, self.hook_name)
                 if hasattr(hook, '__call__'):
-                    hook(pkg)
+                    if timer is None:
+                        hook(pkg)
+                    else:
+                        with timer.phase(module.__name__.split('.')[-1]):
+                            hook(pkg)
 
 
 #
@@ -0,0 +1,252 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+This module installs the packages in one or more concrete spec DAGs
+in parallel.  Independent packages (ones whose dependencies are all
+installed) are built at the same time, each in its own forked process
+that writes its output to a per-package log file.  Sources for the
+whole DAG can also be fetched concurrently before anything is built.
+
+Package.do_install() and Package.do_fetch() still do the real work;
+this just decides what to run when.
+"""
+import os
+import time
+import multiprocessing
+
+import llnl.util.tty as tty
+from llnl.util.filesystem import join_path, mkdirp
+
+import spack
+from spack.graph import topological_sort
+from spack.package import InstallError, FetchError
+from spack.timer import Timer, write_timing_file, read_timing_file
+from spack.util.multiproc import fork_with_log, schedule
+
+
+def install_order(specs, **kwargs):
+    """Get an installation order for all the nodes in some concrete specs.
+
+       Returns a tuple (order, nodes, deps):
+         order  List of install prefixes, sorted so that each package
+                comes after all of its dependencies.
+         nodes  Dict mapping each prefix to its spec.
+         deps   Dict mapping each prefix to the set of prefixes of its
+                direct dependencies.
+
+       Nodes are identified by install prefix, so packages shared by
+       several of the specs are only installed once.
+
+       If ignore_deps is True, only the specs themselves are included.
+    """
+    ignore_deps = kwargs.get('ignore_deps', False)
+
+    order = []
+    nodes = {}
+    deps  = {}
+    for spec in specs:
+        if not spec.concrete:
+            raise ValueError("Can only install concrete specs.")
+
+        names = [spec.name]
+        if not ignore_deps:
+            names = topological_sort(spec, reverse=True)
+
+        for name in names:
+            node = spec[name]
+            prefix = spack.install_layout.path_for_spec(node)
+            if prefix in nodes:
+                continue
+
+            order.append(prefix)
+            nodes[prefix] = node
+            deps[prefix] = set()
+            if not ignore_deps:
+                deps[prefix].update(spack.install_layout.path_for_spec(d)
+                                    for d in node.dependencies.values())
+
+    return order, nodes, deps
+
+
+def _log_tail(path, lines=10):
+    """Last few lines of a log file, to show with an error."""
+    try:
+        with open(path) as f:
+            return [l.rstrip('\n') for l in f.readlines()[-lines:]]
+    except IOError:
+        return []
+
+
+def _failure(verb, failed, skipped):
+    """Build the error message for a set of failed tasks."""
+    long_msg = None
+    if skipped:
+        long_msg = "Skipped because of failures: %s" % ", ".join(
+            s.short_spec for s in skipped)
+    return "Failed to %s %s." % (
+        verb, ", ".join(s.short_spec for s in failed)), long_msg
+
+
+def install(specs, jobs, **kwargs):
+    """Install some concrete specs and all of their dependencies,
+       running up to jobs package installs at once.
+
+       Make parallelism is divided among the concurrent installs.
+       If a package fails to install, no new installs are started, and
+       an InstallError is raised once the running ones finish.
+
+       Keyword args:
+         log_dir      Directory for per-package build logs.
+                      Defaults to spack.install_log_path.
+         ignore_deps  Install only the specs, not their dependencies.
+
+       Other keyword args are passed to Package.do_install().
+    """
+    log_dir = kwargs.pop('log_dir', spack.install_log_path)
+    ignore_deps = kwargs.pop('ignore_deps', False)
+    jobs = max(1, jobs)
+
+    order, nodes, deps = install_order(specs, ignore_deps=ignore_deps)
+    # Prefixes that other processes are still building are pending, and
+    # their do_install() waits for the other build to finish.
+    installed = set(p for p in order
+                    if spack.install_layout.installed(nodes[p], wait=False))
+    pending = [p for p in order if p not in installed]
+    if not pending:
+        tty.msg("All packages are already installed.")
+        return
+
+    # Already-installed dependencies don't need to wait for anything.
+    for prefix in pending:
+        deps[prefix] -= installed
+
+    mkdirp(log_dir)
+    make_jobs = max(1, multiprocessing.cpu_count() // jobs)
+
+    logs = {}
+    def start(prefix):
+        spec = nodes[prefix]
+        logs[prefix] = join_path(log_dir, spec.short_spec + '.log')
+        tty.msg("Installing %s" % spec.short_spec, "Log: %s" % logs[prefix])
+
+        def do_install():
+            spack.build_jobs = make_jobs
+            spec.package.do_install(ignore_deps=True, **kwargs)
+        return fork_with_log(do_install, logs[prefix])
+
+    def finish(prefix, ok):
+        spec = nodes[prefix]
+        ok = ok and os.path.isdir(prefix)
+        if ok:
+            tty.msg("Installed %s" % spec.short_spec)
+        else:
+            tty.error("Failed to install %s" % spec.short_spec,
+                      "See build log: %s" % logs[prefix])
+        return ok
+
+    succeeded, failed, skipped = schedule(pending, deps, jobs, start, finish)
+    if failed:
+        raise InstallError(*_failure(
+            'install', [nodes[p] for p in failed], [nodes[p] for p in skipped]))
+
+
+def fetch(specs, jobs, **kwargs):
+    """Fetch and checksum the sources for some concrete specs, up to
+       jobs at once.  This is used to download everything a build will
+       need up front, so that downloads overlap with each other instead
+       of with builds.
+
+       Packages that are already installed are skipped, as are
+       packages with no checksum for their version when checksums are
+       being enforced, since Package.do_fetch() needs to ask the user
+       about those.
+
+       The fetch and checksum times measured in each child are added
+       to its package's timer.
+
+       Keyword args:
+         log_dir      Directory for per-package fetch logs.
+                      Defaults to spack.install_log_path.
+         ignore_deps  Fetch only the specs, not their dependencies.
+    """
+    log_dir = kwargs.get('log_dir', spack.install_log_path)
+    ignore_deps = kwargs.get('ignore_deps', False)
+    jobs = max(1, jobs)
+
+    order, nodes, deps = install_order(specs, ignore_deps=ignore_deps)
+
+    def safe_to_fetch(spec):
+        pkg = spec.package
+        return not spack.do_checksum or pkg.version in pkg.versions
+
+    pending = [p for p in order
+               if not os.path.isdir(p) and safe_to_fetch(nodes[p])]
+    if not pending:
+        return
+
+    mkdirp(log_dir)
+    tty.msg("Fetching sources for %d packages." % len(pending))
+
+    logs = {}
+    timing_files = {}
+    def start(prefix):
+        spec = nodes[prefix]
+        logs[prefix] = join_path(log_dir, spec.short_spec + '-fetch.log')
+        timing_files[prefix] = join_path(
+            log_dir, spec.short_spec + '-fetch.timing.json')
+
+        def do_fetch():
+            # Hand the child's fetch and checksum times to the parent.
+            pkg = spec.package
+            pkg.timer = Timer()
+            start_time = time.time()
+            try:
+                pkg.do_fetch()
+            finally:
+                write_timing_file(timing_files[prefix], spec, pkg.timer,
+                                  start_time, time.time() - start_time)
+        return fork_with_log(do_fetch, logs[prefix])
+
+    def finish(prefix, ok):
+        spec = nodes[prefix]
+        timings = read_timing_file(timing_files[prefix])
+        if timings:
+            for name, seconds in timings['timer'].phases:
+                spec.package.timer.add(name, seconds)
+        if os.path.exists(timing_files[prefix]):
+            os.remove(timing_files[prefix])
+
+        if ok:
+            tty.msg("Fetched %s" % spec.short_spec)
+        else:
+            tty.error("Failed to fetch %s" % spec.short_spec,
+                      *(_log_tail(logs[prefix]) +
+                        ["See fetch log: %s" % logs[prefix]]))
+        return ok
+
+    succeeded, failed, skipped = schedule(pending, {}, jobs, start, finish)
+    if failed:
+        raise FetchError(*_failure(
+            'fetch', [nodes[p] for p in failed], [nodes[p] for p in skipped]))
@@ -29,9 +29,15 @@ files.  This enabled spack to know where to find files in a mirror if
 the main server for a particualr package is down.  Or, if the computer
 where spack is run is not connected to the internet, it allows spack
 to download packages directly from a mirror (e.g., on an intranet).
+
+Archives are fetched into a mirror by several forked children at once.
+Each archive that is added is recorded in a manifest in the mirror's
+root, so that creating the mirror again skips archives that are
+already there without looking for them on disk.
 """
 import sys
 import os
+import time
 import llnl.util.tty as tty
 from llnl.util.filesystem import *
 
@@ -43,6 +49,17 @@ from spack.spec import Spec
 from spack.stage import Stage
 from spack.version import *
 from spack.util.compression import extension
+from spack.util.cache_file import read_json, write_json
+from spack.util.multiproc import fork_with_log, schedule
+
+# Most archives fetched into a mirror at once.
+FETCH_JOBS = 4
+
+# Name of the manifest file in the root of a mirror.
+manifest_name = '.manifest.json'
+
+# Version of the manifest's file format.
+_manifest_format = 1
 
 
 def mirror_archive_filename(spec):
@@ -92,6 +109,75 @@ def get_matching_versions(specs, **kwargs):
     return matching
 
 
+def read_manifest(mirror_root):
+    """Get the archives recorded in a mirror's manifest, as a dict
+       mapping each package@version to a dict with the archive's path
+       in the mirror, its size, and the checksum it was added with."""
+    data = read_json(join_path(mirror_root, manifest_name), _manifest_format)
+    if data is None:
+        return {}
+    return data.get('archives', {})
+
+
+def write_manifest(mirror_root, archives):
+    write_json(join_path(mirror_root, manifest_name),
+               { 'archives' : archives }, _manifest_format)
+
+
+def _version_digest(spec):
+    """Checksum the package gives for the spec's version, if any."""
+    args = spec.package.versions.get(spec.version, {})
+    return args.get('md5')
+
+
+def _add_to_mirror(spec, archive_path, **kwargs):
+    """Fetch the source for a concrete spec and put an archive of it at
+       archive_path.  This runs in a forked child, and exits with
+       status 1 if anything goes wrong."""
+    pkg = spec.package
+    stage = None
+    try:
+        mkdirp(os.path.dirname(archive_path))
+
+        # Set up a stage and a fetcher for the download
+        unique_fetch_name = spec.format("$_$@")
+        fetcher = fs.for_package_version(pkg, pkg.version)
+        if isinstance(fetcher, fs.URLFetchStrategy):
+            fetcher.progress_bar = kwargs.get('progress_bar', True)
+        stage = Stage(fetcher, name=unique_fetch_name)
+        fetcher.set_stage(stage)
+
+        # Do the fetch and checksum if necessary
+        fetcher.fetch()
+        if not kwargs.get('no_checksum', False):
+            fetcher.check()
+            tty.msg("Checksum passed for %s@%s" % (pkg.name, pkg.version))
+
+        # Fetchers have to know how to archive their files.  Use
+        # that to move/copy/create an archive in the mirror.  The
+        # archive is renamed into place so that an interrupted
+        # fetch never leaves a partial archive in the mirror.
+        tmp_path = join_path(os.path.dirname(archive_path),
+                             '.tmp-' + os.path.basename(archive_path))
+        fetcher.archive(tmp_path)
+        os.rename(tmp_path, archive_path)
+
+    except Exception, e:
+        if spack.debug:
+            sys.excepthook(*sys.exc_info())
+        else:
+            tty.warn("Error while fetching %s." % spec.format('$_$@'), e.message)
+        sys.exit(1)
+
+    finally:
+        if stage:
+            stage.destroy()
+
+
+def _size_str(bytes):
+    return "%.1f MB" % (bytes / float(2**20))
+
+
 def create(path, specs, **kwargs):
     """Create a directory to be used as a spack mirror, and fill it with
        package archives.
@@ -105,6 +191,8 @@ def create(path, specs, **kwargs):
          no_checksum:  If True, do not checkpoint when fetching (default False)
          num_versions: Max number of versions to fetch per spec,
                        if spec is ambiguous (default is 0 for all of them)
+         jobs:         Max number of archives to fetch at once
+                       (default FETCH_JOBS)
 
        Return Value:
          Returns a tuple of lists: (present, mirrored, error)
@@ -115,6 +203,10 @@ def create(path, specs, **kwargs):
        This routine iterates through all known package versions, and
        it creates specs for those versions.  If the version satisfies any spec
        in the specs list, it is downloaded and added to the mirror.
+
+       Versions in the mirror's manifest are skipped, as long as the
+       package's checksum for them hasn't changed.  Remove the manifest
+       to make this look for every archive on disk again.
     """
     # Make sure nothing is in the way.
     if os.path.isfile(path):
@@ -124,10 +216,18 @@ def create(path, specs, **kwargs):
     specs = [s if isinstance(s, Spec) else Spec(s) for s in specs]
 
     # Get concrete specs for each matching version of these specs.
-    version_specs = get_matching_versions(
-        specs, num_versions=kwargs.get('num_versions', 0))
-    for s in version_specs:
-        s.concretize()
+    # Overlapping specs can match the same version more than once.
+    version_specs = []
+    seen = set()
+    for spec in get_matching_versions(
+            specs, num_versions=kwargs.get('num_versions', 0)):
+        key = spec.format("$_$@")
+        if key not in seen:
+            seen.add(key)
+            version_specs.append(spec)
+
+    no_checksum = kwargs.get('no_checksum', False)
+    jobs = max(1, kwargs.get('jobs', FETCH_JOBS))
 
     # Get the absolute path of the root before we start jumping around.
     mirror_root = os.path.abspath(path)
@@ -139,50 +239,73 @@ def create(path, specs, **kwargs):
     mirrored = []
     error    = []
 
-    # Iterate through packages and download all the safe tarballs for each of them
+    # Skip versions in the manifest without concretizing them.  Others
+    # may still be in the mirror, e.g. if an older Spack added them.
+    manifest = read_manifest(mirror_root)
+    manifest_changed = False
+    nodes = {}
+    paths = {}
     for spec in version_specs:
-        pkg = spec.package
+        key = spec.format("$_$@")
+        entry = manifest.get(key)
+        if entry and entry.get('digest') == _version_digest(spec):
+            present.append(spec)
+            continue
 
-        stage = None
-        try:
-            # create a subdirectory for the current package@version
-            archive_path = os.path.abspath(join_path(path, mirror_archive_path(spec)))
-            subdir = os.path.dirname(archive_path)
-            mkdirp(subdir)
-
-            if os.path.exists(archive_path):
-                tty.msg("Already added %s" % spec.format("$_$@"))
-                present.append(spec)
-                continue
-
-            # Set up a stage and a fetcher for the download
-            unique_fetch_name = spec.format("$_$@")
-            fetcher = fs.for_package_version(pkg, pkg.version)
-            stage = Stage(fetcher, name=unique_fetch_name)
-            fetcher.set_stage(stage)
-
-            # Do the fetch and checksum if necessary
-            fetcher.fetch()
-            if not kwargs.get('no_checksum', False):
-                fetcher.check()
-                tty.msg("Checksum passed for %s@%s" % (pkg.name, pkg.version))
-
-            # Fetchers have to know how to archive their files.  Use
-            # that to move/copy/create an archive in the mirror.
-            fetcher.archive(archive_path)
-            tty.msg("Added %s." % spec.format("$_$@"))
-            mirrored.append(spec)
-
-        except Exception, e:
-            if spack.debug:
-                sys.excepthook(*sys.exc_info())
-            else:
-                tty.warn("Error while fetching %s." % spec.format('$_$@'), e.message)
-            error.append(spec)
+        spec.concretize()
+        archive_path = join_path(mirror_root, mirror_archive_path(spec))
+        if os.path.exists(archive_path):
+            tty.msg("Already added %s" % key)
+            manifest[key] = { 'path'   : mirror_archive_path(spec),
+                              'size'   : os.path.getsize(archive_path),
+                              'digest' : _version_digest(spec) }
+            manifest_changed = True
+            present.append(spec)
+            continue
+
+        nodes[key] = spec
+        paths[key] = archive_path
 
-        finally:
-            if stage:
-                stage.destroy()
+    if manifest_changed:
+        write_manifest(mirror_root, manifest)
+    if present:
+        tty.msg("%d archives are already in the mirror." % len(present))
+
+    start_times = {}
+    def start(key):
+        start_times[key] = time.time()
+        return fork_with_log(lambda: _add_to_mirror(
+            nodes[key], paths[key], no_checksum=no_checksum,
+            progress_bar=(jobs == 1)))
+
+    def finish(key, ok):
+        spec = nodes[key]
+        if not (ok and os.path.isfile(paths[key])):
+            error.append(spec)
+            return True     # Keep going with the other archives.
+
+        size = os.path.getsize(paths[key])
+        elapsed = max(time.time() - start_times[key], 1e-6)
+        tty.msg("Added %s (%s in %.1fs, %s/s)." % (
+            key, _size_str(size), elapsed, _size_str(size / elapsed)))
+
+        # Record it right away, so an interrupted run can resume.
+        manifest[key] = { 'path'   : mirror_archive_path(spec),
+                          'size'   : size,
+                          'digest' : _version_digest(spec) }
+        write_manifest(mirror_root, manifest)
+        mirrored.append(spec)
+        return True
+
+    start_time = time.time()
+    order = [s.format("$_$@") for s in version_specs if s.format("$_$@") in nodes]
+    schedule(order, {}, jobs, start, finish)
+
+    if mirrored:
+        total = sum(manifest[s.format("$_$@")]['size'] for s in mirrored)
+        elapsed = max(time.time() - start_time, 1e-6)
+        tty.msg("Fetched %d archives: %s in %.1fs (%s/s)." % (
+            len(mirrored), _size_str(total), elapsed, _size_str(total / elapsed)))
 
     return (present, mirrored, error)
 
@@ -177,7 +177,9 @@ class EnvModule(object):
 
     def remove(self):
         mod_file = self.file_name
-        if os.path.exists(mod_file):
+        if os.path.isfile(mod_file):
+            os.remove(mod_file)
+        elif os.path.exists(mod_file):
             shutil.rmtree(mod_file, ignore_errors=True)
 
 
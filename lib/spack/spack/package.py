@@ -60,6 +60,7 @@ import spack.url as url
 import spack.fetch_strategy as fs
 from spack.version import *
 from spack.stage import Stage
+from spack.timer import Timer, write_timing_file, read_timing_file
 from spack.util.web import get_pages
 from spack.util.compression import allowed_archive, extension
 from spack.util.executable import ProcessError
@@ -401,9 +402,8 @@ class Package(object):
         if not hasattr(self, 'list_depth'):
             self.list_depth = 1
 
-        # Set up some internal variables for timing.
-        self._fetch_time = 0.0
-        self._total_time = 0.0
+        # Times for each phase of fetching and installing.
+        self.timer = Timer()
 
         if self.is_extension:
             spack.db.get(self.extendee_spec)._check_extendable()
@@ -615,7 +615,9 @@ class Package(object):
 
     @property
     def installed(self):
-        return os.path.isdir(self.prefix)
+        """Whether the package is completely installed.  Waits for any
+           other process that is installing it to finish."""
+        return spack.install_layout.installed(self.spec)
 
 
     @property
@@ -665,7 +667,6 @@ class Package(object):
         if not self.spec.concrete:
             raise ValueError("Can only fetch concrete packages.")
 
-        start_time = time.time()
         if spack.do_checksum and not self.version in self.versions:
             tty.warn("There is no checksum on file to fetch %s safely."
                      % self.spec.format('$_$@'))
@@ -683,11 +684,12 @@ class Package(object):
                 raise FetchError(
                     "Will not fetch %s." % self.spec.format('$_$@'), checksum_msg)
 
-        self.stage.fetch()
-        self._fetch_time = time.time() - start_time
+        with self.timer.phase('fetch'):
+            self.stage.fetch()
 
         if spack.do_checksum and self.version in self.versions:
-            self.stage.check()
+            with self.timer.phase('checksum'):
+                self.stage.check()
 
 
     def do_stage(self):
@@ -700,7 +702,8 @@ class Package(object):
 
         archive_dir = self.stage.source_path
         if not archive_dir:
-            self.stage.expand_archive()
+            with self.timer.phase('expand'):
+                self.stage.expand_archive()
             tty.msg("Created stage in %s." % self.stage.path)
         else:
             tty.msg("Already staged %s in %s." % (self.name, self.stage.path))
@@ -743,26 +746,27 @@ class Package(object):
             tty.msg("Already patched %s" % self.name)
             return
 
-        # Apply all the patches for specs that match this one
-        for spec, patch_list in self.patches.items():
-            if self.spec.satisfies(spec):
-                for patch in patch_list:
-                    tty.msg('Applying patch %s' % patch.path_or_url)
-                    try:
-                        patch.apply(self.stage)
-                    except:
-                        # Touch bad file if anything goes wrong.
-                        touch(bad_file)
-                        raise
-
-        # patch succeeded.  Get rid of failed file & touch good file so we
-        # don't try to patch again again next time.
-        if os.path.isfile(bad_file):
-            os.remove(bad_file)
-        touch(good_file)
-
-        if has_patch_fun:
-            self.patch()
+        with self.timer.phase('patch'):
+            # Apply all the patches for specs that match this one
+            for spec, patch_list in self.patches.items():
+                if self.spec.satisfies(spec):
+                    for patch in patch_list:
+                        tty.msg('Applying patch %s' % patch.path_or_url)
+                        try:
+                            patch.apply(self.stage)
+                        except:
+                            # Touch bad file if anything goes wrong.
+                            touch(bad_file)
+                            raise
+
+            # patch succeeded.  Get rid of failed file & touch good file so we
+            # don't try to patch again again next time.
+            if os.path.isfile(bad_file):
+                os.remove(bad_file)
+            touch(good_file)
+
+            if has_patch_fun:
+                self.patch()
 
         tty.msg("Patched %s" % self.name)
 
@@ -788,7 +792,7 @@ class Package(object):
         if not self.spec.concrete:
             raise ValueError("Can only install concrete packages.")
 
-        if os.path.exists(self.prefix):
+        if self.installed:
             tty.msg("%s is already installed in %s." % (self.name, self.prefix))
             return
 
@@ -797,77 +801,106 @@ class Package(object):
         if not ignore_deps:
             self.do_install_dependencies(**kwargs)
 
-        start_time = time.time()
-        if not fake_install:
-            self.do_patch()
-
-        # create the install directory.  The install layout
-        # handles this in case so that it can use whatever
-        # package naming scheme it likes.
-        spack.install_layout.make_path_for_spec(self.spec)
-
-        def cleanup():
-            if not keep_prefix:
-                # If anything goes wrong, remove the install prefix
-                self.remove_prefix()
-            else:
-                tty.warn("Keeping install prefix in place despite error.",
-                         "Spack will think this package is installed." +
-                         "Manually remove this directory to fix:",
-                         self.prefix)
-
-        def real_work():
-            try:
-                tty.msg("Building %s." % self.name)
-
-                # Run the pre-install hook in the child process after
-                # the directory is created.
-                spack.hooks.pre_install(self)
-
-                # Set up process's build environment before running install.
-                self.stage.chdir_to_source()
-                if fake_install:
-                    self.do_fake_install()
+        # Hold the prefix lock for the rest of the install, so that
+        # concurrent Spack processes can't build the same package.
+        with spack.install_layout.prefix_locked(self.spec, write=True):
+            if os.path.exists(self.prefix):
+                tty.msg("%s was installed by another process in %s."
+                        % (self.name, self.prefix))
+                return
+
+            start_time = time.time()
+            if not fake_install:
+                self.do_patch()
+
+            # create the install directory.  The install layout
+            # handles this in case so that it can use whatever
+            # package naming scheme it likes.
+            spack.install_layout.make_path_for_spec(self.spec)
+
+            def cleanup():
+                if not keep_prefix:
+                    # If anything goes wrong, remove the install prefix
+                    self.remove_prefix()
                 else:
-                    # Subclasses implement install() to do the real work.
-                    self.install(self.spec, self.prefix)
-
-                # Ensure that something was actually installed.
-                self._sanity_check_install()
-
-                # On successful install, remove the stage.
-                if not keep_stage:
-                    self.stage.destroy()
-
-                # Stop timer.
-                self._total_time = time.time() - start_time
-                build_time = self._total_time - self._fetch_time
-
-                tty.msg("Successfully installed %s." % self.name,
-                        "Fetch: %s.  Build: %s.  Total: %s."
-                        % (_hms(self._fetch_time), _hms(build_time), _hms(self._total_time)))
-                print_pkg(self.prefix)
-
-            except ProcessError, e:
-                # One of the processes returned an error code.
-                # Suppress detailed stack trace here unless in debug mode
-                if spack.debug:
-                    raise e
-                else:
-                    tty.error(e)
+                    tty.warn("Keeping install prefix in place despite error.",
+                             "Spack will think this package is installed." +
+                             "Manually remove this directory to fix:",
+                             self.prefix)
+
+            def real_work():
+                try:
+                    tty.msg("Building %s." % self.name)
+
+                    # Run the pre-install hook in the child process after
+                    # the directory is created.
+                    spack.hooks.pre_install(self)
+
+                    # Set up process's build environment before running install.
+                    self.stage.chdir_to_source()
+                    with self.timer.phase('install'):
+                        if fake_install:
+                            self.do_fake_install()
+                        else:
+                            # Subclasses implement install() to do the real work.
+                            self.install(self.spec, self.prefix)
+
+                    # Ensure that something was actually installed.
+                    self._sanity_check_install()
+
+                    # On successful install, remove the stage.
+                    if not keep_stage:
+                        self.stage.destroy()
+
+                    # Stop timer.
+                    total_time = time.time() - start_time
+                    fetch_time = self.timer.get('fetch')
+                    build_time = total_time - fetch_time
+
+                    # Hand the timings to the parent process.
+                    self._write_timing_file(start_time)
+
+                    tty.msg("Successfully installed %s." % self.name,
+                            "Fetch: %s.  Build: %s.  Total: %s."
+                            % (_hms(fetch_time), _hms(build_time), _hms(total_time)))
+                    print_pkg(self.prefix)
+
+                except ProcessError, e:
+                    # One of the processes returned an error code.
+                    # Suppress detailed stack trace here unless in debug mode
+                    if spack.debug:
+                        raise e
+                    else:
+                        tty.error(e)
 
-                # Still need to clean up b/c there was an error.
-                cleanup()
+                    # Still need to clean up b/c there was an error.
+                    cleanup()
 
-            except:
-                # other exceptions just clean up and raise.
-                cleanup()
-                raise
+                except:
+                    # other exceptions just clean up and raise.
+                    cleanup()
+                    raise
 
-        build_env.fork(self, real_work)
+            build_env.fork(self, real_work)
+
+            # Pick up the phases the build process timed.
+            timing_file = spack.install_layout.timing_file_path(self.spec)
+            timings = read_timing_file(timing_file)
+            if timings:
+                self.timer = timings['timer']
+
+            # Once everything else is done, run post install hooks
+            spack.hooks.post_install(self)
+
+            if os.path.isdir(self.prefix):
+                self._write_timing_file(start_time)
 
-        # Once everything else is done, run post install hooks
-        spack.hooks.post_install(self)
+
+    def _write_timing_file(self, start_time):
+        """Record the install's phase timings in its prefix."""
+        write_timing_file(spack.install_layout.timing_file_path(self.spec),
+                          self.spec, self.timer, start_time,
+                          time.time() - start_time)
 
 
     def _sanity_check_install(self):
@@ -1118,12 +1151,7 @@ class Package(object):
     @property
     def rpath(self):
         """Get the rpath this package links with, as a list of paths."""
-        rpaths = [self.prefix.lib, self.prefix.lib64]
-        rpaths.extend(d.prefix.lib for d in self.spec.traverse(root=False)
-                      if os.path.isdir(d.prefix.lib))
-        rpaths.extend(d.prefix.lib64 for d in self.spec.traverse(root=False)
-                      if os.path.isdir(d.prefix.lib64))
-        return rpaths
+        return build_env.get_rpaths(self)
 
 
     @property
@@ -1132,9 +1160,10 @@ class Package(object):
         return " ".join("-Wl,-rpath=%s" % p for p in self.rpath)
 
 
-def find_versions_of_archive(*archive_urls, **kwargs):
-    list_url   = kwargs.get('list_url', None)
-    list_depth = kwargs.get('list_depth', 1)
+def find_list_urls(*archive_urls, **kwargs):
+    """Get the set of pages to look for versions of some archives on,
+       based on the archive urls and any explicit list_url."""
+    list_url = kwargs.get('list_url', None)
 
     # Generate a list of list_urls based on archive urls and any
     # explicitly listed list_url in the package
@@ -1143,13 +1172,24 @@ def find_versions_of_archive(*archive_urls, **kwargs):
         list_urls.add(list_url)
     for aurl in archive_urls:
         list_urls.add(url.find_list_url(aurl))
+    return list_urls
+
+
+def find_versions_of_archive(*archive_urls, **kwargs):
+    list_depth = kwargs.get('list_depth', 1)
+    list_urls  = find_list_urls(*archive_urls, **kwargs)
+
+    # Grab some web pages to scrape.  Pages are cached, and only
+    # fetched again once they're stale and have changed.
+    page_map = get_pages(*list_urls, depth=list_depth, cache=spack.page_cache)
+    return versions_from_pages(archive_urls, page_map)
 
-    # Grab some web pages to scrape.
-    page_map = {}
-    for lurl in list_urls:
-        page_map.update(get_pages(lurl, depth=list_depth))
 
-    # Scrape them for archive URLs
+def versions_from_pages(archive_urls, page_map):
+    """Find versions of some archives linked from some web pages.
+       page_map maps page URLs to their contents.  Returns a dict
+       mapping each Version found to its URL."""
+    # Scrape the pages for archive URLs
     regexes = []
     for aurl in archive_urls:
         # This creates a regex from the URL with a capture group for
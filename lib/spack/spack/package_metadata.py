@@ -0,0 +1,254 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+This module keeps a persistent cache of the metadata that packages
+declare with relations like version(), depends_on(), provides() and
+extends().
+
+Getting that metadata normally means loading every package.py file
+with imp.load_source, which is slow when all we want to know is, say,
+which packages provide mpi.  The cache stores the metadata for every
+package in a JSON file, along with the modification time of the
+package.py it came from.  A package is only loaded again when its
+package.py changes.
+
+The index of virtual package providers is cached the same way, and
+when packages change only their entries in the index are rebuilt.
+"""
+import os
+import hashlib
+
+import llnl.util.tty as tty
+from llnl.util.filesystem import join_path
+
+import spack
+import spack.spec
+from spack.version import Version
+from spack.virtual import ProviderIndex
+from spack.util.cache_file import read_json, write_json
+
+# Bump this when the format of the cache files changes.
+_cache_format = 1
+
+
+class PackageMetadata(object):
+    """Metadata for a single package, as declared by its class.
+
+       Attributes mirror the class attributes of the same name on
+       spack.package.Package, so that code using them does not need to
+       know whether the package was actually loaded:
+
+         versions      List of Versions the package knows about.
+         dependencies  Dict of dependency name -> Spec.
+         provided      Dict of provided virtual Spec -> provider Spec
+                       (the 'when' condition).
+         extendees     Dict of extendee name -> Spec.
+
+       Specs are only parsed when they are first used.
+    """
+    def __init__(self, name, entry):
+        self.name = name
+        self.entry = entry
+
+
+    @staticmethod
+    def from_package_class(name, cls, mtime):
+        """Build metadata from a loaded package class."""
+        return PackageMetadata(name, {
+            'mtime'        : mtime,
+            'versions'     : sorted(str(v) for v in cls.versions),
+            'dependencies' : dict((n, str(s))
+                                  for n, s in cls.dependencies.items()),
+            'provided'     : sorted([str(v), str(w)]
+                                    for v, w in cls.provided.items()),
+            'extendees'    : dict((n, str(s))
+                                  for n, (s, kwargs) in cls.extendees.items())
+        })
+
+
+    @property
+    def mtime(self):
+        return self.entry['mtime']
+
+
+    @property
+    def versions(self):
+        if not hasattr(self, '_versions'):
+            self._versions = [Version(v) for v in self.entry['versions']]
+        return self._versions
+
+
+    @property
+    def dependencies(self):
+        if not hasattr(self, '_dependencies'):
+            self._dependencies = dict(
+                (n, spack.spec.Spec(s))
+                for n, s in self.entry['dependencies'].items())
+        return self._dependencies
+
+
+    @property
+    def provided(self):
+        if not hasattr(self, '_provided'):
+            self._provided = dict(
+                (spack.spec.Spec(v), spack.spec.Spec(w))
+                for v, w in self.entry['provided'])
+        return self._provided
+
+
+    @property
+    def extendees(self):
+        if not hasattr(self, '_extendees'):
+            self._extendees = dict(
+                (n, spack.spec.Spec(s))
+                for n, s in self.entry['extendees'].items())
+        return self._extendees
+
+
+class PackageMetadataCache(object):
+    """Persistent, mtime-validated cache of PackageMetadata for all the
+       packages in a PackageDB.
+
+       Each PackageDB root gets its own cache files in spack.cache_path:
+       one for package metadata and one for the provider index.
+       Metadata for a package is checked against its package.py at
+       most once per process.
+    """
+    def __init__(self, db, cache_dir=None):
+        self.db = db
+        if cache_dir is None:
+            cache_dir = spack.cache_path
+
+        root_hash = hashlib.sha1(os.path.abspath(db.root)).hexdigest()[:12]
+        self.cache_file = join_path(
+            cache_dir, 'package-metadata-%s.json' % root_hash)
+        self.provider_index_file = join_path(
+            cache_dir, 'provider-index-%s.json' % root_hash)
+
+        self._entries = None      # raw entries from the cache file
+        self._metadata = {}       # validated PackageMetadata objects
+
+
+    def get(self, pkg_name):
+        """Get the PackageMetadata for a package, loading the package if
+           its cache entry is missing or out of date."""
+        if pkg_name not in self._metadata:
+            self.update([pkg_name])
+        return self._metadata[pkg_name]
+
+
+    def get_all(self):
+        """Get metadata for every package in the DB, as a dict keyed by
+           package name.  The cache file is written at most once."""
+        names = self.db.all_package_names()
+        self.update(names, prune=True)
+        return dict((n, self._metadata[n]) for n in names)
+
+
+    def update(self, pkg_names, prune=False):
+        """Make sure the metadata for pkg_names is up to date, and save
+           the cache file if anything changed.  If prune is True,
+           entries for packages not in pkg_names are dropped."""
+        if self._entries is None:
+            self._entries = self._read()
+
+        changed = False
+        for name in pkg_names:
+            if name in self._metadata:
+                continue
+
+            file_path = self.db.filename_for_package_name(name)
+            try:
+                mtime = os.stat(file_path).st_mtime
+            except OSError:
+                # Let the DB raise the appropriate error.
+                self.db.get_class_for_package_name(name)
+                raise
+
+            entry = self._entries.get(name)
+            if entry is not None and entry.get('mtime') == mtime:
+                metadata = PackageMetadata(name, entry)
+            else:
+                tty.debug("Updating cached metadata for %s" % name)
+                cls = self.db.get_class_for_package_name(name)
+                metadata = PackageMetadata.from_package_class(name, cls, mtime)
+                self._entries[name] = metadata.entry
+                changed = True
+            self._metadata[name] = metadata
+
+        if prune:
+            for name in set(self._entries) - set(pkg_names):
+                del self._entries[name]
+                changed = True
+
+        if changed:
+            write_json(self.cache_file, { 'packages' : self._entries },
+                       _cache_format)
+
+
+    def provider_index(self):
+        """Get a ProviderIndex for all the packages in the DB.
+
+           The index is read from its cache file, and only the entries
+           for packages whose package.py changed since the index was
+           written are rebuilt.
+        """
+        mtimes = dict((name, m.mtime) for name, m in self.get_all().items())
+
+        index, cached_mtimes = None, {}
+        data = read_json(self.provider_index_file, _cache_format)
+        if data is not None:
+            try:
+                index = ProviderIndex.from_dict(data['index'],
+                                                metadata=self.get)
+                cached_mtimes = data['mtimes']
+            except (KeyError, TypeError, ValueError, spack.spec.SpecError):
+                index = None
+
+        if index is None:
+            index, cached_mtimes = ProviderIndex([], metadata=self.get), {}
+
+        stale = sorted(name for name in set(mtimes) | set(cached_mtimes)
+                       if mtimes.get(name) != cached_mtimes.get(name))
+        for name in stale:
+            index.remove_provider(name)
+            if name in mtimes:
+                index.update(name)
+
+        if stale:
+            write_json(self.provider_index_file, { 'index'  : index.to_dict(),
+                                                   'mtimes' : mtimes },
+                       _cache_format)
+        return index
+
+
+    def _read(self):
+        """Read raw metadata entries from the cache file."""
+        data = read_json(self.cache_file, _cache_format)
+        try:
+            return dict((str(name), entry)
+                        for name, entry in data['packages'].items())
+        except (TypeError, KeyError, AttributeError):
+            return {}
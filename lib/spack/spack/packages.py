@@ -27,6 +27,8 @@ import sys
 import inspect
 import glob
 import imp
+import hashlib
+from contextlib import closing
 
 import llnl.util.tty as tty
 from llnl.util.filesystem import join_path
@@ -34,7 +36,7 @@ from llnl.util.lang import *
 
 import spack.error
 import spack.spec
-from spack.virtual import ProviderIndex
+from spack.package_metadata import PackageMetadataCache
 from spack.util.naming import mod_to_class, validate_module_name
 
 # Name of module under which packages are imported
@@ -60,6 +62,7 @@ class PackageDB(object):
         self.root = root
         self.instances = {}
         self.provider_index = None
+        self.metadata_cache = PackageMetadataCache(self)
 
 
     @_autospec
@@ -104,7 +107,7 @@ class PackageDB(object):
     @_autospec
     def providers_for(self, vpkg_spec):
         if self.provider_index is None:
-            self.provider_index = ProviderIndex(self.all_package_names())
+            self.provider_index = self.metadata_cache.provider_index()
 
         providers = self.provider_index.providers_for(vpkg_spec)
         if not providers:
@@ -112,6 +115,13 @@ class PackageDB(object):
         return providers
 
 
+    def metadata(self, pkg_name):
+        """Get the PackageMetadata (versions, dependencies, provided
+           virtuals, extendees) for a package without loading its
+           package.py, if it hasn't changed since it was last cached."""
+        return self.metadata_cache.get(pkg_name)
+
+
     @_autospec
     def extensions_for(self, extendee_spec):
         return [p for p in self.all_packages() if p.extends(extendee_spec)]
@@ -187,6 +197,19 @@ class PackageDB(object):
         return all_package_names
 
 
+    @memoized
+    def content_hash(self):
+        """SHA-1 hash of the names and contents of all package files in
+           this DB.  Things computed from packages can be cached under
+           this hash, since it changes whenever any package does."""
+        sha = hashlib.sha1()
+        for pkg_name in self.all_package_names():
+            with closing(open(self.filename_for_package_name(pkg_name))) as f:
+                sha.update(pkg_name)
+                sha.update(f.read())
+        return sha.hexdigest()
+
+
     def all_packages(self):
         for name in self.all_package_names():
             yield self.get(name)
@@ -219,6 +242,9 @@ class PackageDB(object):
         else:
             raise UnknownPackageError(pkg_name)
 
+        # Package files start with 'from spack import *'.
+        spack.import_package_api()
+
         class_name = mod_to_class(pkg_name)
         try:
             module_name = _imported_packages_module + '.' + pkg_name
@@ -91,6 +91,7 @@ specs to avoid ambiguity.  Both are provided because ~ can cause shell
 expansion when it is the first character in an id typed on the command line.
 """
 import sys
+import json
 import itertools
 import hashlib
 from StringIO import StringIO
@@ -103,12 +104,12 @@ from llnl.util.tty.color import *
 import spack
 import spack.parse
 import spack.error
-import spack.compilers as compilers
+import spack.compilers
 
 from spack.version import *
 from spack.util.string import *
 from spack.util.prefix import Prefix
-from spack.virtual import ProviderIndex
+import spack.virtual
 
 # Convenient names for color formats so that other things can use them
 compiler_color         = '@g'
@@ -301,14 +302,70 @@ class VariantMap(HashableMap):
         return ''.join(str(self[key]) for key in sorted_keys)
 
 
+# Incremented whenever any spec's dependencies or dependents change.
+# Specs use it to tell whether their cached node index is still valid.
+_dag_generation = 0
+
+def _dag_changed():
+    global _dag_generation
+    _dag_generation += 1
+
+
+# Memo tables for comparing spec nodes.  They are keyed on pairs of
+# node keys (see Spec._node_key()), so they stay valid however the
+# specs they were computed from change later.  Installed specs are
+# checked against the same queries and constraints over and over.
+_satisfies_cache = LRUCache(8192)
+_constrain_cache = LRUCache(8192)
+
+# Restricted ProviderIndexes, keyed on the node keys of a whole DAG.
+_provider_index_cache = LRUCache(1024)
+
+
 class DependencyMap(HashableMap):
     """Each spec has a DependencyMap containing specs for its dependencies.
-       The DependencyMap is keyed by name. """
+       The DependencyMap is keyed by name.  Changing one invalidates the
+       node indexes of all specs."""
     @property
     def concrete(self):
         return all(d.concrete for d in self.values())
 
 
+    def __setitem__(self, key, value):
+        _dag_changed()
+        super(DependencyMap, self).__setitem__(key, value)
+
+
+    def __delitem__(self, key):
+        _dag_changed()
+        super(DependencyMap, self).__delitem__(key)
+
+
+    def clear(self):
+        _dag_changed()
+        super(DependencyMap, self).clear()
+
+
+    def pop(self, *args):
+        _dag_changed()
+        return super(DependencyMap, self).pop(*args)
+
+
+    def popitem(self):
+        _dag_changed()
+        return super(DependencyMap, self).popitem()
+
+
+    def setdefault(self, key, default=None):
+        _dag_changed()
+        return super(DependencyMap, self).setdefault(key, default)
+
+
+    def update(self, *args, **kwargs):
+        _dag_changed()
+        super(DependencyMap, self).update(*args, **kwargs)
+
+
     def __str__(self):
         return ''.join(
             ["^" + str(self[name]) for name in sorted(self.keys())])
@@ -316,6 +373,21 @@ class DependencyMap(HashableMap):
 
 @key_ordering
 class Spec(object):
+    # Comparison key and hash of a concrete spec, computed once.
+    # Concrete specs must not be modified once these are set.
+    _cached_key  = None
+    _cached_hash = None
+    _cached_node_key = None
+    _cached_provider_index = None
+
+    # (generation, nodes by name, names of dependencies) for this
+    # spec's sub-DAG.  See _node_index().
+    _index_cache = None
+
+    # True if versions, variants and compiler may be shared with a
+    # copy of this spec.  See _own_attributes().
+    _shared_attributes = False
+
     def __init__(self, spec_like, *dep_like, **kwargs):
         # Copy if spec_like is a Spec.
         if isinstance(spec_like, Spec):
@@ -326,14 +398,15 @@ class Spec(object):
         if not isinstance(spec_like, basestring):
             raise TypeError("Can't make spec out of %s" % type(spec_like))
 
-        spec_list = SpecParser().parse(spec_like)
+        spec_list = parse(spec_like)
         if len(spec_list) > 1:
             raise ValueError("More than one spec in string: " + spec_like)
         if len(spec_list) < 1:
             raise ValueError("String contains no specs: " + spec_like)
 
         # Take all the attributes from the first parsed spec without copying.
-        # This is safe b/c we throw out the parsed spec.  It's a bit nasty,
+        # This is safe b/c parse() returns copies of cached specs, and we
+        # throw out the parsed spec.  It's a bit nasty,
         # but it's nastier to implement the constructor so that the parser
         # writes directly into this Spec object.
         other = spec_list[0]
@@ -344,6 +417,7 @@ class Spec(object):
         self.architecture = other.architecture
         self.compiler = other.compiler
         self.dependencies = other.dependencies
+        self._shared_attributes = other._shared_attributes
 
         # Specs are by default not assumed to be normal, but in some
         # cases we've read them from a file want to assume normal.
@@ -363,8 +437,20 @@ class Spec(object):
     #
     # Private routines here are called by the parser when building a spec.
     #
+    def _own_attributes(self):
+        """Copies share their versions, variants and compiler with the
+           spec they were copied from, until one of them is about to
+           change them in place.  Call this before doing that."""
+        if self._shared_attributes:
+            self.versions = self.versions.copy()
+            self.variants = self.variants.copy()
+            self.compiler = self.compiler.copy() if self.compiler else None
+            self._shared_attributes = False
+
+
     def _add_version(self, version):
         """Called by the parser to add an allowable version."""
+        self._own_attributes()
         self.versions.add(version)
 
 
@@ -372,6 +458,7 @@ class Spec(object):
         """Called by the parser to add a variant."""
         if name in self.variants: raise DuplicateVariantError(
                 "Cannot specify variant '%s' twice" % name)
+        self._own_attributes()
         self.variants[name] = Variant(name, enabled)
 
 
@@ -395,6 +482,8 @@ class Spec(object):
             raise DuplicateDependencyError("Cannot depend on '%s' twice" % spec)
         self.dependencies[spec.name] = spec
         spec.dependents[self.name] = self
+        self._cached_key = self._cached_hash = None
+        self._cached_provider_index = None
 
 
     @property
@@ -578,6 +667,99 @@ class Spec(object):
         return full_hash[:length]
 
 
+    def to_node_dict(self):
+        """Return a dict describing only this node of the spec.  Its
+           dependencies are referred to by name, which is unique within
+           a normalized spec DAG."""
+        compiler = None
+        if self.compiler:
+            compiler = { 'name'     : self.compiler.name,
+                         'versions' : str(self.compiler.versions) }
+
+        d = { 'versions'     : str(self.versions),
+              'arch'         : self.architecture,
+              'compiler'     : compiler,
+              'variants'     : dict((v.name, v.enabled)
+                                    for v in self.variants.values()),
+              'dependencies' : sorted(self.dependencies),
+              'hash'         : self.dep_hash() }
+        return { self.name : d }
+
+
+    def to_json(self, stream=None):
+        """Write this spec DAG out as JSON, with one entry per node and
+           explicit dependency edges.  If stream is None, returns the
+           JSON as a string."""
+        nodes = [s.to_node_dict() for s in self.traverse(order='pre')]
+        data = { 'spec' : nodes }
+        if stream is None:
+            return json.dumps(data, sort_keys=True, indent=2)
+        json.dump(data, stream, sort_keys=True, indent=2)
+
+
+    @staticmethod
+    def from_node_dict(node):
+        """Construct a single spec node from a dict made by
+           to_node_dict().  Dependencies are not connected."""
+        name = next(iter(node))
+        node = node[name]
+
+        spec = Spec.__new__(Spec)
+        spec.name = str(name)
+        spec.versions = VersionList(str(node['versions']))
+        spec.architecture = node['arch'] and str(node['arch'])
+        spec.compiler = None
+        if node['compiler']:
+            spec.compiler = CompilerSpec.__new__(CompilerSpec)
+            spec.compiler.name = str(node['compiler']['name'])
+            spec.compiler.versions = VersionList(
+                str(node['compiler']['versions']))
+
+        spec.variants = VariantMap()
+        for vname, enabled in node['variants'].items():
+            spec.variants[str(vname)] = Variant(str(vname), enabled)
+
+        spec.dependents = DependencyMap()
+        spec.dependencies = DependencyMap()
+        spec._normal = False
+        spec._concrete = False
+        return spec
+
+
+    @staticmethod
+    def from_json(stream):
+        """Construct a spec DAG from JSON written by to_json().  Stream
+           may be a string or a file-like object.  No package files are
+           consulted, so this works for packages Spack no longer has."""
+        try:
+            if isinstance(stream, basestring):
+                data = json.loads(stream)
+            else:
+                data = json.load(stream)
+
+            nodes = data['spec']
+            deps = {}
+            root = None
+            for node in nodes:
+                spec = Spec.from_node_dict(node)
+                deps[spec.name] = spec
+                if root is None:
+                    root = spec
+
+            for node in nodes:
+                name = next(iter(node))
+                for dep_name in node[name]['dependencies']:
+                    deps[name]._add_dependency(deps[dep_name])
+
+        except (ValueError, TypeError, KeyError, AttributeError,
+                StopIteration), e:
+            raise SpecError("Invalid JSON spec: %s" % e)
+
+        if root is None:
+            raise SpecError("JSON spec contains no nodes.")
+        return root
+
+
     def _concretize_helper(self, presets=None, visited=None):
         """Recursive helper function for concretize().
            This concretizes everything bottom-up.  As things are
@@ -665,11 +847,25 @@ class Spec(object):
         if self._concrete:
             return
 
+        # Look for a cached result first.  Only whole DAGs are cached,
+        # since a cached DAG replaces the one rooted at this spec.
+        cache = spack.concretization_cache
+        key = None
+        if cache and not self.dependents:
+            key = cache.key(self)
+            cached = cache.get(key, self)
+            if cached:
+                self._dup(cached)
+                return
+
         self.normalize()
         self._expand_virtual_packages()
         self._concretize_helper()
         self._concrete = True
 
+        if key:
+            cache.store(key, self)
+
 
     def concretized(self):
         """This is a non-destructive version of concretize().  First clones,
@@ -778,7 +974,7 @@ class Spec(object):
             else:
                 # if it's a real dependency, check whether it provides something
                 # already required in the spec.
-                index = ProviderIndex([pkg_dep], restrict=True)
+                index = spack.virtual.ProviderIndex([pkg_dep], restrict=True)
                 for vspec in (v for v in spec_deps.values() if v.virtual):
                     if index.providers_for(vspec):
                         vspec._replace_with(pkg_dep)
@@ -847,7 +1043,7 @@ class Spec(object):
         # Remove virtual deps that are already provided by something in the spec
         spec_packages = [d.package for d in spec_deps.values() if not d.virtual]
 
-        index = ProviderIndex(spec_deps.values(), restrict=True)
+        index = spack.virtual.ProviderIndex(spec_deps.values(), restrict=True)
 
         visited = set()
         self._normalize_helper(visited, spec_deps, index)
@@ -890,7 +1086,7 @@ class Spec(object):
 
             # validate compiler in addition to the package name.
             if spec.compiler:
-                if not compilers.supported(spec.compiler):
+                if not spack.compilers.supported(spec.compiler):
                     raise UnsupportedCompilerError(spec.compiler.name)
 
 
@@ -901,6 +1097,33 @@ class Spec(object):
         if not self.name == other.name:
             raise UnsatisfiableSpecNameError(self.name, other.name)
 
+        key = (self._node_key(), other._node_key())
+        result = _constrain_cache.get(key)
+        if result is None:
+            try:
+                result = self._constrained_node(other)
+            except UnsatisfiableSpecError, e:
+                result = e
+            _constrain_cache[key] = result
+
+        if isinstance(result, UnsatisfiableSpecError):
+            raise result
+
+        # The cached attributes are shared by every spec given them.
+        (self.versions, self.variants,
+         self.compiler, self.architecture) = result
+        self._shared_attributes = True
+        self._cached_key = self._cached_hash = None
+        self._cached_node_key = self._cached_provider_index = None
+
+        if constrain_deps:
+            self._constrain_dependencies(other)
+
+
+    def _constrained_node(self, other):
+        """Returns the versions, variants, compiler and architecture of
+           this node constrained by other's, without changing this node.
+           Raises UnsatisfiableSpecError if they can't be constrained."""
         if not self.versions.overlaps(other.versions):
             raise UnsatisfiableVersionSpecError(self.versions, other.versions)
 
@@ -915,17 +1138,21 @@ class Spec(object):
                 raise UnsatisfiableArchitectureSpecError(self.architecture,
                                                          other.architecture)
 
-        if self.compiler is not None and other.compiler is not None:
-            self.compiler.constrain(other.compiler)
-        elif self.compiler is None:
-            self.compiler = other.compiler
+        compiler = self.compiler
+        if compiler is not None and other.compiler is not None:
+            compiler = compiler.copy()
+            compiler.constrain(other.compiler)
+        elif other.compiler is not None:
+            compiler = other.compiler.copy()
 
-        self.versions.intersect(other.versions)
-        self.variants.update(other.variants)
-        self.architecture = self.architecture or other.architecture
+        versions = self.versions.copy()
+        versions.intersect(other.versions)
 
-        if constrain_deps:
-            self._constrain_dependencies(other)
+        variants = self.variants.copy()
+        variants.update(other.variants)
+
+        return (versions, variants, compiler,
+                self.architecture or other.architecture)
 
 
     def _constrain_dependencies(self, other):
@@ -950,19 +1177,12 @@ class Spec(object):
 
     def common_dependencies(self, other):
         """Return names of dependencies that self an other have in common."""
-        common = set(
-            s.name for s in self.traverse(root=False))
-        common.intersection_update(
-            s.name for s in other.traverse(root=False))
-        return common
+        return self._node_index()[1] & other._node_index()[1]
 
 
     def dep_difference(self, other):
         """Returns dependencies in self that are not in other."""
-        mine = set(s.name for s in self.traverse(root=False))
-        mine.difference_update(
-            s.name for s in other.traverse(root=False))
-        return mine
+        return self._node_index()[1] - other._node_index()[1]
 
 
     def _autospec(self, spec_like):
@@ -987,6 +1207,24 @@ class Spec(object):
         if self.name != other.name:
             return False
 
+        key = (self._node_key(), other._node_key())
+        node_satisfied = _satisfies_cache.get(key)
+        if node_satisfied is None:
+            node_satisfied = self._satisfies_node(other)
+            _satisfies_cache[key] = node_satisfied
+
+        if not node_satisfied:
+            return False
+
+        # If we need to descend into dependencies, do it, otherwise we're done.
+        if satisfy_deps:
+            return self.satisfies_dependencies(other)
+        else:
+            return True
+
+
+    def _satisfies_node(self, other):
+        """Whether this node satisfies other, not considering deps."""
         # All these attrs have satisfies criteria of their own,
         # but can be None to indicate no constraints.
         for s, o in ((self.versions, other.versions),
@@ -1001,11 +1239,7 @@ class Spec(object):
             self.architecture != other.architecture):
             return False
 
-        # If we need to descend into dependencies, do it, otherwise we're done.
-        if satisfy_deps:
-            return self.satisfies_dependencies(other)
-        else:
-            return True
+        return True
 
 
     def satisfies_dependencies(self, other):
@@ -1020,8 +1254,8 @@ class Spec(object):
                 return False
 
         # For virtual dependencies, we need to dig a little deeper.
-        self_index = ProviderIndex(self.traverse(), restrict=True)
-        other_index = ProviderIndex(other.traverse(), restrict=True)
+        self_index = self._provider_index()
+        other_index = other._provider_index()
 
         # This handles cases where there are already providers for both vpkgs
         if not self_index.satisfies(other_index):
@@ -1041,6 +1275,29 @@ class Spec(object):
         return True
 
 
+    def _provider_index(self):
+        """Restricted ProviderIndex of the specs in this DAG.
+
+           Indexes are shared by all DAGs with the same nodes, and are
+           built from copies of the nodes so that later changes to this
+           DAG don't change them.  Concrete specs keep theirs.
+        """
+        if self._cached_provider_index is not None:
+            return self._cached_provider_index
+
+        nodes = list(self.traverse())
+        key = tuple(sorted(s._node_key() for s in nodes))
+        index = _provider_index_cache.get(key)
+        if index is None:
+            index = spack.virtual.ProviderIndex(
+                [s.copy(deps=False) for s in nodes], restrict=True)
+            _provider_index_cache[key] = index
+
+        if self._concrete:
+            self._cached_provider_index = index
+        return index
+
+
     def virtual_dependencies(self):
         """Return list of any virtual deps in this spec."""
         return [spec for spec in self.traverse() if spec.virtual]
@@ -1058,12 +1315,15 @@ class Spec(object):
                Whether deps should be copied too.  Set to false to copy a
                spec but not its dependencies.
         """
-        # Local node attributes get copied first.
+        # Local node attributes are shared until either spec changes
+        # them.  See _own_attributes().
+        _dag_changed()
         self.name = other.name
-        self.versions = other.versions.copy()
-        self.variants = other.variants.copy()
+        self.versions = other.versions
+        self.variants = other.variants
         self.architecture = other.architecture
-        self.compiler = other.compiler.copy() if other.compiler else None
+        self.compiler = other.compiler
+        self._shared_attributes = other._shared_attributes = True
         self.dependents = DependencyMap()
         self.dependencies = DependencyMap()
 
@@ -1084,6 +1344,15 @@ class Spec(object):
         self._normal = other._normal
         self._concrete = other._concrete
 
+        # A full copy of a concrete spec compares the same as the original.
+        self._cached_key = self._cached_hash = None
+        self._cached_provider_index = None
+        self._cached_node_key = other._cached_node_key
+        if kwargs.get('deps', True):
+            self._cached_key  = other._cached_key
+            self._cached_hash = other._cached_hash
+            self._cached_provider_index = other._cached_provider_index
+
 
     def copy(self, **kwargs):
         """Return a copy of this spec.
@@ -1102,11 +1371,36 @@ class Spec(object):
         return self.versions[0]
 
 
+    def _node_index(self):
+        """Get a tuple (nodes, dep_names) for this spec's sub-DAG.  nodes
+           maps each name to a list of the nodes with that name, in
+           traversal order.  dep_names is the set of names of this
+           spec's dependencies, direct and indirect.
+
+           The index is built with one traversal and kept until any
+           spec's dependencies change, so repeated lookups by name
+           don't traverse the DAG again.
+        """
+        cache = self._index_cache
+        if cache is not None and cache[0] == _dag_generation:
+            return cache[1:]
+
+        nodes = {}
+        dep_names = set()
+        for spec in self.traverse():
+            nodes.setdefault(spec.name, []).append(spec)
+            if spec is not self:
+                dep_names.add(spec.name)
+
+        self._index_cache = (_dag_generation, nodes, dep_names)
+        return nodes, dep_names
+
+
     def __getitem__(self, name):
         """TODO: reconcile __getitem__, _add_dependency, __contains__"""
-        for spec in self.traverse():
-            if spec.name == name:
-                return spec
+        nodes = self._node_index()[0]
+        if name in nodes:
+            return nodes[name][0]
 
         raise KeyError("No spec with name %s in %s" % (name, self))
 
@@ -1116,10 +1410,8 @@ class Spec(object):
            does.  If the spec has no name, then we parse this one first.
         """
         spec = self._autospec(spec)
-        for s in self.traverse():
-            if s.satisfies(spec):
-                return True
-        return False
+        nodes = self._node_index()[0]
+        return any(s.satisfies(spec) for s in nodes.get(spec.name, []))
 
 
     def sorted_deps(self):
@@ -1170,6 +1462,29 @@ class Spec(object):
         return not self.eq_dag(other)
 
 
+    def _node_key(self):
+        """Key for the attributes of just this node, made only of values
+           that never change, so that it can be kept in memo tables.
+           Like _cmp_key(), it is only computed once for concrete specs.
+        """
+        if self._cached_node_key is not None:
+            return self._cached_node_key
+
+        compiler = None
+        if self.compiler is not None:
+            compiler = (self.compiler.name, tuple(self.compiler.versions))
+
+        key = (self.name,
+               tuple(self.versions),
+               tuple(sorted((v.name, v.enabled)
+                            for v in self.variants.values())),
+               self.architecture,
+               compiler)
+        if self._concrete:
+            self._cached_node_key = key
+        return key
+
+
     def _cmp_node(self):
         """Comparison key for just *this node* and not its deps."""
         return (self.name, self.versions, self.variants,
@@ -1190,8 +1505,44 @@ class Spec(object):
         """Comparison key for this node and all dependencies *without*
            considering structure.  This is the default, as
            normalization will restore structure.
+
+           Concrete specs don't change, so their key is only computed
+           once.  That makes hashing them, e.g. to look them up in
+           spack.db, independent of the size of their DAG.
         """
-        return self._cmp_node() + (self.sorted_deps(),)
+        if self._cached_key is not None:
+            return self._cached_key
+
+        key = self._cmp_node() + (
+            tuple(dep._cmp_node() for dep in self.sorted_deps()),)
+        if self._concrete:
+            self._cached_key  = key
+            self._cached_hash = hash(key)
+        return key
+
+
+    def __hash__(self):
+        if self._cached_hash is not None:
+            return self._cached_hash
+        return hash(self._cmp_key())
+
+
+    def __eq__(self, other):
+        if other is None:
+            return False
+        if self is other:
+            return True
+
+        # Concrete specs with different hashes can't be equal.
+        other_hash = getattr(other, '_cached_hash', None)
+        if self._cached_hash is not None and other_hash is not None:
+            if self._cached_hash != other_hash:
+                return False
+        return self._cmp_key() == other._cmp_key()
+
+
+    def __ne__(self, other):
+        return not self == other
 
 
     def colorized(self):
@@ -1360,7 +1711,7 @@ class SpecLexer(spack.parse.Lexer):
 
 class SpecParser(spack.parse.Parser):
     def __init__(self):
-        super(SpecParser, self).__init__(SpecLexer())
+        super(SpecParser, self).__init__(_lexer)
 
 
     def do_parse(self):
@@ -1506,11 +1857,42 @@ class SpecParser(spack.parse.Parser):
             self.last_token_error("Identifier cannot contain '.'")
 
 
+# Building a lexer compiles its regular expressions, so all parsers
+# share one.
+_lexer = SpecLexer()
+
+# Parsed specs, keyed by the strings they were parsed from.  The same
+# strings (package names, version ranges, dependency constraints) are
+# parsed over and over, and copying a spec is much cheaper than
+# parsing it.  Cached specs are never handed out, only copies.
+_parse_cache = LRUCache(4096)
+
+
 def parse(string):
     """Returns a list of specs from an input string.
        For creating one spec, see Spec() constructor.
     """
-    return SpecParser().parse(string)
+    specs = _parse_cache.get(string)
+    if specs is None:
+        specs = SpecParser().parse(string)
+        _parse_cache[string] = specs
+    return [spec.copy() for spec in specs]
+
+
+def parse_many(strings):
+    """Parse a sequence of strings that each contain a single spec.
+       Returns a list with one Spec per string.  Each distinct string
+       is only parsed once.
+    """
+    parsed = {}
+    specs = []
+    for string in strings:
+        if string not in parsed:
+            parsed[string] = Spec(string)
+            specs.append(parsed[string])
+        else:
+            specs.append(parsed[string].copy())
+    return specs
 
 
 def parse_anonymous_spec(spec_like, pkg_name):
@@ -26,9 +26,11 @@ import os
 import re
 import shutil
 import tempfile
+from contextlib import contextmanager
 
 import llnl.util.tty as tty
 from llnl.util.filesystem import *
+from llnl.util.lock import Lock
 
 import spack
 import spack.config
@@ -38,6 +40,18 @@ import spack.error
 
 STAGE_PREFIX = 'spack-stage-'
 
+# Locks for named stages, keyed by stage name.
+_stage_locks = {}
+
+
+def stage_lock(name):
+    """Get the Lock for the named stage.  Named stages can be shared by
+       several Spack processes, so they are locked while being created,
+       fetched into, and destroyed."""
+    if name not in _stage_locks:
+        _stage_locks[name] = Lock(join_path(spack.stage_path, '.%s.lock' % name))
+    return _stage_locks[name]
+
 
 class Stage(object):
     """A Stage object manaages a directory where some source code is
@@ -96,7 +110,19 @@ class Stage(object):
         self.tmp_root = find_tmp_root()
 
         self.path = None
-        self._setup()
+        self._lock = stage_lock(self.name) if self.name else None
+        with self._locked():
+            self._setup()
+
+
+    @contextmanager
+    def _locked(self):
+        """Hold this stage's lock, if it is a named stage."""
+        if self._lock is None:
+            yield
+        else:
+            with self._lock.write_locked():
+                yield
 
 
     def _cleanup_dead_links(self):
@@ -236,8 +262,47 @@ class Stage(object):
 
     def fetch(self):
         """Downloads an archive or checks out code from a repository."""
+        with self._locked():
+            self._fetch()
+
+
+    @property
+    def _cache_key(self):
+        """(digest, mirror_path) for this stage's archive in the fetch
+           cache, or None if it can't be cached.  Only archives with a
+           known checksum can be."""
+        if spack.fetch_cache is None or not self.mirror_path:
+            return None
+        if not isinstance(self.fetcher, fs.URLFetchStrategy):
+            return None
+        if not self.fetcher.digest:
+            return None
+        return self.fetcher.digest, self.mirror_path
+
+
+    def _fetch_from_cache(self):
+        """Copy this stage's archive from the fetch cache, if it's there.
+           Returns True on success."""
+        key = self._cache_key
+        if key is None or self.archive_file:
+            return False
+
+        digest, mirror_path = key
+        path = spack.fetch_cache.fetch(digest, mirror_path, self.path)
+        if not path:
+            return False
+
+        tty.msg("Using cached archive: %s" % path)
+        self.fetcher.mark_verified(path)
+        return True
+
+
+    def _fetch(self):
         self.chdir()
 
+        if self._fetch_from_cache():
+            return
+
         fetchers = [self.fetcher]
 
         # TODO: move mirror logic out of here and clean it up!
@@ -252,23 +317,65 @@ class Stage(object):
             for f in fetchers:
                 f.set_stage(self)
 
-        for fetcher in fetchers:
-            try:
-                fetcher.fetch()
-                break
-            except spack.error.SpackError, e:
-                tty.msg("Fetching from %s failed." % fetcher)
-                tty.debug(e)
-                continue
-        else:
-            tty.die("All fetchers failed for %s" % self.name)
+        # Downloads are copied into the fetch cache as they arrive, and
+        # kept there if their checksum matches.
+        key = self._cache_key
+        copy_path = None
+        if key is not None:
+            copy_path = spack.fetch_cache.temp_path(*key)
+            for f in fetchers:
+                if isinstance(f, fs.URLFetchStrategy):
+                    f.copy_path = copy_path
+
+        try:
+            # A bad checksum from one source may be a bad copy, so try
+            # the others, but report it if none of them works.
+            checksum_error = None
+            for fetcher in fetchers:
+                try:
+                    fetcher.fetch()
+                    break
+                except fs.ChecksumError, e:
+                    tty.msg("Fetching from %s failed." % fetcher)
+                    checksum_error = e
+                    continue
+                except spack.error.SpackError, e:
+                    tty.msg("Fetching from %s failed." % fetcher)
+                    tty.debug(e)
+                    continue
+            else:
+                if checksum_error:
+                    raise checksum_error
+                tty.die("All fetchers failed for %s" % self.name)
+
+            # Mirror fetchers check the same digest as our own fetcher.
+            if fetcher is not self.fetcher and isinstance(
+                    fetcher, fs.URLFetchStrategy) and fetcher.verified():
+                self.fetcher.mark_verified(self.archive_file)
+
+            if copy_path and self.fetcher.verified() and os.path.getsize(copy_path):
+                spack.fetch_cache.commit(copy_path, *key)
+
+        finally:
+            for f in fetchers:
+                if isinstance(f, fs.URLFetchStrategy):
+                    f.copy_path = None
+            if copy_path and os.path.exists(copy_path):
+                os.remove(copy_path)
 
 
     def check(self):
         """Check the downloaded archive against a checksum digest.
-           No-op if this stage checks code out of a repository."""
+           No-op if this stage checks code out of a repository.
+
+           Archives that pass are added to the fetch cache."""
         self.fetcher.check()
 
+        key = self._cache_key
+        if key is not None and self.archive_file:
+            digest, mirror_path = key
+            spack.fetch_cache.store(digest, mirror_path, self.archive_file)
+
 
     def expand_archive(self):
         """Changes to the stage directory and attempt to expand the downloaded
@@ -300,7 +407,8 @@ class Stage(object):
 
     def destroy(self):
         """Remove this stage directory."""
-        remove_linked_tree(self.path)
+        with self._locked():
+            remove_linked_tree(self.path)
 
         # Make sure we don't end up in a removed directory
         try:
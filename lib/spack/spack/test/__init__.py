@@ -52,7 +52,16 @@ test_names = ['versions',
               'mirror',
               'url_extrapolate',
               'cc',
-              'link_tree']
+              'link_tree',
+              'lock',
+              'package_metadata',
+              'benchmark',
+              'timer',
+              'fetch_cache',
+              'binary_distribution',
+              'url_fetch',
+              'compression',
+              'web']
 
 
 def list_tests():
@@ -0,0 +1,79 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""\
+Make sure the benchmarks in spack.benchmark keep working.
+"""
+import json
+import shutil
+import tempfile
+import unittest
+
+import spack
+import spack.benchmark
+from spack.package_metadata import PackageMetadataCache
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def setUp(self):
+        # Benchmarks make their own PackageDB for the mock packages;
+        # its metadata caches go in spack.cache_path.
+        self.cache_dir = tempfile.mkdtemp()
+        self.real_cache_path = spack.cache_path
+        spack.cache_path = self.cache_dir
+        db = spack.db.instance
+        self.real_metadata_cache = db.metadata_cache
+        db.metadata_cache = PackageMetadataCache(db, self.cache_dir)
+
+
+    def tearDown(self):
+        spack.cache_path = self.real_cache_path
+        spack.db.instance.metadata_cache = self.real_metadata_cache
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+    def test_run_all_benchmarks(self):
+        db = spack.db
+        results = spack.benchmark.run(repeat=1, min_time=0, label='test')
+
+        # Benchmarks shouldn't leave the mock repository in place.
+        self.assertTrue(spack.db is db)
+
+        names = [r['name'] for r in results['benchmarks']]
+        self.assertEqual(spack.benchmark.list_benchmarks(), names)
+        for r in results['benchmarks']:
+            self.assertTrue(r['min'] <= r['median'] <= r['max'])
+
+        # Results must be serializable.
+        self.assertEqual('test', json.loads(json.dumps(results))['label'])
+
+
+    def test_select_benchmarks(self):
+        results = spack.benchmark.run(['version.*', 'spec.copy'],
+                                      repeat=1, min_time=0)
+        names = [r['name'] for r in results['benchmarks']]
+        self.assertEqual(['version.parse', 'version.compare',
+                          'version.satisfies', 'version.intersect',
+                          'spec.copy'], names)
@@ -0,0 +1,188 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Tests for creating and installing binary packages.
+"""
+import os
+import shutil
+import tarfile
+import tempfile
+from contextlib import closing
+
+from llnl.util.filesystem import *
+
+import spack
+import spack.hooks
+import spack.binary_distribution as bindist
+from spack.directory_layout import SpecHashDirectoryLayout
+from spack.test.mock_packages_test import *
+
+
+def write_file(path, contents, mode=0644):
+    mkdirp(os.path.dirname(path))
+    with closing(open(path, 'w')) as f:
+        f.write(contents)
+    os.chmod(path, mode)
+
+
+class BinaryDistributionTest(MockPackagesTest):
+
+    def setUp(self):
+        super(BinaryDistributionTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = join_path(self.tmpdir, 'build-cache')
+        self.orig_layout = spack.install_layout
+        self.installed = []
+
+
+    def tearDown(self):
+        # Remove the module files made by the install hooks.
+        for spec in self.installed:
+            spack.hooks.post_uninstall(spec.package)
+
+        super(BinaryDistributionTest, self).tearDown()
+        spack.install_layout = self.orig_layout
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+    def use_root(self, name):
+        """Install into a new root named name, and return it."""
+        root = join_path(self.tmpdir, name)
+        spack.install_layout = SpecHashDirectoryLayout(root)
+        return root
+
+
+    def build(self, old_root):
+        """Fake an install of libelf in old_root and put it in the cache."""
+        spec = Spec('libelf')
+        spec.concretize()
+        spack.install_layout.make_path_for_spec(spec)
+
+        prefix = spack.install_layout.path_for_spec(spec)
+        write_file(join_path(prefix, 'lib', 'pkgconfig', 'libelf.pc'),
+                   "prefix=%s\nlibdir=${prefix}/lib\n" % prefix)
+        write_file(join_path(prefix, 'bin', 'script'),
+                   "#!%s/bin/sh\n" % prefix, 0555)
+        write_file(join_path(prefix, 'lib', 'libelf.so'),
+                   "\x7fELF\0\0rpath=%s/lib\0end" % prefix, 0555)
+        os.symlink(join_path(prefix, 'lib', 'libelf.so'),
+                   join_path(prefix, 'lib', 'libelf.so.0'))
+
+        tarball = bindist.build_tarball(spec, self.cache_dir)
+        self.assertTrue(os.path.isfile(tarball))
+        self.assertRaises(bindist.BuildCacheError,
+                          bindist.build_tarball, spec, self.cache_dir)
+        return spec
+
+
+    def install(self):
+        cached = bindist.cached_specs(self.cache_dir)
+        self.assertEqual(len(cached), 1)
+        bindist.install_tarball(cached[0], self.cache_dir)
+        self.installed.append(cached[0])
+        return cached[0]
+
+
+    def check_install(self, spec, new_root):
+        self.assertEqual(self.install(), spec)
+
+        prefix = spack.install_layout.path_for_spec(spec)
+        self.assertTrue(prefix.startswith(new_root))
+        self.assertEqual(spack.install_layout.all_specs(), [spec])
+
+        pc = open(join_path(prefix, 'lib', 'pkgconfig', 'libelf.pc')).read()
+        self.assertEqual(pc, "prefix=%s\nlibdir=${prefix}/lib\n" % prefix)
+
+        script = join_path(prefix, 'bin', 'script')
+        self.assertEqual(open(script).read(), "#!%s/bin/sh\n" % prefix)
+        self.assertTrue(os.access(script, os.X_OK))
+
+        link = join_path(prefix, 'lib', 'libelf.so.0')
+        self.assertEqual(os.readlink(link), join_path(prefix, 'lib', 'libelf.so'))
+        return open(join_path(prefix, 'lib', 'libelf.so')).read()
+
+
+    def test_relocate_to_shorter_root(self):
+        old_root = self.use_root('a-long-install-root')
+        spec = self.build(old_root)
+
+        new_root = self.use_root('root')
+        binary = self.check_install(spec, new_root)
+
+        # Binaries keep their size, so paths are padded with slashes.
+        padding = os.sep * (len(old_root) - len(new_root))
+        prefix = spack.install_layout.path_for_spec(spec)
+        rel = prefix[len(new_root):]
+        self.assertEqual(
+            binary, "\x7fELF\0\0rpath=%s%s%s/lib\0end" % (new_root, padding, rel))
+
+
+    def test_relocate_text_to_longer_root(self):
+        old_root = self.use_root('root')
+        spec = self.build(old_root)
+        os.remove(join_path(spack.install_layout.path_for_spec(spec),
+                            'lib', 'libelf.so'))
+        bindist.build_tarball(spec, self.cache_dir, force=True)
+
+        new_root = self.use_root('a-long-install-root')
+        self.install()
+
+        prefix = spack.install_layout.path_for_spec(spec)
+        pc = open(join_path(prefix, 'lib', 'pkgconfig', 'libelf.pc')).read()
+        self.assertEqual(pc, "prefix=%s\nlibdir=${prefix}/lib\n" % prefix)
+
+
+    def test_install_requires_cached_spec(self):
+        self.use_root('root')
+        spec = Spec('libelf')
+        spec.concretize()
+        self.assertRaises(bindist.BuildCacheError,
+                          bindist.install_tarball, spec, self.cache_dir)
+
+
+    def test_links_out_of_prefix_are_rejected(self):
+        evil = join_path(self.tmpdir, 'evil')
+        write_file(evil, 'evil')
+
+        def check(*members):
+            path = join_path(self.tmpdir, 'bad.tar')
+            with closing(tarfile.open(path, 'w')) as tar:
+                for info in members:
+                    if isinstance(info, tarfile.TarInfo):
+                        tar.addfile(info)
+                    else:
+                        tar.add(evil, arcname=info)
+            with closing(tarfile.open(path)) as tar:
+                self.assertRaises(bindist.BuildCacheError,
+                                  bindist._check_members, tar, path)
+
+        link = tarfile.TarInfo('lib')
+        link.type, link.linkname = tarfile.SYMTYPE, '/etc'
+        check(link, 'lib/passwd')
+        check(link, 'lib')
+
+        hard = tarfile.TarInfo('lib/hard')
+        hard.type, hard.linkname = tarfile.LNKTYPE, '/etc/passwd'
+        check(hard)
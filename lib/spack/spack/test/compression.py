@@ -0,0 +1,163 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Tests for expanding archives with spack.util.compression.
+"""
+import os
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import unittest
+from contextlib import closing
+
+from llnl.util.filesystem import *
+
+import spack.util.compression as compression
+from spack.util.executable import which
+
+
+class ExpandTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.src = join_path(self.tmpdir, 'src')
+        mkdirp(join_path(self.src, 'pkg-1.0', 'sub'))
+
+        with working_dir(join_path(self.src, 'pkg-1.0')):
+            with closing(open('configure', 'w')) as f:
+                f.write("#!/bin/sh\n")
+            os.chmod('configure', 0755)
+            with closing(open(join_path('sub', 'data'), 'w')) as f:
+                f.write('x' * 1000)
+            os.symlink('configure', 'link')
+
+        self.nbytes = len("#!/bin/sh\n") + 1000
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+    def check_expanded(self, archive, **kwargs):
+        dest = join_path(self.tmpdir, 'dest')
+        shutil.rmtree(dest, ignore_errors=True)
+
+        nbytes = compression.expand(archive, dest, **kwargs)
+        self.assertEqual(nbytes, self.nbytes)
+
+        root = join_path(dest, 'pkg-1.0')
+        self.assertEqual(open(join_path(root, 'sub', 'data')).read(), 'x' * 1000)
+        self.assertTrue(os.access(join_path(root, 'configure'), os.X_OK))
+        return root
+
+
+    def make_tarball(self, mode, ext):
+        path = join_path(self.tmpdir, 'pkg-1.0.%s' % ext)
+        with closing(tarfile.open(path, mode)) as tar:
+            tar.add(join_path(self.src, 'pkg-1.0'), arcname='pkg-1.0')
+        return path
+
+
+    def test_tar_gz(self):
+        path = self.make_tarball('w:gz', 'tar.gz')
+        root = self.check_expanded(path)
+        self.assertEqual(os.readlink(join_path(root, 'link')), 'configure')
+        self.check_expanded(path, parallel=False)
+
+
+    def test_tar_bz2(self):
+        self.check_expanded(self.make_tarball('w:bz2', 'tar.bz2'))
+
+
+    def test_tgz(self):
+        self.check_expanded(self.make_tarball('w:gz', 'tgz'))
+
+
+    def test_tar_xz(self):
+        if not which('xz'):
+            return
+        path = join_path(self.tmpdir, 'pkg-1.0.tar.xz')
+        with working_dir(self.src):
+            which('tar', required=True)('-cJf', path, 'pkg-1.0')
+        self.check_expanded(path)
+
+
+    def test_decompress_command(self):
+        # Serial decompressors are used when there are no parallel ones.
+        orig = compression.PARALLEL_DECOMPRESSORS
+        compression.PARALLEL_DECOMPRESSORS = { 'gz' : [['gzip', '-dc']] }
+        try:
+            self.check_expanded(self.make_tarball('w:gz', 'tar.gz'))
+        finally:
+            compression.PARALLEL_DECOMPRESSORS = orig
+
+
+    def test_zip(self):
+        path = join_path(self.tmpdir, 'pkg-1.0.zip')
+        with closing(zipfile.ZipFile(path, 'w')) as archive:
+            with working_dir(self.src):
+                for name in ('pkg-1.0/configure', 'pkg-1.0/sub/data'):
+                    archive.write(name)
+        self.check_expanded(path)
+
+
+    def test_unsafe_members_are_skipped(self):
+        path = self.make_tarball('w:gz', 'tar.gz')
+        evil = join_path(self.src, 'evil')
+        with closing(open(evil, 'w')) as f:
+            f.write('evil')
+        with closing(tarfile.open(path, 'w:gz')) as tar:
+            tar.add(join_path(self.src, 'pkg-1.0'), arcname='pkg-1.0')
+            tar.add(evil, arcname='../evil')
+
+        self.check_expanded(path)
+        self.assertFalse(os.path.exists(join_path(self.tmpdir, 'evil')))
+
+
+    def test_members_through_links_are_skipped(self):
+        outside = join_path(self.tmpdir, 'outside')
+        mkdirp(outside)
+        evil = join_path(self.src, 'evil')
+        with closing(open(evil, 'w')) as f:
+            f.write('evil')
+
+        path = join_path(self.tmpdir, 'pkg-1.0.tar.gz')
+        with closing(tarfile.open(path, 'w:gz')) as tar:
+            tar.add(join_path(self.src, 'pkg-1.0'), arcname='pkg-1.0')
+
+            link = tarfile.TarInfo('pkg-1.0/escape')
+            link.type, link.linkname = tarfile.SYMTYPE, outside
+            tar.addfile(link)
+            tar.add(evil, arcname='pkg-1.0/escape/evil')
+
+            hard = tarfile.TarInfo('pkg-1.0/hard')
+            hard.type, hard.linkname = tarfile.LNKTYPE, '../outside/hard'
+            tar.addfile(hard)
+
+        root = self.check_expanded(path)
+        self.assertEqual([], os.listdir(outside))
+        self.assertTrue(os.path.islink(join_path(root, 'escape')))
+        self.assertFalse(os.path.exists(join_path(root, 'hard')))
@@ -22,6 +22,7 @@
 # along with this program; if not, write to the Free Software Foundation,
 # Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import os
 import unittest
 
 import spack
@@ -175,3 +176,50 @@ class ConcretizeTest(MockPackagesTest):
         # TODO: not exactly the syntax I would like.
         self.assertTrue(spec['libdwarf'].compiler.satisfies('clang'))
         self.assertTrue(spec['libelf'].compiler.satisfies('clang'))
+
+
+    def test_concretization_cache(self):
+        cache = spack.concretization_cache
+        key = cache.key(Spec('mpileaks ^mpich'))
+        self.assertEqual(None, cache.get(key))
+
+        concrete = self.check_concretize('mpileaks ^mpich')
+        cached = cache.get(key)
+        self.assertEqual(concrete, cached)
+        self.assertEqual(concrete.dep_hash(), cached.dep_hash())
+        self.assertTrue(cached.concrete)
+
+        # Concretizing again uses the cached spec.
+        self.assertEqual(concrete, Spec('mpileaks ^mpich').concretized())
+
+        # Entries for the wrong spec are rejected and removed.
+        other = Spec('libelf').concretized()
+        cache.store(key, other)
+        self.assertEqual(None, cache.get(key, Spec('mpileaks ^mpich')))
+        self.assertFalse(os.path.exists(cache.path_for_key(key)))
+
+        cache.store(key, Spec('mpileaks ^zmpi').concretized())
+        self.assertEqual(concrete, Spec('mpileaks ^mpich').concretized())
+
+
+    def test_concretization_cache_trim(self):
+        cache = spack.concretization_cache
+        cache.max_entries = 2
+        for name in ('libelf', 'libdwarf', 'mpich'):
+            Spec(name).concretized()
+        self.assertEqual(2, len(cache.entries()))
+
+        self.assertEqual(2, len(cache.trim(0)))
+        self.assertEqual([], cache.entries())
+
+
+    def test_concretization_cache_key(self):
+        cache = spack.concretization_cache
+        self.assertEqual(cache.key(Spec('mpileaks')), cache.key(Spec('mpileaks')))
+        self.assertNotEqual(cache.key(Spec('mpileaks')),
+                            cache.key(Spec('mpileaks@2.3')))
+
+        # Different package repositories give different keys.
+        key = cache.key(Spec('mpileaks'))
+        spack.db = self.real_db
+        self.assertNotEqual(key, cache.key(Spec('mpileaks')))
@@ -30,13 +30,17 @@ import tempfile
 import shutil
 import os
 from contextlib import closing
+from multiprocessing import Process, Event
 
 from llnl.util.filesystem import *
 
 import spack
 from spack.spec import Spec
 from spack.packages import PackageDB
-from spack.directory_layout import SpecHashDirectoryLayout
+from spack.directory_layout import SpecHashDirectoryLayout, PrefixLockError
+from spack.concretize import ConcretizationCache
+from spack.package_metadata import PackageMetadataCache
+from llnl.util.lock import Lock
 
 class DirectoryLayoutTest(unittest.TestCase):
     """Tests that a directory layout works correctly and produces a
@@ -46,8 +50,20 @@ class DirectoryLayoutTest(unittest.TestCase):
         self.tmpdir = tempfile.mkdtemp()
         self.layout = SpecHashDirectoryLayout(self.tmpdir)
 
+        # Don't fill the real caches with every package's concretization.
+        self.cache_dir = tempfile.mkdtemp()
+        self.real_concretization_cache = spack.concretization_cache
+        spack.concretization_cache = ConcretizationCache(
+            join_path(self.cache_dir, 'concretized'))
+        db = spack.db.instance
+        self.real_metadata_cache = db.metadata_cache
+        db.metadata_cache = PackageMetadataCache(db, self.cache_dir)
+
 
     def tearDown(self):
+        spack.concretization_cache = self.real_concretization_cache
+        spack.db.instance.metadata_cache = self.real_metadata_cache
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
         shutil.rmtree(self.tmpdir, ignore_errors=True)
         self.layout = None
 
@@ -90,7 +106,8 @@ class DirectoryLayoutTest(unittest.TestCase):
 
             # Ensure that specs that come out "normal" are really normal.
             with closing(open(spec_path)) as spec_file:
-                read_separately = Spec(spec_file.read())
+                read_separately = Spec.from_json(spec_file)
+                self.assertTrue(read_separately.eq_dag(spec))
 
                 read_separately.normalize()
                 self.assertEqual(read_separately, spec_from_file)
@@ -153,3 +170,93 @@ class DirectoryLayoutTest(unittest.TestCase):
             self.assertEqual(spec.dep_hash(), spec_from_file.dep_hash())
 
         spack.db = tmp
+
+
+    def test_installed_spec_index(self):
+        """Ensure that the installed spec index is kept up to date as
+           prefixes are created and removed, and that it is rebuilt
+           from the install directories if it goes missing.
+        """
+        specs = []
+        for name in ('libelf', 'libdwarf', 'mpich'):
+            spec = Spec(name)
+            spec.concretize()
+            self.layout.make_path_for_spec(spec)
+            specs.append(spec)
+
+        index_path = self.layout.index_file_path()
+        self.assertTrue(os.path.isfile(index_path))
+        self.assertEqual(sorted(specs), sorted(self.layout.all_specs()))
+
+        # A fresh layout on the same root reads the index file.
+        layout = SpecHashDirectoryLayout(self.tmpdir)
+        self.assertEqual(sorted(specs), sorted(layout.all_specs()))
+
+        # Removing a prefix removes it from the index.
+        self.layout.remove_path_for_spec(specs[0])
+        del specs[0]
+        self.assertEqual(sorted(specs), sorted(self.layout.all_specs()))
+        layout = SpecHashDirectoryLayout(self.tmpdir)
+        self.assertEqual(sorted(specs), sorted(layout.all_specs()))
+
+        # A missing or corrupt index is rebuilt from spec files.
+        os.remove(index_path)
+        layout = SpecHashDirectoryLayout(self.tmpdir)
+        self.assertEqual(sorted(specs), sorted(layout.all_specs()))
+        self.assertTrue(os.path.isfile(index_path))
+
+        with closing(open(index_path, 'w')) as index_file:
+            index_file.write('not an index')
+        layout = SpecHashDirectoryLayout(self.tmpdir)
+        self.assertEqual(sorted(specs), sorted(layout.all_specs()))
+
+
+    def test_read_legacy_spec_file(self):
+        """Ensure that spec files written as flattened spec trees by
+           older versions of Spack can still be read."""
+        spec = Spec('mpileaks')
+        spec.concretize()
+        self.layout.make_path_for_spec(spec)
+
+        spec_path = self.layout.spec_file_path(spec)
+        with closing(open(spec_path, 'w')) as spec_file:
+            spec_file.write(spec.tree(ids=False, cover='nodes'))
+
+        spec_from_file = self.layout.read_spec(spec_path)
+        self.assertEqual(spec, spec_from_file)
+        self.assertTrue(spec.eq_dag(spec_from_file))
+        self.assertEqual(spec.dep_hash(), spec_from_file.dep_hash())
+
+
+    def test_prefix_being_built_is_not_installed(self):
+        """A prefix that another process holds the lock on, e.g. while
+           building in it, doesn't count as installed yet."""
+        spec = Spec('libelf')
+        spec.concretize()
+        prefix = self.layout.path_for_spec(spec)
+        lock_path = self.layout.prefix_lock(spec).path
+
+        started, done = Event(), Event()
+        def build():
+            with Lock(lock_path).write_locked():
+                mkdirp(prefix)
+                started.set()
+                done.wait()
+            os._exit(0)
+
+        p = Process(target=build)
+        p.start()
+        try:
+            started.wait()
+            self.assertTrue(os.path.isdir(prefix))
+            self.assertFalse(self.layout.installed(spec, wait=False))
+
+            def lock_briefly():
+                with self.layout.prefix_locked(spec, timeout=0.1):
+                    pass
+            self.assertRaises(PrefixLockError, lock_briefly)
+        finally:
+            done.set()
+            p.join()
+
+        self.assertTrue(self.layout.installed(spec))
@@ -0,0 +1,167 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Tests for the cache of downloaded source archives.
+"""
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import unittest
+from contextlib import closing
+
+from llnl.util.filesystem import *
+
+import spack
+from spack.fetch_cache import FetchCache
+from spack.fetch_strategy import URLFetchStrategy
+from spack.stage import Stage
+from spack.test.mock_repo import MockArchive
+
+
+def write_file(path, contents):
+    mkdirp(os.path.dirname(path))
+    with closing(open(path, 'w')) as f:
+        f.write(contents)
+    return hashlib.md5(contents).hexdigest()
+
+
+class FetchCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = FetchCache(join_path(self.tmpdir, 'cache'))
+        self.dest = join_path(self.tmpdir, 'dest')
+        mkdirp(self.dest)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+    def archive(self, name, contents):
+        path = join_path(self.tmpdir, 'archives', name)
+        return path, write_file(path, contents)
+
+
+    def test_store_and_fetch(self):
+        path, digest = self.archive('foo-1.0.tar.gz', 'foo archive')
+        mirror_path = 'foo/foo-1.0.tar.gz'
+        self.assertEqual(self.cache.fetch(digest, mirror_path, self.dest), None)
+
+        self.cache.store(digest, mirror_path, path)
+        cached = self.cache.path_for(digest, mirror_path)
+        self.assertTrue(os.path.isfile(cached))
+        self.assertTrue(digest in cached)
+
+        fetched = self.cache.fetch(digest, mirror_path, self.dest)
+        self.assertEqual(fetched, join_path(self.dest, 'foo-1.0.tar.gz'))
+        self.assertEqual(open(fetched).read(), 'foo archive')
+
+        # Other contents under the same name are a different entry.
+        other = hashlib.md5('other').hexdigest()
+        self.assertEqual(self.cache.fetch(other, mirror_path, self.dest), None)
+
+
+    def test_corrupt_archive_is_removed(self):
+        path, digest = self.archive('foo-1.0.tar.gz', 'foo archive')
+        mirror_path = 'foo/foo-1.0.tar.gz'
+        self.cache.store(digest, mirror_path, path)
+
+        cached = self.cache.path_for(digest, mirror_path)
+        os.remove(cached)
+        write_file(cached, 'corrupted')
+
+        self.assertEqual(self.cache.fetch(digest, mirror_path, self.dest), None)
+        self.assertFalse(os.path.exists(cached))
+        self.assertEqual(self.cache.entries(), [])
+
+
+    def test_lru_eviction(self):
+        keys = []
+        for i, name in enumerate(('a', 'b', 'c')):
+            path, digest = self.archive('%s-1.0.tar.gz' % name, name * 100)
+            mirror_path = '%s/%s-1.0.tar.gz' % (name, name)
+            self.cache.store(digest, mirror_path, path)
+
+            cached = self.cache.path_for(digest, mirror_path)
+            os.utime(cached, (i, i))
+            keys.append((digest, mirror_path))
+
+        # Using 'a' makes 'b' the least recently used.
+        self.cache.fetch(keys[0][0], keys[0][1], self.dest)
+        self.assertEqual(self.cache.size(), 300)
+
+        removed = self.cache.trim(200)
+        self.assertEqual(removed, [self.cache.path_for(*keys[1])])
+        self.assertEqual(self.cache.size(), 200)
+
+        self.cache.max_size = 100
+        path, digest = self.archive('d-1.0.tar.gz', 'd' * 100)
+        self.cache.store(digest, 'd/d-1.0.tar.gz', path)
+        self.assertEqual([p for p, s, m in self.cache.entries()],
+                         [self.cache.path_for(digest, 'd/d-1.0.tar.gz')])
+
+        self.cache.clean()
+        self.assertEqual(self.cache.entries(), [])
+
+
+    def test_stage_uses_cache(self):
+        repo = MockArchive()
+        orig_cache = spack.fetch_cache
+        spack.fetch_cache = self.cache
+        try:
+            digest = hashlib.md5(open(repo.archive_path).read()).hexdigest()
+            mirror_path = 'mock-archive/mock-archive-1.0.tar.gz'
+
+            # A checked fetch populates the cache.
+            stage = Stage(URLFetchStrategy(repo.url, digest),
+                          mirror_path=mirror_path)
+            try:
+                stage.fetch()
+                stage.check()
+            finally:
+                stage.destroy()
+            self.assertTrue(
+                os.path.isfile(self.cache.path_for(digest, mirror_path)))
+
+            # The next stage gets the archive from the cache, even if
+            # the original is gone.
+            os.rename(repo.archive_path, repo.archive_path + '.moved')
+            stage = Stage(URLFetchStrategy(repo.url, digest),
+                          mirror_path=mirror_path)
+            try:
+                stage.fetch()
+                stage.check()
+                stage.expand_archive()
+                self.assertTrue(stage.source_path)
+            finally:
+                stage.destroy()
+                os.rename(repo.archive_path + '.moved', repo.archive_path)
+
+        finally:
+            spack.fetch_cache = orig_cache
+            repo.stage.destroy()
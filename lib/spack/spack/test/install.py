@@ -31,9 +31,11 @@ from contextlib import closing
 from llnl.util.filesystem import *
 
 import spack
+import spack.installer
 from spack.stage import Stage
 from spack.fetch_strategy import URLFetchStrategy
 from spack.directory_layout import SpecHashDirectoryLayout
+from spack.timer import read_timing_file
 from spack.util.executable import which
 from spack.test.mock_packages_test import *
 from spack.test.mock_repo import MockArchive
@@ -90,3 +92,88 @@ class InstallTest(MockPackagesTest):
         except Exception, e:
             pkg.remove_prefix()
             raise
+
+
+    def test_install_timings(self):
+        spec = Spec('trivial_install_test_package')
+        spec.concretize()
+        pkg = spack.db.get(spec)
+        pkg.fetcher = URLFetchStrategy(self.repo.url)
+
+        try:
+            pkg.do_install()
+            timings = read_timing_file(
+                spack.install_layout.timing_file_path(spec))
+            self.assertEqual(timings['name'], 'trivial_install_test_package')
+
+            phases = [name for name, seconds in timings['timer'].phases]
+            for phase in ('fetch', 'expand', 'install', 'install/configure',
+                          'install/build', 'install/install', 'post_install'):
+                self.assertTrue(phase in phases)
+            self.assertTrue(timings['total'] >= timings['timer'].get('install'))
+
+            pkg.do_uninstall()
+        except Exception, e:
+            pkg.remove_prefix()
+            raise
+
+
+    def test_install_order(self):
+        spec = Spec('mpileaks')
+        spec.concretize()
+
+        order, nodes, deps = spack.installer.install_order([spec, spec])
+        self.assertEqual(len(order), len(list(spec.traverse())))
+        self.assertEqual(nodes[order[-1]], spec)
+
+        # Every package must come after all of its dependencies.
+        for i, prefix in enumerate(order):
+            self.assertTrue(deps[prefix] <= set(order[:i]))
+
+        order, nodes, deps = spack.installer.install_order(
+            [spec], ignore_deps=True)
+        self.assertEqual(order, [spack.install_layout.path_for_spec(spec)])
+        self.assertEqual(deps[order[0]], set())
+
+
+    def test_parallel_install(self):
+        spec = Spec('trivial_install_test_package')
+        spec.concretize()
+
+        pkg = spack.db.get(spec)
+        pkg.fetcher = URLFetchStrategy(self.repo.url)
+
+        log_dir = join_path(self.tmpdir, 'logs')
+        try:
+            spack.installer.install([spec], 2, log_dir=log_dir)
+            self.assertTrue(pkg.installed)
+            self.assertTrue(os.path.isfile(
+                join_path(log_dir, spec.short_spec + '.log')))
+            pkg.do_uninstall()
+        except Exception, e:
+            pkg.remove_prefix()
+            raise
+
+
+    def test_parallel_fetch(self):
+        spec = Spec('trivial_install_test_package')
+        spec.concretize()
+
+        pkg = spack.db.get(spec)
+        pkg.fetcher = URLFetchStrategy(self.repo.url)
+
+        log_dir = join_path(self.tmpdir, 'logs')
+        try:
+            spack.installer.fetch([spec], 2, log_dir=log_dir)
+            self.assertTrue(os.path.isfile(
+                join_path(log_dir, spec.short_spec + '-fetch.log')))
+
+            # The fetched archive is in the package's stage.
+            self.assertTrue(pkg.stage.archive_file)
+
+            # The parent gets the fetch time measured by the child.
+            self.assertTrue('fetch' in [n for n, s in pkg.timer.phases])
+            self.assertEqual([], [f for f in os.listdir(log_dir)
+                                  if f.endswith('.json')])
+        finally:
+            pkg.do_clean()
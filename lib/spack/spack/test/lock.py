@@ -0,0 +1,105 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+These tests ensure that Spack's file locks exclude other processes.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from multiprocessing import Process
+
+from llnl.util.filesystem import join_path
+from llnl.util.lock import *
+
+
+class LockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.lock_path = join_path(self.tempdir, 'dir', 'lockfile')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+
+    def run_in_child(self, function):
+        """Run function in a separate process, and return True if it
+           completed without an exception."""
+        def child():
+            try:
+                function()
+            except LockError:
+                os._exit(1)
+            os._exit(0)
+
+        p = Process(target=child)
+        p.start()
+        p.join()
+        return p.exitcode == 0
+
+
+    def acquire_read(self):
+        Lock(self.lock_path).acquire_read(0.1)
+
+
+    def acquire_write(self):
+        Lock(self.lock_path).acquire_write(0.1)
+
+
+    def test_write_lock_excludes_everything(self):
+        lock = Lock(self.lock_path)
+        with lock.write_locked():
+            self.assertFalse(self.run_in_child(self.acquire_read))
+            self.assertFalse(self.run_in_child(self.acquire_write))
+
+        self.assertTrue(self.run_in_child(self.acquire_read))
+        self.assertTrue(self.run_in_child(self.acquire_write))
+
+
+    def test_read_lock_is_shared(self):
+        lock = Lock(self.lock_path)
+        with lock.read_locked():
+            self.assertTrue(self.run_in_child(self.acquire_read))
+            self.assertFalse(self.run_in_child(self.acquire_write))
+
+        self.assertTrue(self.run_in_child(self.acquire_write))
+
+
+    def test_nested_and_upgraded_locks(self):
+        lock = Lock(self.lock_path)
+        with lock.read_locked():
+            with lock.write_locked():
+                with lock.write_locked():
+                    self.assertTrue(lock.locked)
+                self.assertFalse(self.run_in_child(self.acquire_read))
+
+            # Releasing the write lock goes back to a read lock.
+            self.assertTrue(self.run_in_child(self.acquire_read))
+            self.assertFalse(self.run_in_child(self.acquire_write))
+
+        self.assertFalse(lock.locked)
+        self.assertTrue(self.run_in_child(self.acquire_write))
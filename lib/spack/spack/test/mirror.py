@@ -154,3 +154,41 @@ class MirrorTest(MockPackagesTest):
         self.set_up_package('hg-test',  MockHgRepo,  'hg')
         self.set_up_package('trivial_install_test_package', MockArchive, 'url')
         self.check_mirror()
+
+
+    def test_manifest(self):
+        self.set_up_package('trivial_install_test_package', MockArchive, 'url')
+        stage = Stage('spack-mirror-test')
+        mirror_root = join_path(stage.path, 'test-mirror')
+        try:
+            present, mirrored, error = spack.mirror.create(
+                mirror_root, self.repos, no_checksum=True)
+            self.assertEqual((len(present), len(mirrored), len(error)), (0, 1, 0))
+
+            manifest = spack.mirror.read_manifest(mirror_root)
+            self.assertEqual(len(manifest), 1)
+            entry = manifest.values()[0]
+            archive_path = join_path(mirror_root, entry['path'])
+            self.assertEqual(entry['size'], os.path.getsize(archive_path))
+
+            # Specs that match the same version are only added once.
+            names = list(self.repos)
+            present, mirrored, error = spack.mirror.create(
+                join_path(stage.path, 'other-mirror'), names + names,
+                no_checksum=True)
+            self.assertEqual((len(present), len(mirrored), len(error)), (0, 1, 0))
+
+            # Archives in the manifest are skipped without a stat.
+            os.remove(archive_path)
+            present, mirrored, error = spack.mirror.create(
+                mirror_root, self.repos, no_checksum=True)
+            self.assertEqual((len(present), len(mirrored), len(error)), (1, 0, 0))
+
+            # Without a manifest, archives are looked for on disk.
+            os.remove(join_path(mirror_root, spack.mirror.manifest_name))
+            present, mirrored, error = spack.mirror.create(
+                mirror_root, self.repos, no_checksum=True)
+            self.assertEqual((len(present), len(mirrored), len(error)), (0, 1, 0))
+
+        finally:
+            stage.destroy()
@@ -22,11 +22,17 @@
 # along with this program; if not, write to the Free Software Foundation,
 # Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import shutil
+import tempfile
 import unittest
 
+from llnl.util.filesystem import join_path
+
 import spack
 import spack.config
 from spack.packages import PackageDB
+from spack.package_metadata import PackageMetadataCache
+from spack.concretize import ConcretizationCache
 from spack.spec import Spec
 
 
@@ -51,9 +57,21 @@ class MockPackagesTest(unittest.TestCase):
             'site' : spack.mock_site_config,
             'user' : spack.mock_user_config }
 
+        # Keep what is cached about mock packages out of the real
+        # caches.  Tests also change packages in memory (see
+        # set_pkg_dep), which the concretization cache can't see.
+        self.mock_cache_path = tempfile.mkdtemp()
+        spack.db.metadata_cache = PackageMetadataCache(
+            spack.db, self.mock_cache_path)
+        self.real_concretization_cache = spack.concretization_cache
+        spack.concretization_cache = ConcretizationCache(
+            join_path(self.mock_cache_path, 'concretized'))
+
 
     def tearDown(self):
         """Restore the real packages path after any test."""
         spack.db = self.real_db
         spack.config._scopes = self.real_scopes
+        spack.concretization_cache = self.real_concretization_cache
+        shutil.rmtree(self.mock_cache_path, ignore_errors=True)
 
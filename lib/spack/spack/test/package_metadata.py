@@ -0,0 +1,179 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""\
+Tests for the persistent package metadata cache.
+"""
+import os
+import shutil
+import tempfile
+
+from llnl.util.filesystem import join_path
+
+import spack
+from spack.spec import Spec
+from spack.version import Version
+from spack.packages import PackageDB
+from spack.package_metadata import PackageMetadataCache
+from spack.virtual import ProviderIndex
+from spack.test.mock_packages_test import *
+
+
+class PackageMetadataTest(MockPackagesTest):
+
+    def setUp(self):
+        super(PackageMetadataTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = join_path(self.tmpdir, 'cache')
+        self.packages_path = join_path(self.tmpdir, 'packages')
+        shutil.copytree(spack.mock_packages_path, self.packages_path)
+
+
+    def tearDown(self):
+        super(PackageMetadataTest, self).tearDown()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+    def new_cache(self, **kwargs):
+        """Make a fresh cache, as a new spack process would.  If
+           loadable is False, loading any package is an error."""
+        db = spack.db = PackageDB(self.packages_path)
+        if not kwargs.get('loadable', True):
+            def fail(name):
+                self.fail("Loaded package %s instead of using cache." % name)
+            db.get_class_for_package_name = fail
+        db.metadata_cache = PackageMetadataCache(db, self.cache_dir)
+        return db.metadata_cache
+
+
+    def test_metadata_matches_package(self):
+        metadata = self.new_cache().get('mpileaks')
+        pkg = spack.db.get('mpileaks')
+
+        self.assertEqual(sorted(pkg.versions), sorted(metadata.versions))
+        self.assertEqual(pkg.dependencies, metadata.dependencies)
+
+        metadata = self.new_cache().get('mpich2')
+        self.assertEqual(spack.db.get('mpich2').provided, metadata.provided)
+
+
+    def test_cache_is_reused(self):
+        cache = self.new_cache()
+        all_metadata = cache.get_all()
+        self.assertTrue(os.path.exists(cache.cache_file))
+
+        cached = self.new_cache(loadable=False).get_all()
+        self.assertEqual(sorted(all_metadata), sorted(cached))
+        for name in all_metadata:
+            self.assertEqual(all_metadata[name].entry, cached[name].entry)
+
+
+    def touch_package(self, name):
+        """Move a package's mtime forward and return the new mtime."""
+        pkg_file = join_path(self.packages_path, name, 'package.py')
+        mtime = os.stat(pkg_file).st_mtime + 10
+        os.utime(pkg_file, (mtime, mtime))
+        return mtime
+
+
+    def test_changed_package_is_reloaded(self):
+        self.new_cache().get_all()
+        mtime = self.touch_package('libelf')
+
+        self.assertRaises(AssertionError,
+                          self.new_cache(loadable=False).get, 'libelf')
+        self.new_cache(loadable=False).get('mpich')
+
+        metadata = self.new_cache().get('libelf')
+        self.assertEqual(mtime, metadata.mtime)
+        self.assertTrue(Version('0.8.13') in metadata.versions)
+        self.new_cache(loadable=False).get('libelf')
+
+
+    def provider_names(self, index, vpkg):
+        return sorted(set(s.name for s in index.providers_for(vpkg)))
+
+
+    def test_provider_index_round_trip(self):
+        index = ProviderIndex(spack.db.all_package_names())
+        copy = ProviderIndex.from_dict(index.to_dict())
+        self.assertEqual(index.providers, copy.providers)
+
+        index.remove_provider('mpich2')
+        self.assertEqual(['mpich', 'zmpi'], self.provider_names(index, 'mpi'))
+
+
+    def test_provider_index_is_cached(self):
+        index = self.new_cache().provider_index()
+        expected = ProviderIndex(spack.db.all_package_names())
+        self.assertEqual(expected.providers, index.providers)
+
+        cached = self.new_cache(loadable=False).provider_index()
+        self.assertEqual(expected.providers, cached.providers)
+
+
+    def test_provider_index_incremental_update(self):
+        self.new_cache().provider_index()
+
+        # Make zmpi stop providing mpi.  Only zmpi should be reloaded.
+        pkg_file = join_path(self.packages_path, 'zmpi', 'package.py')
+        with open(pkg_file) as f:
+            text = f.read()
+        with open(pkg_file, 'w') as f:
+            f.write(text.replace("provides('mpi", "# provides('mpi"))
+        self.touch_package('zmpi')
+
+        cache = self.new_cache()
+        load = cache.db.get_class_for_package_name
+        loaded = []
+        def load_and_record(name):
+            loaded.append(name)
+            return load(name)
+        cache.db.get_class_for_package_name = load_and_record
+
+        index = cache.provider_index()
+        self.assertEqual(['zmpi'], loaded)
+        self.assertEqual(['mpich', 'mpich2'], self.provider_names(index, 'mpi'))
+
+
+    def test_provider_index_uses_own_db(self):
+        # Make zmpi in the copied packages stop providing mpi, but
+        # leave spack.db pointing at the mock packages.
+        pkg_file = join_path(self.packages_path, 'zmpi', 'package.py')
+        with open(pkg_file) as f:
+            text = f.read()
+        with open(pkg_file, 'w') as f:
+            f.write(text.replace("provides('mpi", "# provides('mpi"))
+
+        db = PackageDB(self.packages_path)
+        cache = PackageMetadataCache(db, self.cache_dir)
+        self.assertEqual(['mpich', 'mpich2'],
+                         self.provider_names(cache.provider_index(), 'mpi'))
+        self.assertTrue('zmpi' in self.provider_names(
+            spack.db.metadata_cache.provider_index(), 'mpi'))
+
+
+    def test_providers_use_metadata(self):
+        providers = spack.db.providers_for('mpi@2')
+        self.assertTrue('mpich2' in [p.name for p in providers])
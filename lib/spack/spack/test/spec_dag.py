@@ -445,3 +445,88 @@ class SpecDagTest(MockPackagesTest):
         orig_ids = set(id(s) for s in orig.traverse())
         copy_ids = set(id(s) for s in copy.traverse())
         self.assertFalse(orig_ids.intersection(copy_ids))
+
+
+    def test_json_round_trip(self):
+        orig = Spec('mpileaks')
+        orig.concretize()
+        copy = Spec.from_json(orig.to_json())
+
+        self.check_links(copy)
+
+        self.assertEqual(orig, copy)
+        self.assertTrue(orig.eq_dag(copy))
+        self.assertEqual(orig.dep_hash(), copy.dep_hash())
+        self.assertTrue(copy.concrete)
+
+
+    def test_json_invalid(self):
+        self.assertRaises(spack.spec.SpecError, Spec.from_json, '')
+        self.assertRaises(spack.spec.SpecError, Spec.from_json, '{}')
+        self.assertRaises(spack.spec.SpecError, Spec.from_json, '{"spec": []}')
+
+
+    def test_concrete_hash_cached(self):
+        spec = Spec('mpileaks')
+        spec.concretize()
+        h = hash(spec)
+        copy = spec.copy()
+
+        # Hashing and comparing a concrete spec again doesn't traverse it.
+        flat_dependencies = Spec.flat_dependencies
+        def fail(self, **kwargs):
+            raise AssertionError("Concrete spec was traversed again.")
+        Spec.flat_dependencies = fail
+        try:
+            self.assertEqual(hash(spec), h)
+            self.assertEqual(hash(copy), h)
+            self.assertEqual(spec, copy)
+        finally:
+            Spec.flat_dependencies = flat_dependencies
+
+        # Non-concrete specs still see their changes.
+        abstract = Spec('mpileaks')
+        abstract.normalize()
+        before = hash(abstract)
+        abstract['callpath'].versions = spack.spec.VersionList(['0.8'])
+        self.assertNotEqual(hash(abstract), before)
+
+
+    def test_node_index(self):
+        spec = Spec('mpileaks ^mpich ^callpath ^dyninst ^libelf@1.8.11 ^libdwarf')
+        spec.normalize()
+        self.assertTrue(spec['libelf'] is spec['dyninst']['libelf'])
+        self.assertRaises(KeyError, spec['libelf'].__getitem__, 'dyninst')
+        self.assertEqual(spec.common_dependencies(spec['callpath']),
+                         set(['mpich', 'dyninst', 'libelf', 'libdwarf']))
+        self.assertTrue('libelf@1.8.11' in spec)
+        self.assertFalse('libelf@1.8.12' in spec)
+
+        # Lookups see changes to the DAG.
+        spec['libdwarf'].dependencies.clear()
+        self.assertRaises(KeyError, spec['libdwarf'].__getitem__, 'libelf')
+        self.assertTrue(spec['libelf'] is spec['dyninst']['libelf'])
+
+        copy = spec['dyninst'].copy(deps=False)
+        copy._dup(spec['mpich'])
+        self.assertEqual(copy['mpich'].name, 'mpich')
+        self.assertRaises(KeyError, copy.__getitem__, 'dyninst')
+
+
+    def test_copy_on_write(self):
+        orig = Spec('mpileaks ^mpich ^callpath@0.8:0.9%gcc')
+        orig.normalize()
+        copy = orig.copy()
+        self.assertTrue(copy['callpath'].versions is orig['callpath'].versions)
+
+        # Changing either spec doesn't change the other.
+        copy['callpath'].constrain('callpath@0.9+debug%gcc@4.5')
+        self.assertEqual(str(orig['callpath'].versions), '0.8:0.9')
+        self.assertEqual(str(orig['callpath'].compiler), 'gcc')
+        self.assertFalse('debug' in orig['callpath'].variants)
+        self.assertEqual(str(copy['callpath'].versions), '0.9')
+        self.assertEqual(str(copy['callpath'].compiler), 'gcc@4.5')
+
+        orig['mpich'].constrain('mpich@2.0')
+        self.assertEqual(str(orig['mpich'].versions), '2.0')
+        self.assertEqual(str(copy['mpich'].versions), ':')
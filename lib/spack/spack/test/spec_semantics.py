@@ -172,6 +172,35 @@ class SpecSematicsTest(MockPackagesTest):
         self.check_invalid_constraint('libelf=bgqos_0', 'libelf=x86_54')
 
 
+    def test_constrain_memoized(self):
+        a = Spec('libelf@0:2.5+debug')
+        b = Spec('libelf@0:2.5+debug')
+        a.constrain('libelf@2.1:3')
+        b.constrain('libelf@2.1:3')
+        self.assertTrue(a.versions is b.versions)
+
+        # Constraining one of them further doesn't change the other.
+        a.constrain('libelf@2.2~foo')
+        self.assertEqual(Spec('libelf@2.2+debug~foo'), a)
+        self.assertEqual(Spec('libelf@2.1:2.5+debug'), b)
+
+        # Failures are remembered too.
+        for i in range(2):
+            self.check_invalid_constraint('libelf+debug', 'libelf~debug')
+
+
+    def test_satisfies_memoized(self):
+        spec = Spec('mpileaks ^mpich@3.0.4')
+        for i in range(2):
+            self.assertTrue(spec.satisfies('^mpi@2:'))
+            self.assertFalse(spec.satisfies('^mpi@4:'))
+
+        # Changing the spec changes what it satisfies.
+        spec['mpich'].constrain('mpich@3.0.4+debug')
+        self.assertTrue(spec.satisfies('^mpich+debug'))
+        self.assertFalse(spec.satisfies('^mpich~debug'))
+
+
     def test_compiler_satisfies(self):
         self.check_satisfies('foo %gcc@4.7.3', '%gcc@4.7')
         self.check_unsatisfiable('foo %gcc@4.7', '%gcc@4.7.3')
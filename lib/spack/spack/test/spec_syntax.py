@@ -141,6 +141,23 @@ class SpecSyntaxTest(unittest.TestCase):
         self.assertRaises(DuplicateCompilerSpecError, self.check_parse, "x ^y%gcc%intel")
 
 
+    def test_parse_cache_returns_copies(self):
+        first = spack.spec.parse("x@1.2^y")[0]
+        first.versions = VersionList(['3.4'])
+        first.dependencies['y'].versions = VersionList(['5.6'])
+
+        second = spack.spec.parse("x@1.2^y")[0]
+        self.assertEqual("x@1.2^y", str(second))
+        self.assertFalse(first is second)
+
+
+    def test_parse_many(self):
+        specs = spack.spec.parse_many(["x@1.2", "y^z", "x@1.2"])
+        self.assertEqual(["x@1.2", "y^z", "x@1.2"], [str(s) for s in specs])
+        self.assertFalse(specs[0] is specs[2])
+        self.assertRaises(SpecParseError, spack.spec.parse_many, ["x", "x@@1"])
+
+
     # ================================================================================
     # Lex checks
     # ================================================================================
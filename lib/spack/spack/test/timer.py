@@ -0,0 +1,83 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Tests for spack.timer.
+"""
+import unittest
+
+from spack.timer import Timer, TimedExecutable, make_phase, aggregate
+
+
+class TimerTest(unittest.TestCase):
+
+    def test_phases(self):
+        timer = Timer()
+        with timer.phase('install'):
+            with timer.phase('configure'):
+                pass
+            with timer.phase('build'):
+                pass
+        with timer.phase('post_install'):
+            pass
+        timer.add('fetch', 2.0)
+        timer.add('fetch', 1.0)
+
+        self.assertEqual(
+            [name for name, seconds in timer.phases],
+            ['install', 'install/configure', 'install/build',
+             'post_install', 'fetch'])
+        self.assertEqual(timer.get('fetch'), 3.0)
+        self.assertEqual(timer.get('patch'), 0.0)
+        self.assertTrue(timer.get('install') >= timer.get('install/build'))
+
+
+    def test_dict_round_trip(self):
+        timer = Timer()
+        timer.add('fetch', 1.5)
+        timer.add('install', 2.5)
+        copy = Timer.from_dict(timer.to_dict())
+        self.assertEqual(copy.phases, timer.phases)
+
+
+    def test_timed_executable(self):
+        calls = []
+        timer = Timer()
+        make = TimedExecutable(lambda *args: calls.append(args), timer, make_phase)
+        make()
+        make('install')
+
+        self.assertEqual(calls, [(), ('install',)])
+        self.assertEqual([name for name, seconds in timer.phases],
+                         ['build', 'install'])
+
+
+    def test_aggregate(self):
+        timers = [Timer(), Timer()]
+        timers[0].add('fetch', 1.0)
+        timers[0].add('install', 2.0)
+        timers[1].add('install', 3.0)
+
+        phases = aggregate([{ 'timer' : t } for t in timers])
+        self.assertEqual(phases, [('fetch', 1.0, 1), ('install', 5.0, 2)])
@@ -0,0 +1,160 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Tests for fetching archives with URLFetchStrategy.
+"""
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+from llnl.util.filesystem import *
+
+import spack
+import spack.util.crypto as crypto
+from spack.cmd.checksum import get_checksums
+from spack.fetch_cache import FetchCache
+from spack.fetch_strategy import URLFetchStrategy, ChecksumError
+from spack.stage import Stage
+from spack.test.mock_repo import MockArchive
+
+
+class URLFetchTest(unittest.TestCase):
+    """Tests that archives are checked while they are downloaded."""
+
+    def setUp(self):
+        self.repo = MockArchive()
+        self.digest = hashlib.md5(open(self.repo.archive_path).read()).hexdigest()
+        self.bad_digest = hashlib.md5('bad').hexdigest()
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.orig_cache = spack.fetch_cache
+        spack.fetch_cache = FetchCache(self.tmpdir)
+
+        # Fail if anything reads the archive again to check it.
+        self.orig_checksum = crypto.checksum
+        def checksum(*args, **kwargs):
+            self.fail("Archive was read again to check its checksum.")
+        crypto.checksum = checksum
+
+        self.stage = None
+
+
+    def tearDown(self):
+        crypto.checksum = self.orig_checksum
+        spack.fetch_cache = self.orig_cache
+        spack.do_checksum = True
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+        if self.stage is not None:
+            self.stage.destroy()
+        self.repo.stage.destroy()
+
+
+    def make_stage(self, digest, **kwargs):
+        self.stage = Stage(URLFetchStrategy(self.repo.url, digest), **kwargs)
+        return self.stage
+
+
+    def test_checked_while_fetching(self):
+        stage = self.make_stage(self.digest)
+        stage.fetch()
+        self.assertTrue(stage.fetcher.verified())
+        stage.check()
+        stage.expand_archive()
+        self.assertTrue(stage.source_path)
+
+
+    def test_verified_in_other_process(self):
+        stage = self.make_stage(self.digest, name='url-fetch-test')
+        stage.fetch()
+
+        # A new fetcher for the same stage, as in a process that didn't
+        # do the fetch, knows the archive was checked.
+        fetcher = URLFetchStrategy(self.repo.url, self.digest)
+        Stage(fetcher, name='url-fetch-test')
+        self.assertTrue(fetcher.verified())
+        fetcher.check()
+
+        # But not once the archive is replaced.
+        os.utime(stage.archive_file, (0, 0))
+        fetcher = URLFetchStrategy(self.repo.url, self.digest)
+        Stage(fetcher, name='url-fetch-test')
+        self.assertFalse(fetcher.verified())
+
+        fetcher = URLFetchStrategy(self.repo.url, self.bad_digest)
+        Stage(fetcher, name='url-fetch-test')
+        self.assertFalse(fetcher.verified())
+
+
+    def test_bad_checksum(self):
+        stage = self.make_stage(self.bad_digest)
+        self.assertRaises(ChecksumError, stage.fetcher.fetch)
+        self.assertEqual(stage.archive_file, None)
+
+
+    def test_bad_checksum_is_reported(self):
+        stage = self.make_stage(self.bad_digest)
+        try:
+            stage.fetch()
+            self.fail("Fetch with a bad checksum succeeded.")
+        except ChecksumError, e:
+            self.assertTrue(self.bad_digest in e.long_message)
+            self.assertTrue(self.digest in e.long_message)
+
+
+    def test_bad_checksum_without_do_checksum(self):
+        spack.do_checksum = False
+        stage = self.make_stage(self.bad_digest)
+        stage.fetch()
+        self.assertFalse(stage.fetcher.verified())
+        self.assertTrue(stage.archive_file)
+
+
+    def test_copy_to_fetch_cache(self):
+        mirror_path = 'mock-archive/mock-archive-1.0.tar.gz'
+        stage = self.make_stage(self.digest, mirror_path=mirror_path)
+        stage.fetch()
+
+        cached = spack.fetch_cache.path_for(self.digest, mirror_path)
+        self.assertTrue(os.path.isfile(cached))
+        self.assertEqual(open(cached).read(), open(stage.archive_file).read())
+
+        # No temporary files are left behind in the cache.
+        files = [join_path(d, f) for d, ds, fs in os.walk(self.tmpdir) for f in fs]
+        self.assertEqual(files, [cached])
+
+
+    def test_get_checksums(self):
+        data = open(self.repo.archive_path).read()
+        missing = self.repo.url + '.missing'
+        urls = [self.repo.url, missing, self.repo.url]
+        hashes = get_checksums(['3.0', '2.0', '1.0'], urls,
+                               algorithm='sha256', jobs=3)
+
+        # Failed downloads are left out, and the rest stay in order.
+        sha256 = hashlib.sha256(data).hexdigest()
+        self.assertEqual(hashes, [('3.0', sha256), ('1.0', sha256)])
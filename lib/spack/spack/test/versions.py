@@ -27,6 +27,7 @@ These version tests were taken from the RPM source code.
 We try to maintain compatibility with RPM's version semantics
 where it makes sense.
 """
+import pickle
 import unittest
 from spack.version import *
 
@@ -329,6 +330,14 @@ class VersionsTest(unittest.TestCase):
                                 ['1.1:2.7'], ['2.5:3.0','1.0'])
         self.check_intersection(['0:1'], [':'], ['0:1'])
 
+        # Ranges that cover several elements of the other list, and
+        # versions that cover more specific ones.
+        self.check_intersection(['1.2', '1.6.5', '3.1:3.2', '4'],
+                                ['1.0:2.0', '3:3.2', '4'],
+                                ['1.2', '1.6.5', '2.5', '3.1:5'])
+        self.check_intersection(['1.10:2.1.3', '3.3.3', '3.10.1'],
+                                ['1.10:2.1.3', '3.3.3', '3.10.1'], [':3', '3.1.2'])
+
 
     def test_intersect_with_containment(self):
         self.check_intersection('1.6.5', '1.6.5', ':1.6')
@@ -422,3 +431,10 @@ class VersionsTest(unittest.TestCase):
 
         self.assert_satisfies('4.8.0', '4.2, 4.3:4.8')
         self.assert_satisfies('4.8.2', '4.2, 4.3:4.8')
+
+
+    def test_interned(self):
+        self.assertTrue(Version('1.2.3') is Version('1.2.3'))
+        self.assertTrue(ver('1.2.3') is ver(['1.2.3'])[0])
+        self.assertEqual(pickle.loads(pickle.dumps(Version('1.2.3'))), Version('1.2.3'))
+        self.assertEqual(Version('1_55_0').separators, ('_', '_'))
@@ -0,0 +1,184 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Tests for the web spider, against a local HTTP server.
+"""
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+import BaseHTTPServer
+import SocketServer
+
+import spack.util.web as web
+
+
+# Pages on the test server, by path.
+pages = {
+    '/' : ('<a href="a/">a</a> <a href="b/">b</a> <a href="a/">a again</a>'
+           '<a href="foo-1.0.tar.gz">tarball</a> <a href="other">other</a>'
+           '<a href="http://example.com/">outside</a>'),
+    '/a/' : '<a href="../b/">b</a> <a href="c/">c</a> <a href="redirect">r</a>',
+    '/b/' : '<a href="/a/">a</a> <a href="c/">c</a>',
+    '/a/c/' : 'deepest',
+    '/b/c/' : '<a href="d/">too deep</a>',
+}
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def respond(self, body):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path))
+            server.connections.add(self.client_address)
+
+        if self.path == '/a/redirect':
+            self.send_response(302)
+            self.send_header('Location', '/b/')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path == '/other':
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', '3')
+            self.end_headers()
+            if body: self.wfile.write('abc')
+        elif self.path in pages:
+            page = pages[self.path]
+            etag = '"%s"' % hashlib.md5(page).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                with server.lock:
+                    server.not_modified += 1
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(page)))
+            self.end_headers()
+            if body: self.wfile.write(page)
+        else:
+            self.send_error(404)
+
+    def do_HEAD(self):
+        self.respond(False)
+
+    def do_GET(self):
+        self.respond(True)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class SpiderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.connections = set()
+        self.server.not_modified = 0
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.root = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    def test_depth_1(self):
+        pages = web.get_pages(self.root)
+        self.assertEqual(pages.keys(), [self.root])
+        self.assertEqual(self.server.requests, [('HEAD', '/'), ('GET', '/')])
+
+
+    def test_spider(self):
+        pages = web.get_pages(self.root, depth=3, concurrency=4, max_per_host=2)
+        self.assertEqual(sorted(pages), sorted(
+            self.root + p.lstrip('/') for p in ('/', '/a/', '/b/', '/a/c/', '/b/c/')))
+        self.assertEqual(pages[self.root + 'a/c/'], 'deepest')
+
+        # Every URL is requested with each method at most once, even
+        # though pages link to each other and redirect.
+        requests = self.server.requests
+        self.assertEqual(len(requests), len(set(requests)))
+        self.assertFalse(('GET', '/other') in requests)
+        self.assertFalse(('HEAD', '/b/c/d/') in requests)
+
+        # Connections are kept alive and reused.
+        self.assertTrue(len(self.server.connections) <= 2)
+
+
+    def test_missing_root(self):
+        self.assertEqual(web.get_pages(self.root + 'missing/'), {})
+        self.assertRaises(Exception, web.get_pages, self.root + 'missing/',
+                          raise_on_error=True)
+
+
+    def test_page_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            cache = web.PageCache(cache_dir, 3600)
+            first = web.get_pages(self.root, depth=2, cache=cache)
+
+            # Fresh pages are used without asking the server.
+            del self.server.requests[:]
+            self.assertEqual(web.get_pages(self.root, depth=2, cache=cache), first)
+            self.assertEqual(self.server.requests, [])
+
+            # Revalidating asks only for HTML pages, without a HEAD
+            # request, and the server says they haven't changed.
+            self.assertEqual(web.get_pages(self.root, depth=2, cache=cache,
+                                           revalidate=True), first)
+            gets = [r for r in self.server.requests if r[0] == 'GET']
+            self.assertEqual(sorted(gets), [('GET', '/'), ('GET', '/a/'), ('GET', '/b/')])
+            self.assertEqual(self.server.not_modified, 3)
+            self.assertFalse(('HEAD', '/a/') in self.server.requests)
+
+            # Changed pages are downloaded again once they're stale.
+            old_page = pages['/a/c/']
+            pages['/a/c/'] = 'changed'
+            try:
+                stale = web.PageCache(cache_dir, 0)
+                new_pages = web.get_pages(self.root + 'a/', depth=2, cache=stale)
+                self.assertEqual(new_pages[self.root + 'a/c/'], 'changed')
+                self.assertEqual(cache.get(self.root + 'a/c/')['body'], 'changed')
+            finally:
+                pages['/a/c/'] = old_page
+
+        finally:
+            shutil.rmtree(cache_dir)
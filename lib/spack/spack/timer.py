@@ -0,0 +1,166 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+This module records how long each phase of a package install takes.
+
+A Timer keeps a list of named phases and their wall-clock times, in
+the order the phases were first started.  Phases can be nested; a
+nested phase is recorded under its parent's name, e.g.
+``install/configure``.  Time spent in the same phase more than once
+is added up.
+
+Package.do_install() writes its timer to a JSON timing file in the
+install prefix, and ``spack timings`` aggregates those files.
+"""
+import time
+from contextlib import contextmanager
+
+from spack.util.cache_file import read_json, write_json
+
+# Version of the timing file format.
+_timing_format = 1
+
+
+class Timer(object):
+    """Accumulates wall-clock time for named phases."""
+    def __init__(self):
+        self.phases = []    # [name, seconds] pairs, in start order.
+        self._index = {}    # phase name -> pair in self.phases
+        self._stack = []    # names of the phases currently running
+
+
+    def _entry(self, name):
+        if name not in self._index:
+            self._index[name] = [name, 0.0]
+            self.phases.append(self._index[name])
+        return self._index[name]
+
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that times the code it wraps as a phase.
+           Phases started inside it are recorded as name/subphase."""
+        self._stack.append(name)
+        entry = self._entry('/'.join(self._stack))
+        start = time.time()
+        try:
+            yield
+        finally:
+            entry[1] += time.time() - start
+            self._stack.pop()
+
+
+    def add(self, name, seconds):
+        """Add some time to a phase without timing it here."""
+        self._entry(name)[1] += seconds
+
+
+    def get(self, name, default=0.0):
+        """Get the time recorded for a phase."""
+        entry = self._index.get(name)
+        return entry[1] if entry else default
+
+
+    def to_dict(self):
+        return { 'phases' : [list(p) for p in self.phases] }
+
+
+    @staticmethod
+    def from_dict(d):
+        timer = Timer()
+        for name, seconds in d['phases']:
+            timer.add(name, seconds)
+        return timer
+
+
+class TimedExecutable(object):
+    """Wraps an Executable so that each call is timed as a phase.
+       The phase may be a name or a function that takes the call's
+       arguments and returns a name.  Everything else is forwarded to
+       the wrapped Executable."""
+    def __init__(self, exe, timer, phase):
+        self.exe = exe
+        self.timer = timer
+        self.phase = phase
+
+
+    def __call__(self, *args, **kwargs):
+        phase = self.phase
+        if callable(phase):
+            phase = phase(args)
+        with self.timer.phase(phase):
+            return self.exe(*args, **kwargs)
+
+
+    def __getattr__(self, name):
+        return getattr(self.exe, name)
+
+
+def make_phase(args):
+    """Phase for a call to make: 'install' for make install, else 'build'."""
+    return 'install' if 'install' in args else 'build'
+
+
+def write_timing_file(path, spec, timer, start, total):
+    """Write a timing file for an installed spec.  start is when its
+       install began, and total is how long it took in seconds."""
+    write_json(path, { 'spec'   : spec.format('$_$@$%@$+$=$#'),
+                       'name'   : spec.name,
+                       'start'  : start,
+                       'total'  : total,
+                       'timer'  : timer.to_dict() }, _timing_format)
+
+
+def read_timing_file(path):
+    """Read a timing file written by write_timing_file().  Returns a
+       dict with 'spec', 'name', 'start', 'total', and 'timer' (a Timer), or
+       None if there is no readable timing file."""
+    data = read_json(path, _timing_format)
+    if data is None:
+        return None
+    try:
+        data['timer'] = Timer.from_dict(data['timer'])
+        return data
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def aggregate(timings):
+    """Sum the phases of several timing files read by read_timing_file().
+
+       Returns a list of (phase, seconds, count) tuples in the order the
+       phases were first seen, where count is the number of installs
+       that had the phase.
+    """
+    totals = {}
+    order = []
+    for t in timings:
+        for name, seconds in t['timer'].phases:
+            if name not in totals:
+                totals[name] = [0.0, 0]
+                order.append(name)
+            totals[name][0] += seconds
+            totals[name][1] += 1
+    return [(name, totals[name][0], totals[name][1]) for name in order]
@@ -0,0 +1,69 @@
+##############################################################################
+# Copyright (c) 2013, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Written by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://scalability-llnl.github.io/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License (as published by
+# the Free Software Foundation) version 2.1 dated February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+Helpers for reading and writing Spack's JSON cache files.
+
+Cache files carry a format number so that files written by other
+versions of Spack are ignored rather than misread.  They are replaced
+atomically, so concurrent readers never see partial files.  Caches are
+only an optimization, so failing to read or write one is never an
+error.
+"""
+import os
+import json
+import tempfile
+from contextlib import closing
+
+import llnl.util.tty as tty
+from llnl.util.filesystem import mkdirp
+
+
+def read_json(path, format):
+    """Read a cache file written by write_json() with the same format.
+       Returns None if it is missing, unreadable, or in another format."""
+    try:
+        with closing(open(path)) as f:
+            data = json.load(f)
+        if data.get('format') != format:
+            return None
+        return data
+
+    except (IOError, ValueError, AttributeError):
+        return None
+
+
+def write_json(path, data, format):
+    """Atomically replace a cache file with a dict of JSON data."""
+    data = dict(data, format=format)
+    try:
+        cache_dir = os.path.dirname(path)
+        mkdirp(cache_dir)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix='.tmp-')
+        with closing(os.fdopen(fd, 'w')) as f:
+            json.dump(data, f, sort_keys=True)
+        os.rename(tmp, path)
+
+    except (IOError, OSError), e:
+        tty.debug("Could not write cache file %s: %s" % (path, e))
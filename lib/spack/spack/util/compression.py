@@ -24,7 +24,16 @@
 ##############################################################################
 import re
 import os
+import stat
+import tarfile
+import zipfile
+import subprocess
 from itertools import product
+from contextlib import closing
+
+import llnl.util.tty as tty
+
+import spack.error
 from spack.util.executable import which
 
 # Supported archvie extensions.
@@ -49,6 +58,205 @@ def decompressor_for(path):
     return tar
 
 
+# Programs that decompress with several threads, by compression type,
+# in order of preference.  Each writes the decompressed archive to
+# stdout.
+PARALLEL_DECOMPRESSORS = {
+    'gz'  : [['pigz', '-dc']],
+    'bz2' : [['lbzip2', '-dc'], ['pbzip2', '-dc']],
+    'xz'  : [['pixz', '-d', '-i']],
+}
+
+# Single-threaded programs for types Python's tarfile can't read.
+SERIAL_DECOMPRESSORS = {
+    'xz'  : [['xz', '-dc']],
+    'Z'   : [['gzip', '-dc'], ['uncompress', '-c']],
+}
+
+
+def _compression(path):
+    """Compression type of a tarball, e.g. 'gz', or '*' if it isn't
+       known, which lets tarfile figure it out."""
+    ext = extension(path)
+    if ext is None:
+        return '*'
+    if ext == 'tgz':
+        return 'gz'
+    return ext.split('.')[-1]
+
+
+def _decompress_command(path, compression, parallel):
+    """Find a program to decompress path to stdout, or return None to
+       decompress in Python."""
+    choices = []
+    if parallel:
+        choices += PARALLEL_DECOMPRESSORS.get(compression, [])
+    choices += SERIAL_DECOMPRESSORS.get(compression, [])
+    for args in choices:
+        exe = which(args[0])
+        if exe:
+            return exe.exe + args[1:] + [path]
+    return None
+
+
+def _outside(name):
+    """Whether a path in an archive points outside of it."""
+    name = os.path.normpath(name)
+    return os.path.isabs(name) or name.split(os.sep)[0] == '..'
+
+
+def unsafe_member(member, links):
+    """Check whether extracting a tarball member could write outside of
+       the directory the archive is expanded in.  Returns the reason it
+       could, or None if it is safe.
+
+       Symlinks may point anywhere, but nothing may be extracted through
+       one, since that would write wherever it points.  Hard links must
+       point inside the archive.  links is the set of symlinks seen so
+       far, and is updated with member.
+    """
+    if _outside(member.name):
+        return "it is outside the archive"
+
+    def through_link(name):
+        parts = os.path.normpath(name).split(os.sep)
+        for i in range(1, len(parts) + 1):
+            path = os.sep.join(parts[:i])
+            if path in links:
+                return path
+        return None
+
+    link = through_link(member.name)
+    if link:
+        return "it would be written through the symlink %s" % link
+
+    if member.islnk():
+        if _outside(member.linkname):
+            return "it links to %s, outside the archive" % member.linkname
+        link = through_link(member.linkname)
+        if link:
+            return "it links to a file through the symlink %s" % link
+
+    if member.issym():
+        links.add(os.path.normpath(member.name))
+    return None
+
+
+def _safe_members(members, archive):
+    """Skip tarball members that could be written outside of the
+       directory the archive is expanded in.  See unsafe_member()."""
+    links = set()
+    for member in members:
+        reason = unsafe_member(member, links)
+        if reason:
+            tty.warn("Skipping %s in %s: %s." % (member.name, archive, reason))
+            continue
+        yield member
+
+
+class _Counter(object):
+    """Counts the bytes in the members a tarfile extracts."""
+    def __init__(self, members):
+        self.members = members
+        self.bytes = 0
+
+    def __iter__(self):
+        for member in self.members:
+            if member.isfile():
+                self.bytes += member.size
+            yield member
+
+
+def _expand_tarball(path, dest, compression, parallel):
+    command = _decompress_command(path, compression, parallel)
+    if command is None:
+        # gzip, bzip2 and plain tarballs can all be read in-process.
+        with closing(tarfile.open(path, 'r:%s' % compression)) as tar:
+            counter = _Counter(_safe_members(tar, path))
+            tar.extractall(dest, counter)
+        return counter.bytes
+
+    # Extract the archive as it's decompressed, without writing the
+    # uncompressed tarball anywhere.
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE)
+    try:
+        with closing(tarfile.open(fileobj=proc.stdout, mode='r|')) as tar:
+            counter = _Counter(_safe_members(tar, path))
+            tar.extractall(dest, counter)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+
+    if returncode != 0:
+        raise ExpansionError("%s failed to decompress %s." % (command[0], path))
+    return counter.bytes
+
+
+def _expand_zip(path, dest):
+    nbytes = 0
+    with closing(zipfile.ZipFile(path)) as archive:
+        for info in archive.infolist():
+            name = os.path.normpath(info.filename)
+            if os.path.isabs(name) or name.split(os.sep)[0] == '..':
+                tty.warn("Skipping %s in %s: it is outside the archive." %
+                         (info.filename, path))
+                continue
+
+            target = archive.extract(info, dest)
+
+            # zipfile doesn't restore permissions, e.g. on configure.
+            mode = info.external_attr >> 16
+            if mode and stat.S_ISREG(mode):
+                os.chmod(target, stat.S_IMODE(mode))
+            nbytes += info.file_size
+    return nbytes
+
+
+def expand(path, dest, **kwargs):
+    """Expand the archive at path into the directory dest.
+
+       Tarballs are extracted with Python's tarfile module.  When a
+       program that decompresses with several threads is available
+       (pigz, lbzip2, pbzip2, pixz) and parallel is True (the default),
+       the archive is decompressed by it and streamed into tarfile.
+       Zip files are extracted with zipfile.
+
+       Returns the number of bytes extracted.
+    """
+    parallel = kwargs.get('parallel', True)
+
+    if not os.path.isdir(dest):
+        os.makedirs(dest)
+
+    try:
+        if path.endswith('.zip'):
+            return _expand_zip(path, dest)
+        return _expand_tarball(path, dest, _compression(path), parallel)
+
+    except tarfile.TarError, e:
+        # tar knows about more formats than tarfile.
+        tty.debug("tarfile could not expand %s: %s" % (path, e))
+        return _expand_with_tar(path, dest)
+
+    except (zipfile.BadZipfile, IOError, OSError), e:
+        raise ExpansionError("Could not expand %s" % path, str(e))
+
+
+def _expand_with_tar(path, dest):
+    """Expand with the system's tar or unzip."""
+    decompress = decompressor_for(path)
+    cwd = os.getcwd()
+    os.chdir(dest)
+    try:
+        decompress(path)
+    finally:
+        os.chdir(cwd)
+
+    return sum(os.path.getsize(os.path.join(d, f))
+               for d, dirs, files in os.walk(dest) for f in files
+               if not os.path.islink(os.path.join(d, f)))
+
+
 def strip_extension(path):
     """Get the part of a path that does not include its compressed
        type extension."""
@@ -73,3 +281,9 @@ def extension(path):
         if re.search(suffix, path):
             return t
     return None
+
+
+class ExpansionError(spack.error.SpackError):
+    """Raised when an archive can't be expanded."""
+    def __init__(self, message, long_msg=None):
+        super(ExpansionError, self).__init__(message, long_msg)
@@ -37,6 +37,17 @@ _acceptable_hashes = [
 """Index for looking up hasher for a digest."""
 _size_to_hash = dict((h().digest_size, h) for h in _acceptable_hashes)
 
+"""Names of the acceptable hashes, e.g. 'md5' or 'sha256'."""
+hash_names = [h().name.lower() for h in _acceptable_hashes]
+
+
+def hash_fun_for_name(name):
+    """Get the hashlib algorithm with a name from hash_names."""
+    for h in _acceptable_hashes:
+        if h().name.lower() == name:
+            return h
+    raise ValueError("Spack knows no hash algorithm named %s" % name)
+
 
 def checksum(hashlib_algo, filename, **kwargs):
     """Returns a hex digest of the filename generated using an
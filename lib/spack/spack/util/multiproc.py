@@ -26,7 +26,12 @@
 This implements a parallel map operation but it can accept more values
 than multiprocessing.Pool.apply() can.  For example, apply() will fail
 to pickle functions if they're passed indirectly as parameters.
+
+It also has helpers for running tasks in forked children, a few at a
+time, as the installer and mirror creation do.
 """
+import os
+import sys
 from multiprocessing import Process, Pipe
 from itertools import izip
 
@@ -43,3 +48,87 @@ def parmap(f,X):
     [p.join() for p in proc]
     return [p.recv() for (p,c) in pipe]
 
+
+def fork_with_log(function, log_path=None):
+    """Run function in a forked child, with its output redirected to
+       log_path if one is given.  Returns the child's pid.  The child
+       exits with status 0 if function returns normally, and 1 if it
+       fails."""
+    # Don't let the child inherit anything we haven't printed yet.
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    pid = os.fork()
+    if pid != 0:
+        return pid
+
+    try:
+        if log_path:
+            log_fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0644)
+            os.dup2(log_fd, sys.stdout.fileno())
+            os.dup2(log_fd, sys.stderr.fileno())
+        os.dup2(os.open(os.devnull, os.O_RDONLY), sys.stdin.fileno())
+
+        function()
+        sys.stdout.flush()
+        os._exit(0)
+
+    except SystemExit, e:
+        sys.stdout.flush()
+        os._exit(1 if e.code else 0)
+
+    except:
+        # Child doesn't raise or return to main spack code.
+        sys.excepthook(*sys.exc_info())
+        sys.stdout.flush()
+        os._exit(1)
+
+
+def schedule(order, deps, jobs, start, finish):
+    """Run a task for each key in order, up to jobs at once.
+
+       start(key) forks a child to run the task and returns its pid.
+       A key is only started once all the keys in deps[key] have
+       finished successfully.  When a child exits, finish(key, ok) is
+       called with ok=True if the child exited with status 0, and it
+       returns whether the task really succeeded.
+
+       Once a task fails no new tasks are started.  Returns a tuple of
+       lists (succeeded, failed, skipped).
+    """
+    pending   = list(order)
+    running   = {}
+    succeeded = []
+    failed    = []
+    done      = set()
+    try:
+        while pending or running:
+            # Start as many tasks as we can whose dependencies are
+            # done.  Once something fails, just wait for the rest.
+            if not failed:
+                for key in [k for k in pending if deps.get(k, set()) <= done]:
+                    if len(running) >= jobs:
+                        break
+                    running[start(key)] = key
+                    pending.remove(key)
+
+            if not running:
+                break
+
+            pid, returncode = os.waitpid(-1, 0)
+            key = running.pop(pid, None)
+            if key is None:
+                continue
+
+            if finish(key, returncode == 0):
+                done.add(key)
+                succeeded.append(key)
+            else:
+                failed.append(key)
+
+    finally:
+        # Don't leave children behind if we were interrupted.
+        for pid in running:
+            os.waitpid(pid, 0)
+
+    return succeeded, failed, pending
@@ -22,23 +22,60 @@
 # along with this program; if not, write to the Free Software Foundation,
 # Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+"""
+This module has a simple web spider, used to find links to archives
+on package download pages.
+
+Pages are fetched by a bounded pool of threads.  Connections are kept
+alive and reused for each host, each URL is requested at most once,
+and requests to each host are limited in number and rate, so crawling
+a big directory listing doesn't hammer the server or fork a process
+per link.
+
+Pages can also be kept in a PageCache on disk.  Cached pages are used
+as they are for a while, and after that they are only downloaded again
+if the server says they have changed.
+"""
+import os
 import re
 import sys
-import subprocess
-import urllib2, cookielib
+import time
+import socket
+import shutil
+import hashlib
+import httplib
+import urllib
+import urllib2
 import urlparse
-from multiprocessing import Pool
+import threading
+from Queue import Queue
 from HTMLParser import HTMLParser, HTMLParseError
 
 import llnl.util.tty as tty
+from llnl.util.filesystem import join_path
 
 import spack
 import spack.error
 from spack.util.compression import ALLOWED_ARCHIVE_TYPES
+from spack.util.cache_file import read_json, write_json
 
 # Timeout in seconds for web requests
 TIMEOUT = 10
 
+# Most pages the spider fetches at once, across all hosts.
+CONCURRENCY = 16
+
+# Most requests the spider has open to any one host.
+MAX_PER_HOST = 4
+
+# Least time in seconds between starting requests to the same host.
+HOST_DELAY = 0.0
+
+# Most redirects followed for one URL.
+MAX_REDIRECTS = 5
+
+# Version of the page cache's file format.
+_page_cache_format = 1
 
 class LinkParser(HTMLParser):
     """This parser just takes an HTML page and strips out the hrefs on the
@@ -54,118 +91,464 @@ class LinkParser(HTMLParser):
                     self.links.append(val)
 
 
-def _spider(args):
-    """_spider(url, depth, max_depth)
-
-       Fetches URL and any pages it links to up to max_depth.  depth should
-       initially be 1, and max_depth includes the root.  This function will
-       print out a warning only if the root can't be fetched; it ignores
-       errors with pages that the root links to.
+class ConnectionPool(object):
+    """Keeps HTTP connections open so they can be reused, and limits
+       how many requests are made to each host, and how often.
 
-       This will return a list of the pages fetched, in no particular order.
-
-       Takes args as a tuple b/c it's intended to be used by a multiprocessing
-       pool.  Firing off all the child links at once makes the fetch MUCH
-       faster for pages with lots of children.
+       Only http and https URLs are pooled.  Other URLs, and URLs for
+       which a proxy is configured, are fetched with urllib2.
     """
-    url, visited, root, opener, depth, max_depth, raise_on_error = args
-
-    pages = {}
-    try:
-        # Make a HEAD request first to check the content type.  This lets
-        # us ignore tarballs and gigantic files.
-        # It would be nice to do this with the HTTP Accept header to avoid
-        # one round-trip.  However, most servers seem to ignore the header
-        # if you ask for a tarball with Accept: text/html.
-        req = urllib2.Request(url)
-        req.get_method = lambda: "HEAD"
-        resp = urllib2.urlopen(req, timeout=TIMEOUT)
-
-        if not "Content-type" in resp.headers:
-            tty.debug("ignoring page " + url)
-            return pages
-
-        if not resp.headers["Content-type"].startswith('text/html'):
-            tty.debug("ignoring page " + url + " with content type " +
-                      resp.headers["Content-type"])
-            return pages
-
-        # Do the real GET request when we know it's just HTML.
-        req.get_method = lambda: "GET"
-        response = urllib2.urlopen(req, timeout=TIMEOUT)
-        response_url = response.geturl()
-
-        # Read the page and and stick it in the map we'll return
-        page = response.read()
-        pages[response_url] = page
+    def __init__(self, **kwargs):
+        self.timeout      = kwargs.get('timeout', TIMEOUT)
+        self.max_per_host = kwargs.get('max_per_host', MAX_PER_HOST)
+        self.delay        = kwargs.get('delay', HOST_DELAY)
+
+        self._lock  = threading.Lock()
+        self._hosts = {}    # (scheme, netloc) -> _Host
+        self._proxies = urllib.getproxies()
+
+
+    def _host(self, key):
+        with self._lock:
+            if key not in self._hosts:
+                self._hosts[key] = _Host(self.max_per_host)
+            return self._hosts[key]
+
+
+    def request(self, method, url, headers=None):
+        """Make a request and read the response.  Returns a tuple of
+           (url, status, headers, body), where url is the URL of the
+           response and header names are lowercase.  Extra request
+           headers can be passed in a dict."""
+        headers = headers or {}
+        scheme, netloc, path, query, fragment = urlparse.urlsplit(url)
+        if scheme not in ('http', 'https') or scheme in self._proxies:
+            return self._urllib2_request(method, url, headers)
+
+        path = urlparse.urlunsplit(('', '', path or '/', query, ''))
+        host = self._host((scheme, netloc))
+        with host.semaphore:
+            host.wait_turn(self.delay)
+
+            # A kept-alive connection may have been closed by the
+            # server, so retry once on a new one.
+            for attempt in (0, 1):
+                conn = host.get_connection()
+                fresh = conn is None
+                if fresh:
+                    conn_class = (httplib.HTTPSConnection if scheme == 'https'
+                                  else httplib.HTTPConnection)
+                    conn = conn_class(netloc, timeout=self.timeout)
+                try:
+                    conn.request(method, path, headers=dict(headers, **{
+                        'Host'       : netloc,
+                        'Connection' : 'keep-alive',
+                        'User-Agent' : 'Spack/%s' % spack.spack_version }))
+                    resp = conn.getresponse()
+                    body = resp.read()
+                except (httplib.HTTPException, socket.error):
+                    conn.close()
+                    if fresh or attempt:
+                        raise
+                    continue
 
-        # If we're not at max depth, parse out the links in the page
-        if depth < max_depth:
-            link_parser = LinkParser()
-            subcalls = []
-            link_parser.feed(page)
+                if resp.will_close:
+                    conn.close()
+                else:
+                    host.put_connection(conn)
+                resp_headers = dict((k.lower(), v) for k, v in resp.getheaders())
+                return url, resp.status, resp_headers, body
+
+
+    def _urllib2_request(self, method, url, headers):
+        req = urllib2.Request(url, headers=headers)
+        req.get_method = lambda: method
+        try:
+            resp = urllib2.urlopen(req, timeout=self.timeout)
+        except urllib2.HTTPError, e:
+            # This includes 304 Not Modified.
+            return url, e.code, {}, ''
+
+        # urllib2 follows redirects itself.
+        headers = dict((k.lower(), v) for k, v in resp.headers.items())
+        body = resp.read() if method != 'HEAD' else ''
+        return resp.geturl(), 200, headers, body
+
+
+    def close(self):
+        with self._lock:
+            for host in self._hosts.values():
+                host.close()
+            self._hosts = {}
+
+
+class _Host(object):
+    """Connections and rate limiting state for one host."""
+    def __init__(self, max_connections):
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._next_time = 0
+
+
+    def wait_turn(self, delay):
+        """Wait until at least delay seconds after the last request
+           to this host started."""
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next_time)
+            self._next_time = start + delay
+        if start > now:
+            time.sleep(start - now)
+
+
+    def get_connection(self):
+        with self._lock:
+            return self._idle.pop() if self._idle else None
+
+
+    def put_connection(self, conn):
+        with self._lock:
+            self._idle.append(conn)
+
+
+    def close(self):
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle = []
+
+
+class PageCache(object):
+    """Keeps pages read by the spider on disk, along with the ETag and
+       Last-Modified headers needed to ask the server whether they have
+       changed.  Entries younger than ttl seconds are fresh and can be
+       used without asking the server at all.
+
+       Entries are dicts with these keys:
+         final_url      URL the page was read from, after redirects.
+         content_type   Content type of the page.
+         etag           ETag header, or None.
+         last_modified  Last-Modified header, or None.
+         body           Contents of the page, or None if it isn't HTML.
+         time           When the entry was last checked with the server.
+    """
+    def __init__(self, root, ttl):
+        self.root = root
+        self.ttl = ttl
 
-            while link_parser.links:
-                raw_link = link_parser.links.pop()
 
-                # Skip stuff that looks like an archive
-                if any(raw_link.endswith(suf) for suf in ALLOWED_ARCHIVE_TYPES):
-                    continue
+    def path_for(self, url):
+        return join_path(self.root, hashlib.sha1(url).hexdigest() + '.json')
 
-                # Evaluate the link relative to the page it came from.
-                abs_link = urlparse.urljoin(response_url, raw_link)
 
-                # Skip things outside the root directory
-                if not abs_link.startswith(root):
-                    continue
+    def get(self, url):
+        """Get the entry for a URL, or None if there isn't one."""
+        data = read_json(self.path_for(url), _page_cache_format)
+        if data is None or data.get('url') != url:
+            return None
 
-                # Skip already-visited links
-                if abs_link in visited:
-                    continue
+        # JSON gives back unicode; the spider works with byte strings.
+        entry = {}
+        for key in ('final_url', 'content_type', 'etag', 'last_modified', 'body'):
+            value = data.get(key)
+            if value is not None:
+                value = value.encode('latin-1')
+            entry[key] = value
+        entry['time'] = data.get('time', 0)
+        return entry
 
-                subcalls.append((abs_link, visited, root, None, depth+1, max_depth, raise_on_error))
-                visited.add(abs_link)
 
-            if subcalls:
-                try:
-                    pool = Pool(processes=len(subcalls))
-                    dicts = pool.map(_spider, subcalls)
-                    for d in dicts:
-                        pages.update(d)
-                finally:
-                    pool.terminate()
-                    pool.join()
+    def put(self, url, entry):
+        """Store an entry for a URL, marking it as checked now."""
+        entry['time'] = time.time()
+        data = { 'url' : url, 'time' : entry['time'] }
+        for key in ('final_url', 'content_type', 'etag', 'last_modified', 'body'):
+            value = entry.get(key)
+            if value is not None:
+                # latin-1 maps every byte to a character, so any
+                # page survives the round trip through JSON.
+                value = value.decode('latin-1')
+            data[key] = value
+        write_json(self.path_for(url), data, _page_cache_format)
 
-    except urllib2.URLError, e:
-        tty.debug(e)
-        if raise_on_error:
-            raise spack.error.NoNetworkConnectionError(str(e), url)
 
-    except HTMLParseError, e:
-        # This error indicates that Python's HTML parser sucks.
-        msg = "Got an error parsing HTML."
+    def fresh(self, entry):
+        """True if an entry can be used without asking the server."""
+        return 0 <= time.time() - entry['time'] < self.ttl
 
-        # Pre-2.7.3 Pythons in particular have rather prickly HTML parsing.
-        if sys.version_info[:3] < (2,7,3):
-            msg += " Use Python 2.7.3 or newer for better HTML parsing."
 
-        tty.warn(msg, url, "HTMLParseError: " + str(e))
+    def clean(self):
+        """Remove everything from the cache."""
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
 
-    except Exception, e:
-        # Other types of errors are completely ignored, except in debug mode.
-        tty.debug("Error in _spider: %s" % e)
 
-    return pages
+class Spider(object):
+    """Fetches pages from root URLs, and the pages they link to, up to
+       a maximum depth.  Only links under a page's root are followed.
 
+       If a PageCache is passed as cache, fresh cached pages are used
+       without any requests, and stale ones are fetched with
+       conditional requests.  With revalidate=True, every cached page
+       is checked with the server, however fresh it is.
+    """
+    def __init__(self, max_depth=1, **kwargs):
+        self.max_depth      = max_depth
+        self.concurrency    = kwargs.get('concurrency', CONCURRENCY)
+        self.raise_on_error = kwargs.get('raise_on_error', False)
+        self.cache          = kwargs.get('cache', None)
+        self.revalidate     = kwargs.get('revalidate', False)
+        self.pool = kwargs.get('pool') or ConnectionPool(**kwargs)
+
+        self._lock    = threading.Lock()
+        self._queue   = Queue()
+        self._visited = set()   # URLs that have been queued.
+        self._heads   = {}      # URL -> [Event, (final URL, content type)]
+        self._fetched = set()   # Final URLs that have been read.
+        self._errors  = []
+        self._roots   = []
+        self.pages    = {}
+        self.page_roots = {}    # Page URL -> set of roots it was found from
+
+
+    def _visit(self, url, root, depth, max_depth):
+        """Queue a URL, unless it has been seen already."""
+        with self._lock:
+            if url in self._visited:
+                return
+            self._visited.add(url)
+        self._queue.put((url, root, depth, max_depth))
+
+
+    def _follow(self, method, url, headers=None):
+        """Make a request, following redirects.  Returns (final url,
+           status, headers, body)."""
+        for i in range(MAX_REDIRECTS + 1):
+            url, status, resp_headers, body = self.pool.request(method, url, headers)
+            if status in (301, 302, 303, 307, 308) and 'location' in resp_headers:
+                url = urlparse.urljoin(url, resp_headers['location'])
+                continue
+            return url, status, resp_headers, body
+        raise urllib2.URLError("Too many redirects: %s" % url)
+
+
+    def _head(self, url, redirected_from=()):
+        """Get the final URL and content type of a URL.  Each URL gets
+           at most one HEAD request, even if several threads want it."""
+        with self._lock:
+            entry = self._heads.get(url)
+            owner = entry is None
+            if owner:
+                entry = self._heads[url] = [threading.Event(), None]
+
+        if not owner:
+            # Time out in case of a redirect loop between threads.
+            entry[0].wait(self.pool.timeout * (MAX_REDIRECTS + 1))
+            if entry[1] is None:
+                raise urllib2.URLError("Could not get %s" % url)
+            return entry[1]
+
+        try:
+            url, status, headers, body = self.pool.request('HEAD', url)
+            if status in (301, 302, 303, 307, 308) and 'location' in headers:
+                chain = redirected_from + (url,)
+                location = urlparse.urljoin(url, headers['location'])
+                if len(chain) > MAX_REDIRECTS or location in chain:
+                    raise urllib2.URLError("Too many redirects: %s" % url)
+                entry[1] = self._head(location, chain)
+            elif status >= 400:
+                raise urllib2.URLError("HTTP error %d for %s" % (status, url))
+            else:
+                entry[1] = (url, headers.get('content-type', ''))
+            return entry[1]
+        finally:
+            entry[0].set()
+
+
+    def _read(self, url, root):
+        """Get the final URL and contents of the page at a URL.  Returns
+           None if the URL isn't HTML, or if its page was already read."""
+        entry = self.cache.get(url) if self.cache else None
+        fresh = entry is not None and not self.revalidate and self.cache.fresh(entry)
+        if fresh:
+            final_url, content_type = entry['final_url'], entry['content_type']
+        elif entry is not None and entry['body'] is not None:
+            # We already know this is HTML, so skip the HEAD request.
+            final_url, content_type = entry['final_url'], entry['content_type']
+        else:
+            # Make a HEAD request first to check the content type.  This lets
+            # us ignore tarballs and gigantic files.
+            # It would be nice to do this with the HTTP Accept header to avoid
+            # one round-trip.  However, most servers seem to ignore the header
+            # if you ask for a tarball with Accept: text/html.
+            final_url, content_type = self._head(url)
+
+        if not content_type.startswith('text/html'):
+            tty.debug("ignoring page %s with content type %s" % (url, content_type))
+            if self.cache and not fresh:
+                self.cache.put(url, { 'final_url'    : final_url,
+                                      'content_type' : content_type })
+            return None
+
+        # Several links can redirect to the same page.
+        with self._lock:
+            self.page_roots.setdefault(final_url, set()).add(root)
+            if final_url in self._fetched:
+                return None
+            self._fetched.add(final_url)
+
+        if fresh:
+            return final_url, entry['body']
+
+        # Do the real GET request when we know it's just HTML.  If we
+        # have a cached copy, only ask for the page if it has changed.
+        request_headers = {}
+        if entry is not None:
+            if entry['etag']:
+                request_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request_headers['If-Modified-Since'] = entry['last_modified']
+
+        response_url, status, headers, page = self._follow(
+            'GET', final_url, request_headers)
+        if status == 304 and entry is not None:
+            tty.debug("page %s has not changed" % final_url)
+            self.cache.put(url, entry)
+            return final_url, entry['body']
+        elif status >= 400:
+            raise urllib2.URLError("HTTP error %d for %s" % (status, final_url))
+
+        if self.cache:
+            self.cache.put(url, {
+                'final_url'     : response_url,
+                'content_type'  : headers.get('content-type', content_type),
+                'etag'          : headers.get('etag'),
+                'last_modified' : headers.get('last-modified'),
+                'body'          : page })
+        return response_url, page
+
+
+    def _fetch(self, url, root, depth, max_depth):
+        result = self._read(url, root)
+        if result is None:
+            return
+        response_url, page = result
+
+        with self._lock:
+            self.pages[response_url] = page
+            self.page_roots.setdefault(response_url, set()).add(root)
 
-def get_pages(root_url, **kwargs):
-    """Gets web pages from a root URL.
+        # If we're not at max depth, parse out the links in the page
+        if depth >= max_depth:
+            return
+
+        link_parser = LinkParser()
+        link_parser.feed(page)
+        for raw_link in link_parser.links:
+            # Skip stuff that looks like an archive
+            if any(raw_link.endswith(suf) for suf in ALLOWED_ARCHIVE_TYPES):
+                continue
+
+            # Evaluate the link relative to the page it came from.
+            abs_link = urlparse.urljoin(response_url, raw_link)
+            abs_link = urlparse.urldefrag(abs_link)[0]
+
+            # Skip things outside the root directory
+            if not abs_link.startswith(root):
+                continue
+
+            self._visit(abs_link, root, depth + 1, max_depth)
+
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                url, root, depth, max_depth = item
+                try:
+                    self._fetch(url, root, depth, max_depth)
+
+                except (urllib2.URLError, httplib.HTTPException, socket.error), e:
+                    tty.debug(e)
+                    if depth == 1 and self.raise_on_error:
+                        with self._lock:
+                            self._errors.append(
+                                spack.error.NoNetworkConnectionError(str(e), url))
+
+                except HTMLParseError, e:
+                    # This error indicates that Python's HTML parser sucks.
+                    msg = "Got an error parsing HTML."
+
+                    # Pre-2.7.3 Pythons in particular have rather prickly HTML parsing.
+                    if sys.version_info[:3] < (2,7,3):
+                        msg += " Use Python 2.7.3 or newer for better HTML parsing."
+
+                    tty.warn(msg, url, "HTMLParseError: " + str(e))
+
+                except Exception, e:
+                    # Other types of errors are completely ignored, except in debug mode.
+                    tty.debug("Error in spider: %s" % e)
+            finally:
+                self._queue.task_done()
+
+
+    def add_root(self, root, max_depth=None):
+        """Add a root URL for run() to start from.  Pages linked from
+           it are fetched up to max_depth, or the spider's max_depth."""
+        if max_depth is None:
+            max_depth = self.max_depth
+        self._roots.append((root, max_depth))
+
+
+    def run(self):
+        """Fetch pages starting from the roots that were added.  Returns
+           a dict mapping the URL of each page fetched to its contents.
+           After this, page_roots maps each page URL to the roots it
+           was found from."""
+        for root, max_depth in self._roots:
+            self._visit(root, root, 1, max_depth)
+
+        threads = [threading.Thread(target=self._work)
+                   for i in range(max(1, self.concurrency))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+
+        # Queue.join() can't be interrupted, so poll instead.
+        done = self._queue.all_tasks_done
+        with done:
+            while self._queue.unfinished_tasks:
+                done.wait(0.1)
+
+        for t in threads:
+            self._queue.put(None)
+        for t in threads:
+            t.join()
+        self.pool.close()
+
+        if self._errors:
+            raise self._errors[0]
+        return self.pages
+
+
+    def get_pages(self, *root_urls):
+        """Fetch pages starting from some root URLs.  Returns a dict
+           mapping the URL of each page fetched to its contents."""
+        for root in root_urls:
+            self.add_root(root)
+        return self.run()
+
+
+def get_pages(*root_urls, **kwargs):
+    """Gets web pages from one or more root URLs.
        If depth is specified (e.g., depth=2), then this will also fetches pages
-       linked from the root and its children up to depth.
+       linked from the roots and their children up to depth.
 
-       This will spawn processes to fetch the children, for much improved
-       performance over a sequential fetch.
+       Pages are fetched by a pool of threads; see Spider for the other
+       keyword arguments.
     """
-    max_depth = kwargs.setdefault('depth', 1)
-    pages =  _spider((root_url, set(), root_url, None, 1, max_depth, False))
-    return pages
+    max_depth = kwargs.pop('depth', 1)
+    return Spider(max_depth, **kwargs).get_pages(*root_urls)
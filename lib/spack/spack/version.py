@@ -42,6 +42,11 @@ be called on any of the types::
   union
   intersection
   concrete
+
+Version objects are created and compared a lot, e.g. during
+concretization, so they are kept small and cheap: each one has a
+precomputed sort key, so comparing two of them is a tuple comparison,
+and equal version strings share one Version object.
 """
 import os
 import sys
@@ -52,6 +57,14 @@ from external.functools import total_ordering
 
 # Valid version characters
 VALID_VERSION = r'[A-Za-z0-9_.-]'
+_valid_version = re.compile(VALID_VERSION)
+
+# Alphabetical and numeric segments of a version string.
+_segment_regex = re.compile(r'[a-zA-Z]+|[0-9]+')
+
+# Versions that have been created, by string.  Versions never change,
+# so each string only needs one.
+_interned_versions = {}
 
 def int_if_int(string):
     """Convert a string to int if possible.  Otherwise, return a string."""
@@ -94,7 +107,7 @@ def coerced(method):
     """Decorator that ensures that argument types of a method are coerced."""
     @wraps(method)
     def coercing_method(a, b):
-        if type(a) == type(b) or a is None or b is None:
+        if type(a) is type(b) or a is None or b is None:
             return method(a, b)
         else:
             ca, cb = coerce_versions(a, b)
@@ -102,27 +115,53 @@ def coerced(method):
     return coercing_method
 
 
-@total_ordering
+def _sort_key(version):
+    """Key that sorts version tuples the way Version.__lt__ does.
+       Numbers are always "newer" than letters.  This is for
+       consistency with RPM.  See patch #60884 (and details) from
+       bugzilla #50977 in the RPM project at rpm.org.  Or look at
+       rpmvercmp.c if you want to see how this is implemented there.
+       If the common prefix is equal, the one with more segments is
+       bigger, which tuple comparison does already."""
+    return tuple((1, seg) if type(seg) == int else (0, seg) for seg in version)
+
+
 class Version(object):
     """Class to represent versions"""
-    def __init__(self, string):
+    __slots__ = ('string', 'version', '_key', '_hash')
+
+    def __new__(cls, string):
         string = str(string)
+        version = _interned_versions.get(string)
+        if version is not None:
+            return version
 
-        if not re.match(VALID_VERSION, string):
+        if not _valid_version.match(string):
             raise ValueError("Bad characters in version string: %s" % string)
 
+        self = object.__new__(cls)
+
         # preserve the original string, but trimmed.
-        string = string.strip()
-        self.string = string
+        self.string = string.strip()
 
         # Split version into alphabetical and numeric segments
-        segment_regex = r'[a-zA-Z]+|[0-9]+'
-        segments = re.findall(segment_regex, string)
-        self.version = tuple(int_if_int(seg) for seg in segments)
+        self.version = tuple(
+            int_if_int(seg) for seg in _segment_regex.findall(self.string))
+        self._key = _sort_key(self.version)
+        self._hash = hash(self.version)
+
+        _interned_versions[string] = self
+        return self
 
-        # Store the separators from the original version string as well.
-        # last element of separators is ''
-        self.separators = tuple(re.split(segment_regex, string)[1:-1])
+
+    def __reduce__(self):
+        return (Version, (self.string,))
+
+
+    @property
+    def separators(self):
+        """The separators from the original version string."""
+        return tuple(_segment_regex.split(self.string)[1:-1])
 
 
     def up_to(self, index):
@@ -203,43 +242,44 @@ class Version(object):
         return self
 
 
-    @coerced
     def __lt__(self, other):
         """Version comparison is designed for consistency with the way RPM
            does things.  If you need more complicated versions in installed
            packages, you should override your package's version string to
-           express it more sensibly.
+           express it more sensibly.  See _sort_key().
         """
-        if other is None:
+        if type(other) is Version:
+            return self._key < other._key
+        elif other is None:
             return False
+        a, b = coerce_versions(self, other)
+        return a < b
 
-        # Coerce if other is not a Version
-        # simple equality test first.
-        if self.version == other.version:
-            return False
 
-        for a, b in zip(self.version, other.version):
-            if a == b:
-                continue
-            else:
-                # Numbers are always "newer" than letters.  This is for
-                # consistency with RPM.  See patch #60884 (and details)
-                # from bugzilla #50977 in the RPM project at rpm.org.
-                # Or look at rpmvercmp.c if you want to see how this is
-                # implemented there.
-                if type(a) != type(b):
-                    return type(b) == int
-                else:
-                    return a < b
+    def __gt__(self, other):
+        if type(other) is Version:
+            return self._key > other._key
+        elif other is None:
+            return True
+        a, b = coerce_versions(self, other)
+        return a > b
 
-        # If the common prefix is equal, the one with more segments is bigger.
-        return len(self.version) < len(other.version)
+
+    def __le__(self, other):
+        return not self > other
+
+
+    def __ge__(self, other):
+        return not self < other
 
 
-    @coerced
     def __eq__(self, other):
-        return (other is not None and
-                type(other) == Version and self.version == other.version)
+        if type(other) is Version:
+            return self is other or self.version == other.version
+        elif other is None:
+            return False
+        a, b = coerce_versions(self, other)
+        return a == b
 
 
     def __ne__(self, other):
@@ -247,7 +287,7 @@ class Version(object):
 
 
     def __hash__(self):
-        return hash(self.version)
+        return self._hash
 
 
     @coerced
@@ -299,6 +339,8 @@ class Version(object):
 
 @total_ordering
 class VersionRange(object):
+    __slots__ = ('start', 'end')
+
     def __init__(self, start, end):
         if isinstance(start, basestring):
             start = Version(start)
@@ -501,6 +543,8 @@ class VersionRange(object):
 @total_ordering
 class VersionList(object):
     """Sorted, non-redundant list of Versions and VersionRanges."""
+    __slots__ = ('versions',)
+
     def __init__(self, vlist=None):
         self.versions = []
         if vlist is not None:
@@ -552,7 +596,10 @@ class VersionList(object):
 
 
     def copy(self):
-        return VersionList(self)
+        # Already sorted and non-redundant, so no need to add() each one.
+        clone = VersionList()
+        clone.versions = list(self.versions)
+        return clone
 
 
     def lowest(self):
@@ -623,11 +670,17 @@ class VersionList(object):
 
     @coerced
     def intersection(self, other):
-        # TODO: make this faster.  This is O(n^2).
+        """Both lists are sorted and their elements don't overlap, so
+           this walks them together, like merging, and only intersects
+           elements that could overlap."""
         result = VersionList()
-        for s in self:
-            for o in other:
-                result.add(s.intersection(o))
+        s = o = 0
+        while s < len(self) and o < len(other):
+            result.add(self[s].intersection(other[o]))
+            if _ends_before(self[s], other[o]):
+                s += 1
+            else:
+                o += 1
         return result
 
 
@@ -695,6 +748,24 @@ class VersionList(object):
         return str(self.versions)
 
 
+def _ends_before(a, b):
+    """True if no version after Version or VersionRange a can be in b,
+       so nothing after a can overlap b or anything after it."""
+    a_end, b_end = a.highest(), b.highest()
+    if a_end is None:
+        return False
+    elif b_end is None:
+        return True
+
+    # A version also covers the versions it is a prefix of, e.g. 1.6
+    # covers 1.6.5, so check for that before comparing.
+    if b_end in a_end:
+        return False
+    elif a_end in b_end:
+        return True
+    return a_end < b_end
+
+
 def _string_to_version(string):
     """Converts a string to a Version, VersionList, or VersionRange.
        This is private.  Client code should use ver().
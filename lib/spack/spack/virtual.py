@@ -25,6 +25,7 @@
 """
 The ``virtual`` module contains utility classes for virtual dependencies.
 """
+import spack
 import spack.spec
 import itertools
 
@@ -44,12 +45,17 @@ class ProviderIndex(object):
 
        Calling providers_for(spec) will find specs that provide a
        matching implementation of MPI.
+
+       The packages' provides() declarations are looked up with the
+       metadata keyword arg, a function that takes a package name and
+       returns its PackageMetadata.  It defaults to spack.db.metadata.
     """
     def __init__(self, specs, **kwargs):
         # TODO: come up with another name for this.  This "restricts" values to
         # the verbatim impu specs (i.e., it doesn't pre-apply package's constraints, and
         # keeps things as broad as possible, so it's really the wrong name)
         self.restrict = kwargs.setdefault('restrict', False)
+        self.metadata = kwargs.get('metadata', None)
 
         self.providers = {}
 
@@ -69,8 +75,11 @@ class ProviderIndex(object):
 
         assert(not spec.virtual)
 
-        pkg = spec.package
-        for provided_spec, provider_spec in pkg.provided.iteritems():
+        # Use cached metadata so that building the index does not
+        # need to load every package.
+        get_metadata = self.metadata or spack.db.metadata
+        metadata = get_metadata(spec.name)
+        for provided_spec, provider_spec in metadata.provided.iteritems():
             if provider_spec.satisfies(spec, deps=False):
                 provided_name = provided_spec.name
                 if provided_name not in self.providers:
@@ -110,6 +119,50 @@ class ProviderIndex(object):
         return sorted(providers)
 
 
+    def remove_provider(self, pkg_name):
+        """Remove all the provider specs for a particular package from
+           the index.  Use this with update() to refresh the index when
+           a single package changes."""
+        for provided_name in self.providers.keys():
+            provider_map = self.providers[provided_name]
+            for provided_spec in provider_map.keys():
+                spec_set = provider_map[provided_spec]
+                spec_set.difference_update(
+                    [s for s in spec_set if s.name == pkg_name])
+                if not spec_set:
+                    del provider_map[provided_spec]
+
+            if not provider_map:
+                del self.providers[provided_name]
+
+
+    def to_dict(self):
+        """Convert the index to a dict of strings and lists, suitable
+           for serialization as JSON."""
+        providers = {}
+        for provided_name, provider_map in self.providers.items():
+            providers[provided_name] = sorted(
+                [str(provided_spec), sorted(str(s) for s in spec_set)]
+                for provided_spec, spec_set in provider_map.items())
+
+        return { 'restrict'  : self.restrict,
+                 'providers' : providers }
+
+
+    @staticmethod
+    def from_dict(d, **kwargs):
+        """Construct a ProviderIndex from the output of to_dict().
+           Keyword args are passed to the constructor."""
+        kwargs['restrict'] = d['restrict']
+        index = ProviderIndex([], **kwargs)
+        for provided_name, entries in d['providers'].items():
+            provider_map = index.providers.setdefault(str(provided_name), {})
+            for provided_spec, specs in entries:
+                provider_map[spack.spec.Spec(str(provided_spec))] = set(
+                    spack.spec.Spec(str(s)) for s in specs)
+        return index
+
+
     # TODO: this is pretty darned nasty, and inefficient.
     def _cross_provider_maps(self, lmap, rmap):
         result = {}